@@ -1,23 +1,55 @@
+import time
+
+# Start of this script run, for the startup timing report
+script_start = time.perf_counter()
+
 import streamlit as st
+from streamlit.logger import get_logger
 import pandas as pd
 import numpy as np
-import base64
-from io import BytesIO
-from PIL import Image
 import os
 import datetime
-import math
 import re
 
 # Import lists from lists.py
 from lists import brand_list, segment_list, size_options, segment_mapping, segment_size_combinations
+from margins import margin_floor_contour, margin_grid, value_range
+from projections import PROJECTION_SCENARIOS, TOTAL_DIMENSIONS, project_scenarios, projection_totals
+from promo import promo_plan
+import commentary
+from commentary import MAX_SUMMARY_ROWS, commentary_status, explain_request, request_commentary, summary_request
+from parquet_io import (PARQUET_MIME, read_index_ratios_parquet, read_scenarios_parquet, write_index_ratios_parquet,
+                        write_scenarios_parquet)
+from scenarios import DIMENSION_COLUMNS, PRICING_SCENARIOS, build_scenario_frame, solve_scenario_targets
+from scenario_store import ScenarioStore
+from h1_index import period_label
+from app_files import APP_DIR
+from h1_data import DEFAULT_H1_PATH, generate_brand_h1_data, source_fingerprint
+from h1_snapshot import append_shared_week, shared_snapshot
+from catalog import DEFAULT_CATALOG_PATH, load_catalog
+from render import pricing_table_html, week_list_html
+from exports import (XLSX_MIME, export_to_tempfile, index_ratio_week_header, write_index_ratios_xlsx, write_promo_plan_xlsx,
+                     write_scenarios_xlsx)
+import metrics
+
+# Imports are cached by Python, so this is only significant on the first run in a process
+import_seconds = time.perf_counter() - script_start
+
+# Streamlit's console logger, so messages are printed with its format and at its log level
+logger = get_logger("scancalc")
+
+LOGO_PATH = os.path.join(APP_DIR, "image.png")
+
+# Starting values of the calculator inputs set through session_state
+CALCULATOR_DEFAULTS = {
+    "calc_segment": segment_list[0],
+    "calc_size": size_options[0],
+    "calc_case_cost": 0.0,
+    "calc_bottles": 12
+}
 
-# Set page config
-st.set_page_config(
-    page_title="Pricing & Margin Calculator",
-    page_icon="🧮",
-    layout="wide"
-)
+# Largest what-if grid (prices x scans x ad percentages) evaluated in one run
+MAX_WHATIF_CELLS = 50_000
 
 # Custom CSS for styling
 custom_css = """
@@ -272,17 +304,50 @@ custom_css = """
 </style>
 """
 
-# Apply custom CSS
-st.markdown(custom_css, unsafe_allow_html=True)
+# Minify the stylesheet once per process; it is re-sent on every full rerun
+@st.cache_resource
+def get_page_css():
+    """Custom CSS with comments and redundant whitespace removed"""
+    css = re.sub(r"/\*.*?\*/", "", custom_css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,>])\s*", r"\1", css).strip()
 
-# Initialize session state variables
-if 'scan_scenarios' not in st.session_state:
-    st.session_state.scan_scenarios = pd.DataFrame()
-    
-if 'h1_data' not in st.session_state:
-    # Create a placeholder H1Data dataframe
-    # In real use, this would be loaded from a file or database
-    st.session_state.h1_data = pd.DataFrame()
+# Read the logo once per process
+@st.cache_resource
+def get_logo_bytes():
+    """Logo image bytes, or None if image.png is missing"""
+    try:
+        with open(LOGO_PATH, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def configure_page():
+    """Page config and custom CSS; must run before any other Streamlit call"""
+    st.set_page_config(
+        page_title="Pricing & Margin Calculator",
+        page_icon="🧮",
+        layout="wide"
+    )
+
+    # Apply custom CSS
+    st.markdown(get_page_css(), unsafe_allow_html=True)
+
+# Saved scenarios live in a SQLite store shared by every session in the process
+@st.cache_resource
+def get_scenario_store():
+    """Open the scan-scenario store once per process"""
+    return ScenarioStore()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_saved_scenarios(version, filter_items):
+    """Filtered saved scenarios, read once per store version instead of on every fragment rerun
+
+    Args:
+        version (tuple): ScenarioStore.version(); any write changes it, so stale copies are never served
+        filter_items (tuple): (dimension, selected values) pairs
+    """
+    return get_scenario_store().load(**dict(filter_items))
 
 # Enhanced input validation function
 def format_numeric_input(value, decimal_places=2):
@@ -299,217 +364,210 @@ def format_numeric_input(value, decimal_places=2):
         # If conversion fails, return 0.0
         return 0.0
 
-# Helper function to calculate margins (similar to BuildMarginString in VBA)
-def calculate_margin(price, cost, scan, coupon):
-    if price > 0 and cost > 0:
-        gm = price - (cost - scan)
-        gm_per = gm / price
-        
-        gm_coupon = price - (cost - scan - coupon)
-        gm_coupon_per = gm_coupon / price
-        
-        return {
-            "gm_percent": gm_per * 100,
-            "gm_dollars": gm,
-            "gm_coupon_percent": gm_coupon_per * 100,
-            "gm_coupon_dollars": gm_coupon
-        }
-    else:
-        return {
-            "gm_percent": 0,
-            "gm_dollars": 0,
-            "gm_coupon_percent": 0,
-            "gm_coupon_dollars": 0
-        }
-
-# New function to calculate weighted averages (similar to CalculateWeightedAverage in VBA)
-def calculate_weighted_average(tpr_price, ad_price, bottle_cost, scan, coupon, ad_percentage):
-    """Calculate weighted average margins based on ad percentage"""
-    if ad_percentage is None or ad_percentage == "":
-        return None, None
-    
-    # Calculate TPR and Ad margins
-    tpr_margins = calculate_margin(tpr_price, bottle_cost, scan, coupon)
-    ad_margins = calculate_margin(ad_price, bottle_cost, scan, coupon)
-    
-    # Convert ad_percentage to decimal
-    ad_percentage_decimal = ad_percentage / 100
-    tpr_percentage = 1 - ad_percentage_decimal
-    
-    # Calculate weighted averages
-    weighted_gm_percent = (tpr_margins["gm_percent"] * tpr_percentage) + (ad_margins["gm_percent"] * ad_percentage_decimal)
-    weighted_gm_dollars = (tpr_margins["gm_dollars"] * tpr_percentage) + (ad_margins["gm_dollars"] * ad_percentage_decimal)
-    
-    return weighted_gm_percent, weighted_gm_dollars
-
 # Function to generate H1 data if not available
 def generate_sample_h1_data():
     """Generate sample H1 data for demo purposes"""
-    segments = ["Cordials", "Gin", "NAW", "RTD", "RTS", "Rum", "Scotch", "Tequila", "Vodka"]
-    sizes = ["1.75L", "1L", "750mL", "375mL", "355mL"]
+    return generate_brand_h1_data(brand_list[1:])
+
+# Product catalog, re-read when the file changes (or its effective day rolls over)
+@st.cache_resource(max_entries=4)
+def load_app_catalog(fingerprint, as_of):
+    """Load the product catalog once per file version and day
+
+    Returns:
+        tuple: (ProductCatalog or None, error message or None)
+    """
+    try:
+        return load_catalog(DEFAULT_CATALOG_PATH, as_of), None
+    except Exception as e:
+        return None, str(e)
+
+def get_catalog():
+    """Current product catalog, or None when there is no usable catalog file"""
+    if not os.path.exists(DEFAULT_CATALOG_PATH):
+        return None
     
-    data = []
+    catalog, error = load_app_catalog(source_fingerprint(DEFAULT_CATALOG_PATH), datetime.date.today())
+    if error:
+        st.warning(f"Could not load the product catalog from {os.path.basename(DEFAULT_CATALOG_PATH)} ({error}).")
+    return catalog
+
+def prefill_from_catalog(catalog):
+    """Fill segment, size, bottles/case and case cost from the catalog when the brand or size changes
+
+    Runs before the calculator widgets are created. Each catalog line is applied
+    once, so later manual edits stand until another brand, size or price is picked.
+    """
+    brand = st.session_state.get('calc_brand')
+    if brand not in catalog:
+        return
     
-    for segment in segments:
-        available_sizes = segment_size_combinations.get(segment, ["1.75L", "750mL"])
-        for size in available_sizes:
-            # Base value varies by segment and size to create realistic patterns
-            base_value = np.random.uniform(50000, 500000)
-            
-            # Create 27 weeks of data with some trends and randomness
-            weekly_values = []
-            for week in range(1, 28):
-                # Add seasonality and randomness
-                seasonal_factor = 1 + 0.2 * math.sin(week / 4)  # Creates a wave pattern
-                random_factor = np.random.uniform(0.8, 1.2)     # Random variation
-                
-                weekly_value = base_value * seasonal_factor * random_factor
-                weekly_values.append(weekly_value)
-            
-            row = [segment, size] + weekly_values
-            data.append(row)
+    # Keep the chosen size when the brand is listed in it, else take its first size
+    sizes = catalog.sizes_for(brand)
+    size = st.session_state.get('calc_size')
+    if size not in sizes:
+        size = sizes[0]
+        st.session_state.calc_size = size
     
-    # Create column names
-    columns = ["Segment", "Size"] + [f"Week {i}" for i in range(1, 28)]
+    item = catalog.item(brand, size)
+    prefill_key = (brand, size, item["bottles_per_case"], item["case_cost"], item["effective_date"])
+    if st.session_state.get('catalog_prefill') == prefill_key:
+        return
+    st.session_state.catalog_prefill = prefill_key
     
-    # Create DataFrame
-    df = pd.DataFrame(data, columns=columns)
-    return df
+    segment = display_segment_names.get(item["segment"], item["segment"])
+    if segment in segment_list:
+        st.session_state.calc_segment = segment
+    st.session_state.calc_bottles = int(item["bottles_per_case"])
+    st.session_state.calc_case_cost = round(float(item["case_cost"]), 2)
 
-# Generate H1 data if needed
-if st.session_state.h1_data.empty:
-    st.session_state.h1_data = generate_sample_h1_data()
+def init_session_state():
+    """Initialize session state variables"""
+    # Defaults of the calculator inputs the catalog prefills; the widgets take them from
+    # session_state, since a widget default set alongside the Session State API warns
+    for key, value in CALCULATOR_DEFAULTS.items():
+        st.session_state.setdefault(key, value)
+    
+    # Pin the process-wide H1 snapshot for this run, so fragment reruns use the same version;
+    # a changed H1 file is picked up on the next full rerun
+    snapshot = shared_snapshot(generate_sample_h1_data)
+    if snapshot.error and snapshot is not st.session_state.get('h1_snapshot'):
+        fallback = "Showing sample data instead." if snapshot.sample else "Still showing the previously loaded data."
+        st.warning(f"Could not load H1 data from {os.path.basename(DEFAULT_H1_PATH)} ({snapshot.error}). {fallback}")
+    st.session_state.h1_snapshot = snapshot
+
+def report_startup_time():
+    """Record import time and the duration of the first full run of a session"""
+    if 'startup_timing' in st.session_state:
+        return
+
+    timing = {
+        "import_ms": round(import_seconds * 1000, 1),
+        "first_run_ms": round((time.perf_counter() - script_start) * 1000, 1)
+    }
+    st.session_state.startup_timing = timing
+    metrics.set_gauge("session_start_ms", timing["import_ms"], phase="imports")
+    metrics.set_gauge("session_start_ms", timing["first_run_ms"], phase="first_run")
+    logger.info("Session start: imports %s ms, first run %s ms", timing["import_ms"], timing["first_run_ms"])
+
+# Normalized H1 history cubes, built once per shared H1 snapshot
+def get_h1_cube():
+    """Return the H1 history cube of this run's H1 snapshot"""
+    return st.session_state.h1_snapshot.cube
+
+def get_brand_cube():
+    """Return the brand x size history cube, or None when the H1 data has no brand rows"""
+    return st.session_state.h1_snapshot.brand_cube
+
+def get_h1_index(period=None):
+    """Return the ratio index of one H1 period (the latest by default)"""
+    return get_h1_cube().period_index(period)
 
 # Function to calculate index ratios from H1 data
-def get_index_ratios(segment, size):
+def get_index_ratios(segment, size, period=None):
     """Calculate index ratios for a given segment and size"""
     # Look up the correct segment name for data lookup
     data_segment = segment_mapping.get(segment, segment)
     
-    # Find the matching row in the H1 data
-    h1_data = st.session_state.h1_data
-    
-    if h1_data.empty:
-        return None, None, None
-        
-    # Make case-insensitive comparison
-    matching_row = h1_data[(h1_data['Segment'].str.upper() == data_segment.upper()) & 
-                           (h1_data['Size'].str.upper() == size.upper())]
-    
-    if matching_row.empty:
+    metrics.increment("h1_lookups_total", level="segment")
+    return get_h1_index(period).lookup(data_segment, size)
+
+def get_brand_index_ratios(brand, size, period=None):
+    """Index ratios of a brand's own RSV for a size, or (None, None, None) without brand data"""
+    brand_cube = get_brand_cube()
+    if brand_cube is None or (period is not None and period not in brand_cube.periods):
         return None, None, None
-        
-    # Get week columns (all columns except the first two)
-    week_cols = h1_data.columns[2:]
     
-    # Extract weekly data
-    weekly_data = matching_row.iloc[0, 2:].values.astype(float)
-    
-    # Calculate average weekly RSV
-    avg_weekly_rsv = weekly_data.mean()
-    
-    # Calculate standard deviation
-    std_dev = weekly_data.std()
-    
-    # Calculate threshold for highlighting
-    threshold = std_dev / avg_weekly_rsv if avg_weekly_rsv > 0 else 0
-    
-    # Calculate index ratios
-    index_ratios = [val / avg_weekly_rsv if avg_weekly_rsv > 0 else 0 for val in weekly_data]
-    
-    return index_ratios, avg_weekly_rsv, threshold
+    metrics.increment("h1_lookups_total", level="brand")
+    return brand_cube.period_index(period).lookup(brand, size)
 
-# Function to export to Excel
-def to_excel(df):
-    """Convert dataframe to Excel file"""
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, sheet_name='Scan Scenarios', index=False)
-    
-    # Get the workbook and worksheet objects
-    workbook = writer.book
-    worksheet = writer.sheets['Scan Scenarios']
-    
-    # Set column width and formats
-    format_currency = workbook.add_format({'num_format': '$#,##0.00'})
-    format_percent = workbook.add_format({'num_format': '0.0%'})
-    
-    # Format currency columns
-    for i, col in enumerate(df.columns):
-        if "Price" in col or "Cost" in col or "Scan" in col or "Coupon" in col or "GM $" in col:
-            worksheet.set_column(i, i, 12, format_currency)
-        elif "GM %" in col or "% on Ad" in col:
-            worksheet.set_column(i, i, 12, format_percent)
-        else:
-            worksheet.set_column(i, i, 15)
-    
-    # Freeze top row and make it bold
-    worksheet.freeze_panes(1, 0)
-    header_format = workbook.add_format({'bold': True})
-    worksheet.set_row(0, None, header_format)
-    
-    writer.close()
-    return output.getvalue()
+# Reverse of segment_mapping (data name -> display name), built once
+display_segment_names = {v: k for k, v in segment_mapping.items()}
 
-def export_segment_size_index_ratios():
+# Columns of the index ratio export: (column name, data segment, size)
+index_ratio_export_columns = [
+    (f"{display_segment_names.get(segment, segment)} | {size}", segment, size)
+    for segment, sizes in segment_size_combinations.items()
+    for size in sizes
+]
+
+def export_file(export_name, writer, df, **kwargs):
+    """Build an Excel or Parquet export as bytes for st.download_button, timing it and counting its size"""
+    # Streamlit keeps the payload in memory anyway, so hand it bytes and close the temp file
+    with metrics.timed(f"export_{export_name}"):
+        with export_to_tempfile(writer, df, **kwargs) as output:
+            data = output.read()
+    metrics.increment("export_bytes_total", len(data), export=export_name)
+    metrics.flush()
+    return data
+
+def export_segment_size_index_ratios(period=None):
     """Create a dataframe with segment size index ratios for all combinations"""
-    # Format date for week labels
-    current_year = datetime.datetime.now().year
-    week_start_date = datetime.datetime(current_year, 6, 30)
-    
-    # Create week labels
-    week_labels = []
-    for i in range(1, 28):
-        week_end_date = week_start_date + datetime.timedelta(days=6)
-        if i == 1:
-            week_label = f"{i}: Jun 30-Jul 6"
-        else:
-            week_label = f"{i}: {week_start_date.strftime('%b %d')}-{week_end_date.strftime('%b %d')}"
-        week_labels.append(week_label)
-        week_start_date += datetime.timedelta(days=7)
+    # The index caches the matrix, so the preview and the Excel export share it
+    return get_h1_index(period).ratio_frame(index_ratio_export_columns)
+
+def select_h1_period(container, key):
+    """Period picker shown when the H1 data holds more than one period; returns (year, half)"""
+    periods = get_h1_cube().periods
+    if len(periods) == 1:
+        return periods[0]
+    return container.selectbox("H1 Period", periods, index=len(periods) - 1, format_func=period_label, key=key)
+
+def rerun_calculator_and_h1_panel():
+    """Widget callback: rerun the calculator and the H1 panel, which follows the calculator's brand"""
+    st.rerun(["calculator", "h1_panel"])
+
+@st.fragment(key="calculator")
+@metrics.timed_section("calculator")
+def create_calculator_ui():
+    # Runs as a fragment: editing an input reruns only the calculator, not the whole app
+    with st.sidebar:
+        # Optional batch mode: inputs apply together when the form is submitted
+        form_mode = st.toggle("Apply inputs on submit", value=False, key="calc_form_mode",
+                              help="Collect all input changes and recalculate once when you click Apply.")
     
-    # Create dataframe with week labels as index
-    df = pd.DataFrame(index=week_labels)
+    # Picking a catalog brand or size prefills the inputs and limits sizes to the brand's
+    catalog = get_catalog()
+    if catalog:
+        prefill_from_catalog(catalog)
+        brand_options = brand_list + [b for b in catalog.brands if b not in brand_list]
+    else:
+        brand_options = brand_list
     
-    # Add columns for each segment/size combination
-    for segment, sizes in segment_size_combinations.items():
-        display_segment = next((k for k, v in segment_mapping.items() if v == segment), segment)
-        
-        for size in sizes:
-            # Get index ratios for this segment/size combo
-            index_ratios, avg_weekly_rsv, threshold = get_index_ratios(display_segment, size)
-            
-            if index_ratios:
-                # Add the column to the dataframe
-                column_name = f"{display_segment} | {size}"
-                df[column_name] = index_ratios
+    selected_brand = st.session_state.get('calc_brand')
+    size_choices = size_options[:1] + catalog.sizes_for(selected_brand) if catalog and selected_brand in catalog else size_options
     
-    return df
-
-def create_calculator_ui():
     # Create sidebar for inputs
-    with st.sidebar:
+    with st.sidebar, (st.form("calculator_inputs", border=False) if form_mode else st.container()):
         # Create two columns for brand/segment/size inputs
-        cols = st.sidebar.columns(2)
+        cols = st.columns(2)
         
         # Left column
-        brand = cols[0].selectbox("Brand", brand_list, index=0)
-        segment = cols[0].selectbox("Segment", segment_list, index=0)
+        # A brand change also reruns the H1 panel (widgets in a form cannot have callbacks; Apply does it there)
+        brand = cols[0].selectbox("Brand", brand_options, index=0, key="calc_brand",
+                                  on_change=None if form_mode else rerun_calculator_and_h1_panel)
+        segment = cols[0].selectbox("Segment", segment_list, key="calc_segment")
         
         # Right column
-        size = cols[1].selectbox("Size", size_options, index=0)
-        customer_state = cols[1].text_input("Customer", "")
+        size = cols[1].selectbox("Size", size_choices, key="calc_size")
+        customer_state = cols[1].text_input("Customer", "", key="calc_customer")
+        
+        # Catalog line behind the prefilled inputs
+        item = catalog.item(brand, size) if catalog else None
+        if item:
+            effective = f", effective {item['effective_date']:%b %d, %Y}" if item["effective_date"] else ""
+            st.caption(f"Catalog: {item['bottles_per_case']}/cs at ${item['case_cost']:.2f}{effective}")
         
         # Add a separator
         st.markdown("---")
         
         # Cost inputs (full width for visibility)
-        cols = st.sidebar.columns(2)
+        cols = st.columns(2)
         
-        case_cost_input = cols[0].number_input("Case Cost ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f")
+        case_cost_input = cols[0].number_input("Case Cost ($)", min_value=0.0, step=0.01, format="%.2f", key="calc_case_cost")
         case_cost = format_numeric_input(case_cost_input, 2)
         
-        bottles_per_case_input = cols[1].number_input("Bottles/Case", min_value=1, value=12, step=1)
+        bottles_per_case_input = cols[1].number_input("Bottles/Case", min_value=1, step=1, key="calc_bottles")
         bottles_per_case = int(format_numeric_input(bottles_per_case_input, 0))
         
         # Calculate bottle cost automatically
@@ -521,181 +579,240 @@ def create_calculator_ui():
         st.text(f"Bottle Cost: ${bottle_cost:.2f}")
         
         # Scan and coupon inputs in columns
-        cols = st.sidebar.columns(2)
+        cols = st.columns(2)
         
-        base_scan_input = cols[0].number_input("Base Scan ($)", min_value=0.0, value=0.0, step=0.25, format="%.2f")
+        base_scan_input = cols[0].number_input("Base Scan ($)", min_value=0.0, value=0.0, step=0.25, format="%.2f", key="calc_base_scan")
         base_scan = format_numeric_input(base_scan_input, 2)
         
-        deep_scan_input = cols[1].number_input("Deep Scan ($)", min_value=0.0, value=0.0, step=0.25, format="%.2f")
+        deep_scan_input = cols[1].number_input("Deep Scan ($)", min_value=0.0, value=0.0, step=0.25, format="%.2f", key="calc_deep_scan")
         deep_scan = format_numeric_input(deep_scan_input, 2)
         
         # Coupon input (full width)
-        coupon_input = st.number_input("Coupon ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f")
+        coupon_input = st.number_input("Coupon ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f", key="calc_coupon")
         coupon = format_numeric_input(coupon_input, 2)
         
         # Add a separator
         st.markdown("---")
         
         # Pricing inputs
-        cols = st.sidebar.columns(2)
+        cols = st.columns(2)
         
-        edlp_price_input = cols[0].number_input("EDLP ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f")
+        edlp_price_input = cols[0].number_input("EDLP ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f", key="calc_edlp")
         edlp_price = format_numeric_input(edlp_price_input, 2)
         
         # Empty space in right column to align
         cols[1].text("")
         
-        cols = st.sidebar.columns(2)
+        cols = st.columns(2)
         
-        tpr_base_price_input = cols[0].number_input("TPR Base ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f")
+        tpr_base_price_input = cols[0].number_input("TPR Base ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f", key="calc_tpr_base")
         tpr_base_price = format_numeric_input(tpr_base_price_input, 2)
         
-        tpr_deep_price_input = cols[1].number_input("TPR Deep ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f")
+        tpr_deep_price_input = cols[1].number_input("TPR Deep ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f", key="calc_tpr_deep")
         tpr_deep_price = format_numeric_input(tpr_deep_price_input, 2)
         
-        cols = st.sidebar.columns(2)
+        cols = st.columns(2)
         
-        ad_base_price_input = cols[0].number_input("Ad Base ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f")
+        ad_base_price_input = cols[0].number_input("Ad Base ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f", key="calc_ad_base")
         ad_base_price = format_numeric_input(ad_base_price_input, 2)
         
-        ad_deep_price_input = cols[1].number_input("Ad Deep ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f")
+        ad_deep_price_input = cols[1].number_input("Ad Deep ($)", min_value=0.0, value=0.0, step=0.01, format="%.2f", key="calc_ad_deep")
         ad_deep_price = format_numeric_input(ad_deep_price_input, 2)
         
         # Add a separator before ad percentages
         st.markdown("---")
         st.markdown("### Ad Percentages")
         
-        cols = st.sidebar.columns(2)
+        cols = st.columns(2)
         
-        ad_percentage_base_input = cols[0].number_input("% on Ad (Base)", min_value=0, max_value=100, value=0, step=1)
+        ad_percentage_base_input = cols[0].number_input("% on Ad (Base)", min_value=0, max_value=100, value=0, step=1, key="calc_ad_pct_base")
         ad_percentage_base = format_numeric_input(ad_percentage_base_input, 0)
         
-        ad_percentage_deep_input = cols[1].number_input("% on Ad (Deep)", min_value=0, max_value=100, value=0, step=1)
+        ad_percentage_deep_input = cols[1].number_input("% on Ad (Deep)", min_value=0, max_value=100, value=0, step=1, key="calc_ad_pct_deep")
         ad_percentage_deep = format_numeric_input(ad_percentage_deep_input, 0)
-
-    # Calculate margins for Everyday Price
-    edlp_margins = calculate_margin(edlp_price, bottle_cost, 0, coupon)
-
-    # Calculate margins for other pricing scenarios
-    tpr_base_margins = calculate_margin(tpr_base_price, bottle_cost, base_scan, coupon)
-    tpr_deep_margins = calculate_margin(tpr_deep_price, bottle_cost, deep_scan, coupon)
-    ad_base_margins = calculate_margin(ad_base_price, bottle_cost, base_scan, coupon)
-    ad_deep_margins = calculate_margin(ad_deep_price, bottle_cost, deep_scan, coupon)
-    
-    # Calculate weighted averages
-    weighted_base_percent, weighted_base_dollars = calculate_weighted_average(
-        tpr_base_price, ad_base_price, bottle_cost, base_scan, coupon, ad_percentage_base)
-    
-    weighted_deep_percent, weighted_deep_dollars = calculate_weighted_average(
-        tpr_deep_price, ad_deep_price, bottle_cost, deep_scan, coupon, ad_percentage_deep)
-
-    # Create data for the pricing comparison table (including Everyday Price)
-    pricing_data = {
-        "Pricing Scenario": ["Everyday Price", "TPR (Base Scan)", "TPR (Deep Scan)", "Ad/Feature (Base Scan)", "Ad/Feature (Deep Scan)"],
-        "Price": [f"${edlp_price:.2f}", f"${tpr_base_price:.2f}", f"${tpr_deep_price:.2f}", f"${ad_base_price:.2f}", f"${ad_deep_price:.2f}"],
-        "Gross Margin %": [f"{edlp_margins['gm_percent']:.1f}%", f"{tpr_base_margins['gm_percent']:.1f}%", 
-                          f"{tpr_deep_margins['gm_percent']:.1f}%", f"{ad_base_margins['gm_percent']:.1f}%", 
-                          f"{ad_deep_margins['gm_percent']:.1f}%"],
-        "Gross Margin $": [f"${edlp_margins['gm_dollars']:.2f}", f"${tpr_base_margins['gm_dollars']:.2f}", 
-                          f"${tpr_deep_margins['gm_dollars']:.2f}", f"${ad_base_margins['gm_dollars']:.2f}", 
-                          f"${ad_deep_margins['gm_dollars']:.2f}"],
-        "With Coupon %": [f"{edlp_margins['gm_coupon_percent']:.1f}%", f"{tpr_base_margins['gm_coupon_percent']:.1f}%", 
-                         f"{tpr_deep_margins['gm_coupon_percent']:.1f}%", f"{ad_base_margins['gm_coupon_percent']:.1f}%", 
-                         f"{ad_deep_margins['gm_coupon_percent']:.1f}%"],
-        "With Coupon $": [f"${edlp_margins['gm_coupon_dollars']:.2f}", f"${tpr_base_margins['gm_coupon_dollars']:.2f}", 
-                         f"${tpr_deep_margins['gm_coupon_dollars']:.2f}", f"${ad_base_margins['gm_coupon_dollars']:.2f}", 
-                         f"${ad_deep_margins['gm_coupon_dollars']:.2f}"]
-    }
-    
-    # Add weighted average information if ad percentages are provided
-    if ad_percentage_base > 0 or ad_percentage_deep > 0:
-        pricing_data["% on Ad"] = ["N/A", f"{ad_percentage_base:.0f}%", f"{ad_percentage_deep:.0f}%", "N/A", "N/A"]
-        
-        if weighted_base_percent is not None:
-            pricing_data["Weighted Avg GM %"] = ["N/A", f"{weighted_base_percent:.1f}%", 
-                                               f"{weighted_deep_percent:.1f}%" if weighted_deep_percent is not None else "N/A", 
-                                               "N/A", "N/A"]
-            
-        if weighted_base_dollars is not None:
-            pricing_data["Weighted Avg GM $"] = ["N/A", f"${weighted_base_dollars:.2f}", 
-                                               f"${weighted_deep_dollars:.2f}" if weighted_deep_dollars is not None else "N/A",
-                                               "N/A", "N/A"]
-
-    # Create the HTML table
-    table_html = "<table class='pricing-table'><thead><tr>"
-    # Add headers
-    for col in pricing_data.keys():
-        table_html += f"<th>{col}</th>"
-    table_html += "</tr></thead><tbody>"
-
-    # Add rows
-    for i in range(len(pricing_data["Pricing Scenario"])):
-        # Add special highlighting class for Everyday Price row
-        if i == 0:  # Everyday Price is the first row
-            table_html += "<tr class='everyday-row'>"
-        else:
-            table_html += "<tr>"
         
-        for col in pricing_data.keys():
-            table_html += f"<td>{pricing_data[col][i]}</td>"
-        table_html += "</tr>"
-    table_html += "</tbody></table>"
+        if form_mode:
+            st.form_submit_button("Apply", type="primary", on_click=rerun_calculator_and_h1_panel)
+    
+    # Price-list updates: re-read the catalog file without restarting the app
+    if catalog and st.sidebar.button("Reload Catalog", key="catalog_reload"):
+        load_app_catalog.clear()
+        st.rerun()
+
+    # Margins and HTML are memoized on the inputs, so an unchanged table costs nothing
+    table_html = pricing_table_html(edlp_price, tpr_base_price, tpr_deep_price, ad_base_price, ad_deep_price,
+                                    bottle_cost, base_scan, deep_scan, coupon,
+                                    ad_percentage_base, ad_percentage_deep)
 
     # Display the table
     st.markdown(table_html, unsafe_allow_html=True)
 
+    # Current sidebar inputs in saved-scenario column names
+    scenario_inputs = pd.DataFrame([{
+        "Brand": brand,
+        "Segment": segment,
+        "Size": size,
+        "Customer/State": customer_state,
+        "Case Cost": case_cost,
+        "# Bottles/Cs": bottles_per_case,
+        "Base Scan": base_scan,
+        "Deep Scan": deep_scan,
+        "Coupon": coupon,
+        "Everyday Shelf Price": edlp_price,
+        "TPR Price (Base Scan)": tpr_base_price,
+        "TPR Price (Deep Scan)": tpr_deep_price,
+        "Ad/Feature Price (Base Scan)": ad_base_price,
+        "Ad/Feature Price (Deep Scan)": ad_deep_price,
+        "% on Ad (Base)": ad_percentage_base,
+        "% on Ad (Deep)": ad_percentage_deep
+    }])
+
     # Add Save Scan Scenario button below the main table
     if st.button("Save Scan Scenario"):
-        # Create a row with all the data in the flat format
-        scenario_data = {
-            "Brand": brand,
-            "Segment": segment,
-            "Size": size,
-            "Case Cost": case_cost,
-            "# Bottles/Cs": bottles_per_case,
-            "Bottle Cost": bottle_cost,
-            "Base Scan": base_scan,
-            "Deep Scan": deep_scan,
-            "Coupon": coupon,
-            "Customer/State": customer_state,
-            "Everyday Shelf Price": edlp_price,
-            "Everyday GM %": edlp_margins["gm_percent"],
-            "Everyday GM $": edlp_margins["gm_dollars"],
-            "Everyday GM % (With Coupon)": edlp_margins["gm_coupon_percent"],
-            "TPR Price (Base Scan)": tpr_base_price,
-            "TPR GM % (Base Scan)": tpr_base_margins["gm_percent"],
-            "TPR GM $ (Base Scan)": tpr_base_margins["gm_dollars"],
-            "TPR GM % (With Coupon)": tpr_base_margins["gm_coupon_percent"],
-            "TPR Price (Deep Scan)": tpr_deep_price,
-            "TPR GM % (Deep Scan)": tpr_deep_margins["gm_percent"],
-            "TPR GM $ (Deep Scan)": tpr_deep_margins["gm_dollars"],
-            "TPR GM % (With Coupon)": tpr_deep_margins["gm_coupon_percent"],
-            "Ad/Feature Price (Base Scan)": ad_base_price,
-            "Ad GM % (Base Scan)": ad_base_margins["gm_percent"],
-            "Ad GM $ (Base Scan)": ad_base_margins["gm_dollars"],
-            "Ad GM % (With Coupon)": ad_base_margins["gm_coupon_percent"],
-            "Ad/Feature Price (Deep Scan)": ad_deep_price,
-            "Ad GM % (Deep Scan)": ad_deep_margins["gm_percent"],
-            "Ad GM $ (Deep Scan)": ad_deep_margins["gm_dollars"],
-            "Ad GM % (With Coupon)": ad_deep_margins["gm_coupon_percent"],
-            "% on Ad (Base)": ad_percentage_base,
-            "Weighted Avg GM % (Base)": weighted_base_percent if weighted_base_percent is not None else 0,
-            "Weighted Avg GM $ (Base)": weighted_base_dollars if weighted_base_dollars is not None else 0,
-            "% on Ad (Deep)": ad_percentage_deep,
-            "Weighted Avg GM % (Deep)": weighted_deep_percent if weighted_deep_percent is not None else 0,
-            "Weighted Avg GM $ (Deep)": weighted_deep_dollars if weighted_deep_dollars is not None else 0
-        }
-        
-        # Create a DataFrame with the scenario data
-        new_scenario = pd.DataFrame([scenario_data])
-        
-        # Append to scan scenarios
-        if st.session_state.scan_scenarios.empty:
-            st.session_state.scan_scenarios = new_scenario
-        else:
-            st.session_state.scan_scenarios = pd.concat([st.session_state.scan_scenarios, new_scenario], ignore_index=True)
+        # Price the inputs through the same builder the bulk-pricing CLI uses
+        new_scenario = build_scenario_frame(scenario_inputs)
+        
+        # Append to the shared scenario store
+        get_scenario_store().append(new_scenario)
         
+        # Rerun the whole app so the Saved Scenarios tab picks up the new row
+        st.session_state.scenario_saved = True
+        st.rerun()
+    
+    if st.session_state.pop('scenario_saved', False):
         st.success("Scan scenario saved successfully!")
+    
+    # What-if sweep around the current inputs
+    create_whatif_ui(bottle_cost, coupon, ad_base_price, tpr_base_price, base_scan)
+    
+    # Inverse mode: what it takes to reach a GM % goal
+    create_target_solver_ui(scenario_inputs)
+
+def create_target_solver_ui(scenario_inputs):
+    """Create the target-margin solver for the current inputs or an uploaded SKU list"""
+    with st.expander("Target Margin Solver"):
+        cols = st.columns(3)
+        target_percent = cols[0].number_input("Target GM (%)", min_value=0.0, max_value=99.9, value=25.0, step=0.5, format="%.1f", key="solver_target")
+        with_coupon = cols[1].checkbox("Target GM % with coupon", value=False, key="solver_with_coupon")
+        endings = cols[2].multiselect("Snap prices to endings", [".99", ".49", ".79", ".29"], default=[".99", ".49"], key="solver_endings")
+        price_endings = tuple(float(e) for e in endings)
+        
+        # Solve for the sidebar inputs
+        solved = solve_scenario_targets(scenario_inputs, target_percent, with_coupon, price_endings)
+        rows = []
+        for label, price_col, scan_col in PRICING_SCENARIOS:
+            required_scan = solved[f"{label} Required Scan"].iloc[0] if scan_col else None
+            rows.append({
+                "Pricing Scenario": label,
+                "Required Price": solved[f"{label} Required Price"].iloc[0],
+                "Required Scan": required_scan,
+                "Max Case Cost": solved[f"{label} Max Case Cost"].iloc[0]
+            })
+        st.dataframe(pd.DataFrame(rows).style.format({
+            "Required Price": "${:.2f}", "Required Scan": "${:.2f}", "Max Case Cost": "${:.2f}"
+        }, na_rep="N/A"), hide_index=True)
+        st.caption("Required price uses each scenario's scan; required scan and max case cost use each scenario's price. "
+                   "N/A means the target cannot be reached with these inputs; a required price of $0.00 (or the lowest "
+                   "ending) means the scan and coupon cover the cost, so any price reaches it.")
+        
+        # Batch mode over a whole SKU list
+        sku_file = st.file_uploader("Solve a SKU list (CSV with the bulk-pricing input columns)", type=["csv"], key="solver_upload")
+        if sku_file is not None:
+            try:
+                batch = solve_scenario_targets(pd.read_csv(sku_file, dtype={col: str for col in DIMENSION_COLUMNS}),
+                                               target_percent, with_coupon, price_endings)
+            except (ValueError, pd.errors.ParserError) as e:
+                st.error(f"Could not read the SKU list: {e}")
+            else:
+                st.dataframe(batch)
+                st.download_button("Download solved SKU list", batch.to_csv(index=False), file_name="target_margin_solution.csv", mime="text/csv")
+
+def create_whatif_ui(bottle_cost, coupon, ad_price, tpr_price, scan):
+    """Create the TPR price x scan x % on Ad what-if grid with a heatmap"""
+    with st.expander("What-If Grid: TPR Price × Scan × % on Ad"):
+        if bottle_cost <= 0:
+            st.info("Enter a case cost to sweep prices and scans.")
+            return
+        
+        # Default ranges center on the sidebar inputs
+        default_price = tpr_price if tpr_price > 0 else round(bottle_cost * 2, 2)
+        
+        cols = st.columns(3)
+        price_from = cols[0].number_input("TPR Price From ($)", min_value=0.01, value=max(round(default_price - 5, 2), 0.01), step=0.50, format="%.2f", key="whatif_price_from")
+        price_to = cols[1].number_input("TPR Price To ($)", min_value=0.01, value=round(default_price + 5, 2), step=0.50, format="%.2f", key="whatif_price_to")
+        price_step = cols[2].number_input("Price Step ($)", min_value=0.01, value=0.50, step=0.01, format="%.2f", key="whatif_price_step")
+        
+        cols = st.columns(3)
+        scan_from = cols[0].number_input("Scan From ($)", min_value=0.0, value=0.0, step=0.25, format="%.2f", key="whatif_scan_from")
+        scan_to = cols[1].number_input("Scan To ($)", min_value=0.0, value=max(6.0, scan), step=0.25, format="%.2f", key="whatif_scan_to")
+        scan_step = cols[2].number_input("Scan Step ($)", min_value=0.01, value=0.25, step=0.05, format="%.2f", key="whatif_scan_step")
+        
+        cols = st.columns(3)
+        ad_step = cols[0].number_input("% on Ad Step", min_value=1, max_value=100, value=5, step=1, key="whatif_ad_step")
+        whatif_ad_price = cols[1].number_input("Ad Price ($)", min_value=0.0, value=ad_price, step=0.01, format="%.2f", key="whatif_ad_price")
+        margin_floor = cols[2].number_input("Margin Floor (%)", min_value=0.0, max_value=100.0, value=25.0, step=0.5, format="%.1f", key="whatif_floor")
+        
+        tpr_prices = value_range(price_from, price_to, price_step)
+        scans = value_range(scan_from, scan_to, scan_step)
+        ad_percentages = value_range(0, 100, ad_step, include_stop=True)
+        
+        n_cells = len(tpr_prices) * len(scans) * len(ad_percentages)
+        if n_cells > MAX_WHATIF_CELLS:
+            st.error(f"This grid has {n_cells:,} cells; the limit is {MAX_WHATIF_CELLS:,}. "
+                     "Narrow the ranges or use larger steps.")
+            return
+        
+        # Full price x scan x % on Ad surface in one vectorized pass
+        grid = margin_grid(tpr_prices, scans, ad_percentages, whatif_ad_price, bottle_cost, coupon)
+        
+        cols = st.columns(2)
+        metric = cols[0].selectbox("Metric", ["Weighted Avg GM %", "Weighted Avg GM $", "TPR GM %"], key="whatif_metric")
+        ad_percentage = cols[1].select_slider("% on Ad", options=ad_percentages.tolist(), value=ad_percentages[0], key="whatif_ad_slice")
+        ad_idx = int(np.searchsorted(ad_percentages, ad_percentage))
+        
+        if metric == "TPR GM %":
+            surface = grid["tpr_gm_percent"]
+            floor_surface = surface
+        elif metric == "Weighted Avg GM $":
+            surface = grid["weighted_gm_dollars"][:, :, ad_idx]
+            floor_surface = grid["weighted_gm_percent"][:, :, ad_idx]
+        else:
+            surface = grid["weighted_gm_percent"][:, :, ad_idx]
+            floor_surface = surface
+        
+        floor_prices = margin_floor_contour(tpr_prices, floor_surface, margin_floor)
+        
+        st.caption(f"{grid['weighted_gm_percent'].size:,} cells evaluated. "
+                   f"Line: lowest TPR price with GM % at or above the {margin_floor:.1f}% floor.")
+        st.altair_chart(build_whatif_heatmap(tpr_prices, scans, surface, floor_prices, metric), width="stretch")
+
+def build_whatif_heatmap(tpr_prices, scans, surface, floor_prices, metric):
+    """Heatmap of a (prices, scans) surface with the margin-floor line on top"""
+    import altair as alt
+    
+    price_grid, scan_grid = np.meshgrid(tpr_prices, scans, indexing="ij")
+    cells = pd.DataFrame({
+        "TPR Price": price_grid.ravel(),
+        "Scan": scan_grid.ravel(),
+        metric: surface.ravel()
+    })
+    value_format = "$.2f" if "$" in metric else ".1f"
+    
+    heatmap = alt.Chart(cells).mark_rect().encode(
+        x=alt.X("TPR Price:O", axis=alt.Axis(format="$.2f")),
+        y=alt.Y("Scan:O", sort="descending", axis=alt.Axis(format="$.2f")),
+        color=alt.Color(f"{metric}:Q", scale=alt.Scale(scheme="redyellowgreen")),
+        tooltip=[alt.Tooltip("TPR Price:Q", format="$.2f"), alt.Tooltip("Scan:Q", format="$.2f"),
+                 alt.Tooltip(f"{metric}:Q", format=value_format)]
+    )
+    
+    floor_line = pd.DataFrame({"TPR Price": floor_prices, "Scan": scans}).dropna()
+    contour = alt.Chart(floor_line).mark_line(color="black", strokeWidth=2, point=True).encode(
+        x=alt.X("TPR Price:O"),
+        y=alt.Y("Scan:O", sort="descending")
+    )
+    
+    return alt.layer(heatmap, contour)
 
 def create_h1_data_analysis_ui(container):
     """Create the UI for H1 Data Analysis section"""
@@ -713,82 +830,121 @@ def create_h1_data_analysis_ui(container):
         
     size = container.selectbox("Select Size", valid_sizes, index=0, key='h1_size', label_visibility="collapsed")
     
+    # Fiscal period, when the H1 data covers several
+    period = select_h1_period(container, 'h1_period')
+    
+    # The calculator's brand, read from its widget state; changing it reruns this panel with the calculator
+    brand = st.session_state.get('calc_brand', brand_list[0])
+    brand_selected = brand != brand_list[0] and st.session_state.h1_snapshot.brand_in_segment(brand, data_segment)
+    
     # Display the index ratios in a colored list if data is available
     if segment != "-- Select Segment --" and size != "-- Select Size --":
-        index_ratios, avg_weekly_rsv, threshold = get_index_ratios(segment, size)
+        # The brand's own seasonality when it sells in this segment and has H1 data in this size, else the segment's
+        brand_ratios = get_brand_index_ratios(brand, size, period) if brand_selected else (None, None, None)
+        if brand_ratios[1]:
+            index_ratios, avg_weekly_rsv, threshold = brand_ratios
+            h1_index, lookup_key = get_brand_cube().period_index(period), brand
+            container.caption(f"Brand seasonality: {brand}")
+        else:
+            index_ratios, avg_weekly_rsv, threshold = get_index_ratios(segment, size, period)
+            h1_index, lookup_key = get_h1_index(period), data_segment
+            if brand_selected and get_brand_cube() is not None:
+                container.caption(f"No H1 data for {brand} in {size}; showing {segment}.")
         
         if avg_weekly_rsv:
             container.markdown(f"<p style='margin-bottom:5px;'>Average Weekly RSV: <strong>${avg_weekly_rsv/1000000:.2f}M</strong></p>", unsafe_allow_html=True)
             
+            # Change against the same half of the previous year
+            yoy_change, _ = h1_index.yoy(lookup_key, size)
+            if yoy_change is not None:
+                container.markdown(f"<p style='margin-bottom:5px;'>YoY vs {period_label(h1_index.previous_period)}: <strong>{yoy_change:+.1%}</strong></p>", unsafe_allow_html=True)
+            
             if index_ratios is not None:
-                # Format date for week labels
-                current_year = datetime.datetime.now().year
-                week_start_date = datetime.datetime(current_year, 6, 30)
+                # Week labels for the selected period
+                week_labels = h1_index.week_labels
                 
-                # Create a colored list to display the data
-                list_html = "<div style='max-height:400px; overflow-y:auto; background-color:#f8f9fa; padding:8px; border-radius:5px; font-size:0.9rem;'>"
-                
-                for i, ratio in enumerate(index_ratios):
-                    week_end_date = week_start_date + datetime.timedelta(days=6)
-                    
-                    if i == 0:
-                        week_label = f"1: Jun 30-Jul 6"
-                    else:
-                        week_label = f"{i+1}: {week_start_date.strftime('%b %d')}-{week_end_date.strftime('%b %d')}"
-                    
-                    # Determine color based on ratio value compared to threshold
-                    color = "#333333"  # Default dark gray
-                    bg_color = ""
-                    if avg_weekly_rsv > 0:
-                        if ratio > 1 + threshold:
-                            color = "#228B22"  # Forest green
-                            bg_color = "background-color:#e6f4ea;"
-                        elif ratio < 1 - (0.5 * threshold):
-                            color = "#8B0000"  # Deep red
-                            bg_color = "background-color:#fae9e8;"
-                    
-                    list_html += f"<div style='padding:3px 6px; margin-bottom:2px; {bg_color} border-radius:3px;'><span style='display:inline-block; width:110px; font-size:0.8rem;'>{week_label}</span> <span style='font-weight:bold; color:{color};'>{ratio:.0%}</span></div>"
-                    
-                    week_start_date += datetime.timedelta(days=7)
-                    
-                list_html += "</div>"
+                # Memoized on the ratios, so an unchanged selection re-uses the finished HTML
+                list_html = week_list_html(week_labels, tuple(index_ratios), avg_weekly_rsv, threshold)
                 
                 # Display the list
                 container.markdown(list_html, unsafe_allow_html=True)
         else:
             container.info("No data available for this selection.")
 
+@st.fragment(key="h1_panel")
+@metrics.timed_section("h1_panel")
+def create_h1_panel():
+    """H1 Data Analysis side panel, rerun independently of the calculator"""
+    st.markdown("<div class='side-panel'>", unsafe_allow_html=True)
+    create_h1_data_analysis_ui(st)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+@st.fragment
+@metrics.timed_section("scenarios")
 def create_scenarios_ui():
-    """Create the UI for Saved Scan Scenarios tab"""
+    """Create the UI for Saved Scan Scenarios tab (reruns on its own as a fragment)"""
     st.markdown("<h2>Saved Scan Scenarios</h2>", unsafe_allow_html=True)
 
-    if st.session_state.scan_scenarios.empty:
+    store = get_scenario_store()
+    version = store.version()
+    
+    if st.session_state.get('scenarios_deleted') is not None:
+        st.success(f"Deleted {st.session_state.pop('scenarios_deleted'):,} scan scenarios.")
+
+    if version[1] == 0:
         st.info("No scan scenarios saved yet. Use the 'Save Scan Scenario' button in the Calculator tab to save scenarios.")
     else:
-        # Handle column name compatibility between "Market" and "Customer/State"
-        if 'Customer/State' not in st.session_state.scan_scenarios.columns and 'Market' in st.session_state.scan_scenarios.columns:
-            st.session_state.scan_scenarios = st.session_state.scan_scenarios.rename(columns={'Market': 'Customer/State'})
+        # Filter on the indexed dimension columns
+        filter_cols = st.columns(len(DIMENSION_COLUMNS))
+        filters = {}
+        for filter_col, dimension in zip(filter_cols, DIMENSION_COLUMNS):
+            filters[dimension] = filter_col.multiselect(dimension, store.distinct(dimension), key=f"scenario_filter_{dimension}")
+        
+        scan_scenarios = load_saved_scenarios(version, tuple((dim, tuple(values)) for dim, values in filters.items()))
         
-        # Display the scenarios using Streamlit's dataframe
-        st.dataframe(st.session_state.scan_scenarios)
+        # Display the scenarios using Streamlit's dataframe; rows can be picked for commentary when it is set up
+        if commentary.ENABLED:
+            table = st.dataframe(scan_scenarios, on_select="rerun", selection_mode="multi-row", key="scenario_table")
+        else:
+            st.dataframe(scan_scenarios)
         
         # Export buttons
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            if st.button("Export Scan Scenarios to Excel"):
-                # Convert dataframe to excel
-                excel_file = to_excel(st.session_state.scan_scenarios)
-                b64 = base64.b64encode(excel_file).decode()
-                href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="saved_scan_scenarios.xlsx">Download Scan Scenarios Excel File</a>'
-                st.markdown(href, unsafe_allow_html=True)
-                st.success("Export complete! Click the link above to download.")
+            # The workbook is streamed to a temp file only when the button is clicked
+            st.download_button(
+                "Export Scan Scenarios to Excel",
+                data=lambda: export_file("scenarios", write_scenarios_xlsx, scan_scenarios),
+                file_name="saved_scan_scenarios.xlsx",
+                mime=XLSX_MIME,
+                on_click="ignore"
+            )
         
         with col2:
-            # Clear button
-            if st.button("Clear All Scan Scenarios"):
-                st.session_state.scan_scenarios = pd.DataFrame()
-                st.rerun()
+            st.download_button(
+                "Export Scan Scenarios to Parquet",
+                data=lambda: export_file("scenarios_parquet", write_scenarios_parquet, scan_scenarios),
+                file_name="saved_scan_scenarios.parquet",
+                mime=PARQUET_MIME,
+                on_click="ignore"
+            )
+        
+        with col3:
+            # The store is shared by every analyst, so only the filtered rows are deleted, after a confirmation
+            filtered = any(filters.values())
+            if st.button(f"Delete {len(scan_scenarios):,} Filtered Scan Scenarios" if filtered else "Delete All Scan Scenarios",
+                         key="scenario_delete"):
+                st.session_state.scenario_delete_filters = filters
+        
+        confirm_scenario_delete(store, filters, len(scan_scenarios))
+        
+        create_projection_ui(scan_scenarios)
+        
+        if commentary.ENABLED:
+            create_commentary_ui(scan_scenarios, table.selection.rows)
+    
+    create_scenario_import_ui(store)
     
     # Add a separator
     st.markdown("<hr class='compact-divider'>", unsafe_allow_html=True)
@@ -796,85 +952,276 @@ def create_scenarios_ui():
     # Export button for all segment/size combinations
     st.markdown("<h3>Export Segment/Size Index Ratios</h3>", unsafe_allow_html=True)
     
-    if st.button("Export All Segment/Size Index Ratios"):
-        # Create a dataframe with all segment/size index ratios
-        index_ratios_df = export_segment_size_index_ratios()
+    export_period = select_h1_period(st, 'export_period')
+    
+    # The downloads always export the H1 matrix; the files are only written when a button is clicked
+    h1_ratios_df = export_segment_size_index_ratios(export_period)
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        "Export All Segment/Size Index Ratios",
+        data=lambda: export_file("index_ratios", write_index_ratios_xlsx, h1_ratios_df,
+                                 week_header=index_ratio_week_header(export_period)),
+        file_name="SegSizeIndexRatio_NielsenxAOC.xlsx",
+        mime=XLSX_MIME,
+        on_click="ignore"
+    )
+    col2.download_button(
+        "Export Index Ratios to Parquet",
+        data=lambda: export_file("index_ratios_parquet", write_index_ratios_parquet, h1_ratios_df),
+        file_name="SegSizeIndexRatio_NielsenxAOC.parquet",
+        mime=PARQUET_MIME,
+        on_click="ignore"
+    )
+    
+    # A matrix handed back from Parquet replaces the H1 one in the preview and the promo plan
+    index_ratios_df = h1_ratios_df
+    ratio_file = st.file_uploader("Use an index ratio matrix from Parquet", type=["parquet"], key="index_ratio_import")
+    if ratio_file is not None:
+        try:
+            index_ratios_df = read_index_ratios_parquet(ratio_file)
+            st.caption(f"Using {ratio_file.name}: {len(index_ratios_df)} weeks x {len(index_ratios_df.columns)} segment/sizes.")
+        except Exception as e:
+            st.error(f"Could not read {ratio_file.name}: {e}")
         
-        # Convert to Excel
-        excel_file = BytesIO()
-        writer = pd.ExcelWriter(excel_file, engine='xlsxwriter')
-        index_ratios_df.to_excel(writer, sheet_name='SegSizeIndexRatio_NielsenxAOC', index=True)
+    # Optionally, display a preview of the index ratios for all segment/size combinations
+    if st.checkbox("Show preview of all segment/size index ratios"):
+        if not index_ratios_df.empty:
+            st.dataframe(index_ratios_df.style.format("{:.0%}"))
+        else:
+            st.info("No data available for preview.")
+    
+    create_promo_plan_ui(index_ratios_df)
+    create_append_week_ui()
+
+def confirm_scenario_delete(store, filters, n_rows):
+    """Second step of Delete: confirm or cancel deleting the rows of the filters the button was clicked with"""
+    pending = st.session_state.get('scenario_delete_filters')
+    if pending is None:
+        return
+    # Changing the filters cancels a pending delete, so it never hits rows that were not shown
+    if pending != filters:
+        del st.session_state.scenario_delete_filters
+        return
+    
+    def delete_rows():
+        del st.session_state.scenario_delete_filters
+        st.session_state.scenarios_deleted = store.delete(**filters)
+    
+    def cancel():
+        del st.session_state.scenario_delete_filters
+    
+    scope = "matching the filters" if any(filters.values()) else "for every user"
+    st.warning(f"Delete {n_rows:,} saved scan scenarios {scope}? This cannot be undone.")
+    col1, col2 = st.columns(2)
+    col1.button("Yes, Delete", type="primary", on_click=delete_rows, key="scenario_delete_confirm")
+    col2.button("Cancel", on_click=cancel, key="scenario_delete_cancel")
+
+def create_commentary_ui(scan_scenarios, selected_rows):
+    """Ask the configured model to explain the selected scenarios or summarize the filtered ones"""
+    with st.expander("AI Commentary"):
+        st.caption("Select rows in the table above to explain them. Answers are cached, so asking again is free.")
+        col1, col2 = st.columns(2)
+        requests = None
         
-        # Get the workbook and worksheet objects for formatting
-        workbook = writer.book
-        worksheet = writer.sheets['SegSizeIndexRatio_NielsenxAOC']
+        if col1.button("Explain Selected Scenarios", disabled=not selected_rows, key="commentary_explain"):
+            requests = [(f"{row['Brand']} {row['Size']} / {row['Customer/State']}", *explain_request(row))
+                        for _, row in scan_scenarios.iloc[selected_rows].iterrows()]
+        if col2.button("Summarize These Scenarios", key="commentary_summary"):
+            requests = [(f"Summary of {min(len(scan_scenarios), MAX_SUMMARY_ROWS):,} scenarios",
+                         *summary_request(scan_scenarios))]
         
-        # Format index as dates
-        worksheet.set_column(0, 0, 18)  # Width for week column
+        # Requests run in the background; this run only queues them
+        if requests is not None:
+            for _, key, messages in requests:
+                request_commentary(key, messages)
+            st.session_state.commentary = [(title, key) for title, key, _ in requests]
         
-        # Format data columns as percentages
-        for col_num in range(1, len(index_ratios_df.columns) + 1):
-            worksheet.set_column(col_num, col_num, 6)  # Narrow columns
-            
-        # Add conditional formatting
-        for col_num in range(1, len(index_ratios_df.columns) + 1):
-            # Light green for values > 1 + threshold
-            worksheet.conditional_format(1, col_num, len(index_ratios_df) + 1, col_num, {
-                'type': '3_color_scale',
-                'min_color': '#FFB6C1',  # Light pink
-                'mid_color': '#FFFFFF',  # White
-                'max_color': '#90EE90',  # Light green
-                'min_type': 'num',
-                'min_value': 0.7,
-                'mid_type': 'num',
-                'mid_value': 1.0,
-                'max_type': 'num',
-                'max_value': 1.3
-            })
-            
-        # Set header row format
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#C8C8C8',  # Light gray
-            'border': 1
-        })
-        for col_num, value in enumerate(index_ratios_df.columns.values):
-            worksheet.write(0, col_num + 1, value, header_format)
-        worksheet.write(0, 0, 'F\'25 Week', header_format)
-            
-        # Freeze panes
-        worksheet.freeze_panes(1, 1)
+        answers = [(title, *commentary_status(key)) for title, key in st.session_state.get('commentary', [])]
+        if any(text is None and error is None for _, text, error in answers):
+            poll_commentary()
+        else:
+            show_commentary(answers)
+
+@st.fragment(run_every=2)
+def poll_commentary():
+    """Show commentary answers as they arrive, checking again every 2 seconds
+
+    Only this fragment reruns on the timer, so arriving answers never rerun the
+    calculator, the H1 panel or the rest of the scenarios tab. The timer is
+    dropped the next time the scenarios tab runs with nothing pending.
+    """
+    answers = [(title, *commentary_status(key)) for title, key in st.session_state.get('commentary', [])]
+    show_commentary(answers)
+
+def show_commentary(answers):
+    for title, text, error in answers:
+        st.markdown(f"**{title}**")
+        if text is not None:
+            st.markdown(text)
+        elif error is not None:
+            st.error(f"The commentary request failed: {error}")
+        else:
+            st.caption("Waiting for the model...")
+
+def create_scenario_import_ui(store):
+    """Import a scenario book from Parquet into the shared scenario store"""
+    if st.session_state.get('scenarios_imported'):
+        st.success(f"Imported {st.session_state.pop('scenarios_imported'):,} scan scenarios.")
+    
+    with st.expander("Import Scan Scenarios"):
+        scenario_file = st.file_uploader("Scenario book (.parquet), e.g. one exported above", type=["parquet"],
+                                         key="scenario_import_file")
+        if scenario_file is not None and st.button("Import Scenarios", key="scenario_import"):
+            try:
+                imported = read_scenarios_parquet(scenario_file)
+            except Exception as e:
+                st.error(f"Could not read {scenario_file.name}: {e}")
+            else:
+                st.session_state.scenarios_imported = store.append(imported)
+                st.rerun(scope="fragment")
+
+def create_promo_plan_ui(index_ratios_df):
+    """Recommended promo weeks for every segment/size of the exported index ratio matrix"""
+    st.markdown("<hr class='compact-divider'>", unsafe_allow_html=True)
+    st.markdown("<h3>Promo Week Recommendations</h3>", unsafe_allow_html=True)
+    
+    cols = st.columns(4)
+    k = cols[0].number_input("Promos per Combination", min_value=1, max_value=10, value=3, key="promo_k")
+    promo_length = cols[1].number_input("Weeks per Promo", min_value=1, max_value=8, value=1, key="promo_length")
+    min_gap = cols[2].number_input("Min Weeks Between", min_value=0, max_value=12, value=2, key="promo_gap")
+    max_promo_weeks = cols[3].number_input("Max Promo Weeks", min_value=1, max_value=len(index_ratios_df) or 1,
+                                           value=min(6, len(index_ratios_df) or 1), key="promo_max_weeks")
+    
+    week_numbers = list(range(1, len(index_ratios_df) + 1))
+    blackout_weeks = st.multiselect("Blackout Weeks", week_numbers, key="promo_blackout",
+                                    format_func=lambda week: index_ratios_df.index[week - 1])
+    
+    plan_df = promo_plan(index_ratios_df, int(k), int(promo_length), int(min_gap), int(max_promo_weeks), blackout_weeks)
+    if plan_df.empty:
+        st.info("No promo windows fit these settings.")
+        return
+    
+    st.dataframe(plan_df.style.format({"Avg Index Ratio": "{:.0%}"}), hide_index=True)
+    st.download_button(
+        "Export Promo Plan",
+        data=lambda: export_file("promo_plan", write_promo_plan_xlsx, plan_df),
+        file_name="promo_week_plan.xlsx",
+        mime=XLSX_MIME,
+        on_click="ignore"
+    )
+
+def create_projection_ui(scan_scenarios):
+    """Weekly GM $ and scan spend of the listed scenarios over an H1 period"""
+    st.markdown("<h3>Weekly Projection</h3>", unsafe_allow_html=True)
+    
+    cols = st.columns(3)
+    pricing = cols[0].selectbox("Pricing Scenario", list(PROJECTION_SCENARIOS), index=1, key="projection_pricing")
+    baseline_volume = cols[1].number_input("Baseline Bottles/Week", min_value=0.0, value=100.0, step=10.0,
+                                           key="projection_volume", help="Bottles sold per scenario in an average week")
+    by = cols[2].selectbox("Totals By", TOTAL_DIMENSIONS, key="projection_by")
+    period = select_h1_period(st, 'projection_period')
+    
+    h1_index = get_h1_index(period)
+    projection = project_scenarios(scan_scenarios, h1_index, pricing, baseline_volume, segment_mapping)
+    gm_dollars = projection["gm_dollars"]
+    scan_spend = projection["scan_spend"]
+    
+    cols = st.columns(2)
+    cols[0].metric("Projected GM $", f"${gm_dollars.to_numpy().sum():,.0f}")
+    cols[1].metric("Projected Scan Spend", f"${scan_spend.to_numpy().sum():,.0f}")
+    
+    missing = int((~projection["indexed"]).sum())
+    if missing:
+        st.caption(f"{missing} scenario(s) have no H1 data for their segment/size and are projected flat.")
+    
+    # Weekly totals across all scenarios
+    st.line_chart(pd.DataFrame({
+        "GM $": gm_dollars.sum().to_numpy(),
+        "Scan Spend": scan_spend.sum().to_numpy()
+    }, index=pd.Index(range(1, len(gm_dollars.columns) + 1), name="Week")))
+    
+    for label, projected in (("GM $", gm_dollars), ("Scan Spend", scan_spend)):
+        st.markdown(f"**{label} by {by}**")
+        st.dataframe(projection_totals(projected, scan_scenarios, by).style.format("${:,.0f}"))
+    
+    with st.expander("Projected GM $ per scenario"):
+        st.dataframe(pd.concat([scan_scenarios[DIMENSION_COLUMNS], gm_dollars], axis=1)
+                     .style.format("${:,.0f}", subset=list(gm_dollars.columns)))
+
+def create_append_week_ui():
+    """Append a newly delivered week of H1 data for every session, without reloading the H1 file"""
+    with st.expander("Append a Week of H1 Data"):
+        snapshot = st.session_state.h1_snapshot
+        cube = snapshot.cube
+        latest = cube.periods[-1]
+        st.caption(f"Latest period {period_label(latest)} has {int(cube.week_counts[-1])} weeks loaded"
+                   + (f" ({snapshot.appended_weeks} appended since the H1 file was loaded)." if snapshot.appended_weeks else "."))
         
-        # Page setup
-        worksheet.set_landscape()         # Set landscape orientation
-        worksheet.fit_to_pages(1, 0)      # Fit to 1 page wide, as many pages tall as needed
-        worksheet.set_margins(left=0.33, right=0.33, top=0.33, bottom=0.33)  # Set margins
+        week_file = st.file_uploader("Week file (Segment, Size, Brand if the H1 data has brands, optional "
+                                     "Year/Half, one 'Week N' column)",
+                                     type=["csv", "xlsx"], key="h1_week_file")
+        if week_file is not None and st.button("Append Week", key="h1_append_week"):
+            try:
+                week_df = pd.read_excel(week_file) if week_file.name.lower().endswith(".xlsx") else pd.read_csv(week_file)
+                append_shared_week(week_df)
+            except Exception as e:
+                st.error(f"Could not append the week: {e}")
+            else:
+                st.rerun()
 
-        # Close the writer
-        writer.close()
+def record_diagnostics():
+    """Record end-of-run metrics: full-script time, render cache stats and session_state size"""
+    metrics.record_section("script", time.perf_counter() - script_start)
+    metrics.record_cache_info("pricing_table_html", pricing_table_html)
+    metrics.record_cache_info("week_list_html", week_list_html)
+    metrics.record_session_state()
+    metrics.set_gauge("h1_snapshot_bytes", st.session_state.h1_snapshot.nbytes)
+    metrics.flush()
+
+def create_diagnostics_panel():
+    """Hidden diagnostics panel, shown with ?diagnostics=1 when metrics are enabled"""
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        # Section timings of this session's latest runs
+        last_run = st.session_state.get("metrics_last_run", {})
+        st.markdown("**Last run (ms)**")
+        st.dataframe(pd.DataFrame({
+            "Section": list(last_run),
+            "ms": [round(seconds * 1000, 1) for seconds in last_run.values()]
+        }), hide_index=True)
         
-        # Create download link
-        b64 = base64.b64encode(excel_file.getvalue()).decode()
-        href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="SegSizeIndexRatio_NielsenxAOC.xlsx">Download SegSizeIndexRatio Excel File</a>'
-        st.markdown(href, unsafe_allow_html=True)
-        st.success("Export complete! Click the link above to download.")
+        # Process-wide counters and gauges
+        data = metrics.snapshot()
+        rows = [{"Metric": name, "Labels": ", ".join(f"{k}={v}" for k, v in labels), "Value": value}
+                for (name, labels), value in sorted({**data["counters"], **data["gauges"]}.items())]
+        st.markdown("**Counters**")
+        st.dataframe(pd.DataFrame(rows), hide_index=True)
         
-    # Optionally, display a preview of the index ratios for all segment/size combinations
-    if st.checkbox("Show preview of all segment/size index ratios"):
-        preview_df = export_segment_size_index_ratios()
-        if not preview_df.empty:
-            st.dataframe(preview_df.style.format("{:.0%}"))
-        else:
-            st.info("No data available for preview.")
+        # Largest session_state entries
+        sizes = metrics.session_state_sizes()
+        st.markdown("**session_state (bytes)**")
+        st.dataframe(pd.DataFrame({"Key": list(sizes), "Bytes": list(sizes.values())}), hide_index=True)
+        
+        # Import and first run time of this session
+        startup = st.session_state.get("startup_timing", {})
+        st.markdown("**Session start (ms)**")
+        st.dataframe(pd.DataFrame({
+            "Phase": ["Imports", "First run"],
+            "ms": [startup.get("import_ms"), startup.get("first_run_ms")]
+        }), hide_index=True)
+        
+        st.caption(f"Metrics file: {metrics.METRICS_FILE}")
 
 def main():
+    configure_page()
+    init_session_state()
+
     # Add logo and title to the main area
-    try:
-        image = Image.open('image.png')
+    logo = get_logo_bytes()
+    if logo:
         col1, col2, col3 = st.columns([1, 3, 1])
         with col2:
-            st.image(image, width=600, use_container_width=True)
-    except Exception:
+            st.image(logo, width=600, use_container_width=True)
+    else:
         st.warning("Logo 'image.png' not found. Please add it to the same directory as the app.")
 
     st.markdown("<h1 class='header'>Pricing & Margin Calculator</h1>", unsafe_allow_html=True)
@@ -893,15 +1240,21 @@ def main():
         with h1_col:
             # Create a container with styling for the H1 Data Analysis
             with st.container():
-                st.markdown("<div class='side-panel'>", unsafe_allow_html=True)
                 # H1 Data Analysis section to the right
-                create_h1_data_analysis_ui(st)
-                st.markdown("</div>", unsafe_allow_html=True)
+                create_h1_panel()
 
     with tab2:
         # Saved Scenarios section
         create_scenarios_ui()
 
+    report_startup_time()
+
+    # Opt-in instrumentation (SCANCALC_METRICS=1)
+    if metrics.ENABLED:
+        record_diagnostics()
+        if st.query_params.get("diagnostics") == "1":
+            create_diagnostics_panel()
+
 # Execute the app
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,35 @@
+import os
+import threading
+
+# Directory of the app; data files and caches default to locations inside it
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def atomic_write(path, write, mode="w", encoding=None):
+    """
+    Write a file through a temp file and a rename, so readers never see a partial file
+
+    The temp file sits next to the target and is named after the process and
+    thread, so concurrent writers of the same file do not collide; the last
+    rename wins. The temp file is removed if writing fails.
+
+    Args:
+        path (str): File to write; its directory must exist
+        write (callable): Called with the open temp file, e.g. lambda f: f.write(text)
+        mode (str): "w" for text or "wb" for bytes
+        encoding (str): Text encoding, for mode "w"
+
+    Raises:
+        OSError: If the file cannot be written or renamed
+    """
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, mode, encoding=encoding) as f:
+            write(f)
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,296 @@
+"""
+Benchmarks for the calculator's hot paths, run without a browser
+
+Times the margin functions, the H1 index build, lookup, week append and
+export matrix, the weekly scenario projection and promo plan, the two Excel
+writers and full-script reruns through Streamlit's AppTest, at several data
+scales built with the seeded H1 generator.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save            # record a baseline
+    python benchmarks/run_benchmarks.py --compare         # fail on regressions
+    python benchmarks/run_benchmarks.py --scales small,medium,large --threshold 0.3
+
+benchmarks/baseline.json is a reference run of the default scales, kept in
+the repository so --compare works out of the box. Timings depend on the
+machine: CI should record its own baseline on its runner (--save on the
+main branch, kept as a build artifact) and pass it with --baseline, and the
+committed file should be refreshed with --save when a change is meant to
+move the numbers.
+
+Results are JSON: {"meta": {...}, "results": {"<benchmark>[<scale>]": seconds per call}}
+(best of several rounds; app_rerun is the median of APP_RERUNS edits).
+With --compare, any benchmark slower than baseline * (1 + threshold) is
+reported and the exit code is 1.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# Keep benchmark runs away from the real scenario store; must be set before the app modules load
+os.environ.setdefault("SCANCALC_SCENARIO_DB", os.path.join(tempfile.mkdtemp(prefix="scancalc-bench-"), "scenarios.db"))
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Bare-mode session_state access logs a warning per call
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import JZcalc
+from exports import to_excel, write_index_ratios_xlsx
+from h1_data import generate_h1_data
+from h1_index import H1HistoryCube
+from h1_snapshot import H1Snapshot
+from margins import calculate_margin, calculate_scenario_margins, calculate_weighted_average
+from projections import project_scenarios
+from promo import promo_plan
+from scenarios import INPUT_DEFAULTS, build_scenario_frame
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Allowed slowdown before a benchmark counts as a regression (0.25 = 25%)
+DEFAULT_THRESHOLD = 0.25
+
+# Data sizes per scale: H1 rows per segment/size (brands x stores), weeks, scenario rows
+SCALES = {
+    "small": {"n_brands": 1, "n_stores": 1, "n_weeks": 27, "scenario_rows": 1000},
+    "medium": {"n_brands": 20, "n_stores": 10, "n_weeks": 27, "scenario_rows": 10000},
+    "large": {"n_brands": 100, "n_stores": 100, "n_weeks": 52, "scenario_rows": 50000}
+}
+
+# Full-script reruns timed through AppTest
+APP_RERUNS = 15
+
+
+def measure(func, setup=None, repeat=5, min_time=0.2):
+    """Best seconds per call of func over repeat rounds
+
+    Each round calls func until at least min_time has been spent in it; setup
+    runs before every call and is not timed. The fastest round is the least
+    disturbed by other load on the machine, as with timeit.
+    """
+    per_call = []
+    for _ in range(repeat):
+        elapsed = 0.0
+        calls = 0
+        while elapsed < min_time or calls == 0:
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+            calls += 1
+        per_call.append(elapsed / calls)
+    return min(per_call)
+
+
+def scenario_inputs(n_rows, seed=0):
+    """Random but valid scenario inputs for n_rows SKUs"""
+    rng = np.random.default_rng(seed)
+    case_cost = rng.uniform(60, 300, n_rows).round(2)
+    shelf = case_cost / 12 * rng.uniform(1.3, 1.8, n_rows)
+    inputs = pd.DataFrame({
+        "Brand": rng.choice(JZcalc.brand_list[1:], n_rows),
+        "Segment": rng.choice(JZcalc.segment_list[1:], n_rows),
+        "Size": rng.choice(JZcalc.size_options[1:], n_rows),
+        "Customer/State": rng.choice(["TX", "CA", "FL", "NY"], n_rows),
+        "Case Cost": case_cost,
+        "# Bottles/Cs": 12,
+        "Base Scan": rng.uniform(0, 2, n_rows).round(2),
+        "Deep Scan": rng.uniform(2, 5, n_rows).round(2),
+        "Coupon": rng.uniform(0, 2, n_rows).round(2),
+        "Everyday Shelf Price": shelf.round(2),
+        "TPR Price (Base Scan)": (shelf * 0.9).round(2),
+        "TPR Price (Deep Scan)": (shelf * 0.8).round(2),
+        "Ad/Feature Price (Base Scan)": (shelf * 0.85).round(2),
+        "Ad/Feature Price (Deep Scan)": (shelf * 0.75).round(2),
+        "% on Ad (Base)": rng.integers(0, 100, n_rows),
+        "% on Ad (Deep)": rng.integers(0, 100, n_rows)
+    })
+    return inputs[list(inputs.columns[:4]) + list(INPUT_DEFAULTS)]
+
+
+def bench_scalar_margins(results):
+    results["calculate_margin"] = measure(lambda: calculate_margin(24.99, 14.5, 1.5, 1.0))
+    results["calculate_weighted_average"] = measure(
+        lambda: calculate_weighted_average(22.99, 21.99, 14.5, 1.5, 1.0, 40))
+
+
+def bench_scale(scale, params, results):
+    def record(name, seconds):
+        results[f"{name}[{scale}]"] = seconds
+
+    # Batched margins over every scenario row
+    inputs = scenario_inputs(params["scenario_rows"])
+    columns = [inputs[col].to_numpy(dtype=float) for col in (
+        "Everyday Shelf Price", "TPR Price (Base Scan)", "TPR Price (Deep Scan)",
+        "Ad/Feature Price (Base Scan)", "Ad/Feature Price (Deep Scan)")]
+    bottle_cost = inputs["Case Cost"].to_numpy(dtype=float) / 12
+    record("calculate_scenario_margins", measure(lambda: calculate_scenario_margins(
+        *columns, bottle_cost, inputs["Base Scan"].to_numpy(), inputs["Deep Scan"].to_numpy(),
+        inputs["Coupon"].to_numpy(), inputs["% on Ad (Base)"].to_numpy(), inputs["% on Ad (Deep)"].to_numpy())))
+    record("build_scenario_frame", measure(lambda: build_scenario_frame(inputs)))
+
+    # H1 index: cold build, lookups against a built index, and the export matrix from a cold index
+    h1_data = generate_h1_data(n_brands=params["n_brands"], n_stores=params["n_stores"], n_weeks=params["n_weeks"])
+
+    def drop_index():
+        st.session_state.h1_snapshot = H1Snapshot(h1_data)
+
+    record("h1_index_build", measure(JZcalc.get_h1_index, setup=drop_index, repeat=3))
+    JZcalc.get_h1_index()
+    record("get_index_ratios", measure(lambda: JZcalc.get_index_ratios("Vodka", "750mL")))
+    record("export_segment_size_index_ratios", measure(JZcalc.export_segment_size_index_ratios, setup=drop_index, repeat=3))
+    # Appending the last week to a cube built without it; a fresh cube per call, as a second append
+    # to the same cube copies its buffer instead of filling it in place
+    last_week = f"Week {params['n_weeks']}"
+    partial_data = h1_data.drop(columns=last_week)
+    week_data = h1_data[["Segment", "Size", last_week]]
+    partial = {}
+
+    def build_partial_cube():
+        partial["cube"] = H1HistoryCube(partial_data)
+
+    record("h1_append_week", measure(lambda: partial["cube"].append_week(week_data, last_week), setup=build_partial_cube))
+
+    index_ratios_df = JZcalc.export_segment_size_index_ratios()
+    record("promo_plan", measure(lambda: promo_plan(index_ratios_df, k=3, min_gap=2, max_promo_weeks=6)))
+
+    # Weekly projection of every scenario over the latest period
+    scenarios = build_scenario_frame(inputs)
+    h1_index = JZcalc.get_h1_index()
+    record("project_scenarios", measure(lambda: project_scenarios(scenarios, h1_index, segment_mapping=JZcalc.segment_mapping)))
+
+    # Excel writers
+    record("to_excel", measure(lambda: to_excel(scenarios), repeat=3))
+
+    def write_index_ratios():
+        with tempfile.TemporaryFile() as output:
+            write_index_ratios_xlsx(index_ratios_df, output)
+
+    record("write_index_ratios_xlsx", measure(write_index_ratios, repeat=3))
+
+
+def bench_app(results):
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(APP_DIR, "JZcalc.py")
+
+    start = time.perf_counter()
+    at = AppTest.from_file(app_path, default_timeout=60).run()
+    results["app_first_run"] = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"App raised during the first run: {at.exception}")
+
+    # Change an input every rerun so memoized tables do not hide the work
+    rerun_times = []
+    for i in range(APP_RERUNS):
+        at.number_input(key="calc_case_cost").set_value(100 + i)
+        start = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - start)
+    results["app_rerun"] = statistics.median(rerun_times)
+
+
+def run(scales, include_app=True):
+    results = {}
+    bench_scalar_margins(results)
+    for scale in scales:
+        bench_scale(scale, SCALES[scale], results)
+    if include_app:
+        bench_app(results)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print current vs baseline timings and return the regressed benchmark names"""
+    regressions = []
+    print(f"{'benchmark':<48}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<48}{'-':>12}{format_seconds(seconds):>12}{'new':>10}")
+            continue
+        change = seconds / base - 1 if base > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<48}{format_seconds(base):>12}{format_seconds(seconds):>12}{change:>+10.0%}{flag}")
+    return regressions
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calculator's hot paths.")
+    parser.add_argument("--scales", default="small,medium", help=f"Comma-separated scales from {', '.join(SCALES)}")
+    parser.add_argument("--no-app", action="store_true", help="Skip the AppTest rerun benchmarks")
+    parser.add_argument("--output", help="Write this run's results to a JSON file")
+    parser.add_argument("--save", action="store_true", help="Save this run as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline and fail on regressions")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (default 0.25)")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scales: {', '.join(unknown)}")
+    # Saving first would compare the run against itself
+    if args.save and args.compare:
+        parser.error("--save and --compare cannot be combined")
+    if args.compare and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save first.", file=sys.stderr)
+        return 2
+
+    results = run(scales, include_app=not args.no_app)
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": scales
+        },
+        "results": results
+    }
+
+    for path in filter(None, [args.output, args.baseline if args.save else None]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    else:
+        for name, seconds in results.items():
+            print(f"{name:<48}{format_seconds(seconds):>12}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Headless bulk pricing: stream a scenario input file through the margin math
+
+Usage:
+    python bulk_pricing.py inputs.csv priced.parquet --chunksize 250000
+
+Input and output formats are picked from the file extension (.csv or .parquet).
+Each chunk is priced with build_scenario_frame, so the output columns are the
+same ones the Save Scan Scenario button stores.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from scenarios import DIMENSION_COLUMNS, build_scenario_frame
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def _file_format(path):
+    """Return 'csv' or 'parquet' based on the file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt"):
+        return "csv"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Unsupported file type '{ext}' for {path}. Use .csv or .parquet")
+
+
+def iter_input_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrame chunks of at most chunksize rows from a CSV or Parquet file"""
+    if _file_format(path) == "csv":
+        # Read dimensions as text so a numeric-looking customer code keeps its format
+        yield from pd.read_csv(path, chunksize=chunksize,
+                               dtype={col: str for col in DIMENSION_COLUMNS + ["Customer"]})
+    else:
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """Append priced chunks to a CSV or Parquet file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self._parquet_writer = None
+        self._started = False
+
+    def write(self, df):
+        if self.format == "csv":
+            df.to_csv(self.path, mode="a" if self._started else "w", header=not self._started, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+        self._started = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+
+def price_file(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, log=None):
+    """Price every row of input_path into output_path, one chunk at a time
+
+    Returns:
+        int: Number of rows written
+    """
+    writer = ChunkWriter(output_path)
+    rows = 0
+    try:
+        for chunk in iter_input_chunks(input_path, chunksize):
+            writer.write(build_scenario_frame(chunk))
+            rows += len(chunk)
+            if log:
+                log(f"Priced {rows:,} rows")
+    finally:
+        writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a CSV/Parquet file of scan scenarios without the Streamlit UI")
+    parser.add_argument("input", help="Input .csv or .parquet file of scenario inputs")
+    parser.add_argument("output", help="Output .csv or .parquet file for the priced scenarios")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"Rows held in memory at a time (default {DEFAULT_CHUNKSIZE:,})")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final summary")
+    args = parser.parse_args(argv)
+
+    if args.chunksize < 1:
+        parser.error("--chunksize must be at least 1")
+
+    start = time.perf_counter()
+    try:
+        rows = price_file(args.input, args.output, args.chunksize,
+                          log=None if args.quiet else lambda msg: print(msg, file=sys.stderr))
+    except (OSError, ValueError) as e:
+        print(f"Error pricing {args.input}: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Wrote {rows:,} priced scenarios to {args.output} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
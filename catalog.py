@@ -0,0 +1,135 @@
+import datetime
+import os
+
+import pandas as pd
+
+from app_files import APP_DIR
+from h1_index import normalize_key
+from lists import size_options
+
+# Product catalog file (override with SCANCALC_CATALOG); CSV, Excel or Parquet
+DEFAULT_CATALOG_PATH = os.environ.get("SCANCALC_CATALOG", os.path.join(APP_DIR, "product_catalog.csv"))
+
+CATALOG_COLUMNS = ["Brand", "Segment", "Size", "Bottles/Case", "Case Cost", "Effective Date"]
+
+# Accepted spellings of the catalog columns (compared case-insensitively)
+CATALOG_ALIASES = {
+    "bottles/cs": "Bottles/Case",
+    "# bottles/cs": "Bottles/Case",
+    "bottles per case": "Bottles/Case",
+    "case cost ($)": "Case Cost",
+    "effective": "Effective Date",
+    "effective_date": "Effective Date"
+}
+
+
+def read_catalog(file_path=DEFAULT_CATALOG_PATH):
+    """
+    Read and validate a product catalog file
+
+    Args:
+        file_path (str): CSV, Excel or Parquet file with the CATALOG_COLUMNS
+
+    Returns:
+        pd.DataFrame: One row per catalog line with typed columns; a missing
+        Effective Date means the line has always been in effect
+
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If required columns are missing or values are invalid
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        df = pd.read_parquet(file_path)
+    elif ext in (".xlsx", ".xls"):
+        df = pd.read_excel(file_path)
+    else:
+        df = pd.read_csv(file_path, dtype={"Brand": str, "Segment": str, "Size": str})
+
+    canonical = {col.lower(): col for col in CATALOG_COLUMNS}
+    df = df.rename(columns=lambda col: CATALOG_ALIASES.get(str(col).strip().lower(),
+                                                           canonical.get(str(col).strip().lower(), str(col).strip())))
+
+    missing = [col for col in CATALOG_COLUMNS[:5] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Catalog is missing columns: {', '.join(missing)}")
+    if "Effective Date" not in df.columns:
+        df["Effective Date"] = pd.NaT
+
+    df = df[CATALOG_COLUMNS].dropna(subset=["Brand", "Size"]).copy()
+    for col in ("Brand", "Segment", "Size"):
+        df[col] = df[col].fillna("").astype(str).str.strip()
+    df["Bottles/Case"] = pd.to_numeric(df["Bottles/Case"], errors="coerce")
+    df["Case Cost"] = pd.to_numeric(df["Case Cost"], errors="coerce")
+    df["Effective Date"] = pd.to_datetime(df["Effective Date"], errors="coerce")
+
+    invalid = df["Bottles/Case"].isna() | (df["Bottles/Case"] < 1) | df["Case Cost"].isna() | (df["Case Cost"] < 0)
+    if invalid.any():
+        raise ValueError(f"Catalog has {int(invalid.sum())} rows with missing or invalid bottles/case or case cost")
+
+    df["Bottles/Case"] = df["Bottles/Case"].round(0).astype(int)
+    return df.reset_index(drop=True)
+
+
+class ProductCatalog:
+    """Catalog lines indexed by brand and size for constant-time lookups
+
+    Only the line in effect on the as-of date is kept for each brand/size:
+    the latest Effective Date on or before it. Lines dated later are ignored
+    until they take effect.
+    """
+
+    def __init__(self, catalog_df, as_of=None):
+        as_of = pd.Timestamp(as_of or datetime.date.today())
+        # Undated lines sort first, so any dated line in effect replaces them
+        effective = catalog_df[catalog_df["Effective Date"].isna() | (catalog_df["Effective Date"] <= as_of)]
+        effective = effective.sort_values("Effective Date", na_position="first", kind="stable")
+
+        size_order = {normalize_key(size): i for i, size in enumerate(size_options)}
+        self.brands = []
+        self._items = {}
+        self._sizes = {}
+        for line in effective.itertuples(index=False, name=None):
+            brand, segment, size, bottles_per_case, case_cost, effective_date = line
+            brand_key = normalize_key(brand)
+            if brand_key not in self._sizes:
+                self.brands.append(brand)
+                self._sizes[brand_key] = {}
+            self._sizes[brand_key][normalize_key(size)] = size
+            self._items[(brand_key, normalize_key(size))] = {
+                "brand": brand,
+                "segment": segment,
+                "size": size,
+                "bottles_per_case": bottles_per_case,
+                "case_cost": case_cost,
+                "effective_date": None if pd.isna(effective_date) else effective_date.date()
+            }
+
+        # Sizes per brand in the calculator's size order
+        self._sizes = {brand_key: sorted(sizes.values(), key=lambda size: size_order.get(normalize_key(size), len(size_order)))
+                       for brand_key, sizes in self._sizes.items()}
+        self.brands.sort()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, brand):
+        return normalize_key(brand) in self._sizes
+
+    def sizes_for(self, brand):
+        """Sizes the brand is listed in, or an empty list"""
+        return self._sizes.get(normalize_key(brand), [])
+
+    def item(self, brand, size):
+        """Catalog line in effect for a brand and size as a dict, or None"""
+        return self._items.get((normalize_key(brand), normalize_key(size)))
+
+    def segment_for(self, brand):
+        """Segment of the brand's first listed size, or None"""
+        sizes = self.sizes_for(brand)
+        return self.item(brand, sizes[0])["segment"] if sizes else None
+
+
+def load_catalog(file_path=DEFAULT_CATALOG_PATH, as_of=None):
+    """Read a catalog file into a ProductCatalog"""
+    return ProductCatalog(read_catalog(file_path), as_of)
@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+import metrics
+from app_files import APP_DIR, atomic_write
+from scenarios import DIMENSION_COLUMNS, INPUT_DEFAULTS, SCENARIO_COLUMNS
+
+# Commentary is off unless an OpenAI-compatible endpoint or API key is configured;
+# SCANCALC_AI_BASE_URL points it at any compatible server, e.g. a local stub
+BASE_URL = os.environ.get("SCANCALC_AI_BASE_URL") or None
+API_KEY = os.environ.get("SCANCALC_AI_API_KEY") or os.environ.get("OPENAI_API_KEY")
+MODEL = os.environ.get("SCANCALC_AI_MODEL", "gpt-4o-mini")
+ENABLED = bool(BASE_URL or API_KEY)
+
+# Requests in flight at once, shared by every session
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("SCANCALC_AI_CONCURRENCY", "4"))
+REQUEST_TIMEOUT = 60.0
+
+# Responses are cached here as JSON, keyed on a hash of the endpoint, model and prompt inputs
+DEFAULT_CACHE_DIR = os.environ.get("SCANCALC_AI_CACHE_DIR", os.path.join(APP_DIR, ".ai_cache"))
+
+# Bump when the prompts change so old answers are not reused
+PROMPT_VERSION = 1
+
+# Most scenarios sent in one summary request
+MAX_SUMMARY_ROWS = 200
+
+SYSTEM_PROMPT = ("You are a beverage alcohol pricing analyst. Scan scenarios give a retailer's case cost, "
+                 "shelf prices and the supplier scan (per-bottle rebate) and coupon paid on TPR and Ad/Feature "
+                 "promotions, with the resulting retailer gross margins. Be concise and specific.")
+
+EXPLAIN_PROMPT = ("Explain this scan scenario in 3-5 sentences: how the scans and coupon move the retailer's "
+                  "margin at each price point, and anything that looks risky or unusual.\n\n{scenario}")
+
+SUMMARY_PROMPT = ("Summarize these {count} saved scan scenarios in a short paragraph and up to 5 bullet points: "
+                  "patterns by brand, size and customer, the weakest margins, and outliers.\n\n{scenarios}")
+
+_lock = threading.Lock()
+_loop = None
+_client = None
+_semaphore = None
+# Pending and finished requests by cache key: concurrent.futures.Future
+_requests = {}
+
+
+def _scenario_record(row):
+    """Dimension and input values of one scenario as plain JSON-ready values"""
+    record = {}
+    for col in DIMENSION_COLUMNS + list(INPUT_DEFAULTS):
+        value = row.get(col)
+        if pd.isna(value):
+            value = "" if col in DIMENSION_COLUMNS else INPUT_DEFAULTS[col]
+        record[col] = str(value) if col in DIMENSION_COLUMNS else round(float(value), 4)
+    return record
+
+
+def _scenario_text(row):
+    """All columns of one scenario as 'name: value' lines for a prompt"""
+    lines = []
+    for col in SCENARIO_COLUMNS:
+        value = row.get(col)
+        if pd.isna(value) or value == "":
+            continue
+        lines.append(f"{col}: {round(float(value), 2) if col not in DIMENSION_COLUMNS else value}")
+    return "\n".join(lines)
+
+
+def _cache_key(kind, records):
+    # The endpoint is part of the key, so answers from a local stub are never served as a real model's
+    payload = json.dumps({"version": PROMPT_VERSION, "base_url": BASE_URL, "model": MODEL, "kind": kind,
+                          "records": records}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def explain_request(row):
+    """Cache key and chat messages asking to explain one scenario
+
+    Args:
+        row (pd.Series or dict): One saved scenario (SCENARIO_COLUMNS)
+
+    Returns:
+        tuple: (cache key, messages)
+    """
+    key = _cache_key("explain", [_scenario_record(row)])
+    messages = [{"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": EXPLAIN_PROMPT.format(scenario=_scenario_text(row))}]
+    return key, messages
+
+
+def summary_request(scenarios):
+    """Cache key and chat messages asking to summarize up to MAX_SUMMARY_ROWS scenarios
+
+    Args:
+        scenarios (pd.DataFrame): Saved scenarios (SCENARIO_COLUMNS)
+
+    Returns:
+        tuple: (cache key, messages)
+    """
+    scenarios = scenarios.head(MAX_SUMMARY_ROWS)
+    rows = [row for _, row in scenarios.iterrows()]
+    key = _cache_key("summary", [_scenario_record(row) for row in rows])
+
+    # Compact CSV keeps large books within the context window
+    table = scenarios.reindex(columns=SCENARIO_COLUMNS).round(2).to_csv(index=False)
+    messages = [{"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": SUMMARY_PROMPT.format(count=len(rows), scenarios=table)}]
+    return key, messages
+
+
+def _cache_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def cached_commentary(key, cache_dir=DEFAULT_CACHE_DIR):
+    """Cached response text for a key, or None"""
+    try:
+        with open(_cache_path(key, cache_dir), encoding="utf-8") as f:
+            return json.load(f)["text"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_cache(key, text, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written atomically, so readers never see a partial response
+    record = {"base_url": BASE_URL, "model": MODEL, "text": text}
+    atomic_write(_cache_path(key, cache_dir), lambda f: json.dump(record, f), encoding="utf-8")
+
+
+def _event_loop():
+    """The background event loop all requests run on, started on first use"""
+    global _loop, _client, _semaphore
+    with _lock:
+        if _loop is None:
+            # Imported here so the app does not load openai unless commentary is used
+            from openai import AsyncOpenAI
+
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="scancalc-commentary", daemon=True).start()
+            _client = AsyncOpenAI(base_url=BASE_URL, api_key=API_KEY or "not-needed", timeout=REQUEST_TIMEOUT,
+                                  max_retries=2)
+            # Created on the loop it limits
+            _semaphore = asyncio.run_coroutine_threadsafe(_make_semaphore(), loop).result()
+            _loop = loop
+        return _loop
+
+
+async def _make_semaphore():
+    return asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
+async def _complete(key, messages, cache_dir):
+    async with _semaphore:
+        with metrics.timed("commentary_request"):
+            response = await _client.chat.completions.create(model=MODEL, messages=messages)
+    text = (response.choices[0].message.content or "").strip()
+    _write_cache(key, text, cache_dir)
+    metrics.increment("commentary_requests_total")
+    return text
+
+
+def request_commentary(key, messages, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Start a commentary request unless it is cached or already running
+
+    Returns immediately: the request runs on the background event loop,
+    at most MAX_CONCURRENT_REQUESTS at a time across all sessions, and its
+    response is written to the disk cache. Poll it with commentary_status.
+
+    Args:
+        key (str): Cache key from explain_request or summary_request
+        messages (list): Chat messages for the request
+        cache_dir (str): Directory for cached responses
+    """
+    if cached_commentary(key, cache_dir) is not None:
+        metrics.increment("commentary_cache_hits")
+        return
+
+    loop = _event_loop()
+    with _lock:
+        future = _requests.get(key)
+        # A failed request is retried when asked for again
+        if future is None or (future.done() and future.exception() is not None):
+            _requests[key] = asyncio.run_coroutine_threadsafe(_complete(key, messages, cache_dir), loop)
+
+
+def commentary_status(key, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    State of a commentary request, without waiting for it
+
+    Returns:
+        tuple: (text, error) - text is set once the response is cached, error
+        if the request failed; both are None while it is still running
+    """
+    text = cached_commentary(key, cache_dir)
+    if text is not None:
+        # Answered requests are served from the cache from now on
+        with _lock:
+            _requests.pop(key, None)
+        return text, None
+
+    with _lock:
+        future = _requests.get(key)
+    if future is None or not future.done():
+        return None, None
+    error = future.exception()
+    if error is not None:
+        return None, str(error) or type(error).__name__
+    return future.result(), None
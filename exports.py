@@ -0,0 +1,163 @@
+import tempfile
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Default header label of the index ratio workbook's week column
+INDEX_RATIO_WEEK_HEADER = "F'25 Week"
+
+
+def index_ratio_week_header(period):
+    """Week column header for a (year, half) period: F'25 Week, or F'25 H2 Week for second halves"""
+    year, half = period
+    return f"F'{year % 100:02d} Week" if half == 1 else f"F'{year % 100:02d} H{half} Week"
+
+
+def _open_workbook(output):
+    # Imported here so loading the app does not pay for xlsxwriter until the first export
+    import xlsxwriter
+
+    # constant_memory flushes each row to disk as soon as the next one starts,
+    # so memory use does not grow with the number of rows
+    return xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'nan_inf_to_errors': True,
+        'in_memory': False
+    })
+
+
+def write_scenarios_xlsx(df, output):
+    """Stream a scan-scenario frame into an Excel workbook, row by row
+
+    Args:
+        df (pd.DataFrame): Saved scan scenarios
+        output (str or file): Path or binary file object to write the .xlsx to
+    """
+    # Widen compact float32 GM columns so Excel gets 24.99 rather than 24.989999771118164
+    float32_cols = [col for col, dtype in df.dtypes.items() if dtype == "float32"]
+    if float32_cols:
+        df = df.astype({col: "float64" for col in float32_cols}).round({col: 6 for col in float32_cols})
+
+    workbook = _open_workbook(output)
+    worksheet = workbook.add_worksheet('Scan Scenarios')
+
+    # Set column width and formats
+    format_currency = workbook.add_format({'num_format': '$#,##0.00'})
+    format_percent = workbook.add_format({'num_format': '0.0%'})
+    header_format = workbook.add_format({'bold': True})
+
+    # Format currency columns
+    for i, col in enumerate(df.columns):
+        if "Price" in col or "Cost" in col or "Scan" in col or "Coupon" in col or "GM $" in col:
+            worksheet.set_column(i, i, 12, format_currency)
+        elif "GM %" in col or "% on Ad" in col:
+            worksheet.set_column(i, i, 12, format_percent)
+        else:
+            worksheet.set_column(i, i, 15)
+
+    # Freeze top row and make it bold
+    worksheet.freeze_panes(1, 0)
+    worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+
+    for row_num, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row_num, 0, row)
+
+    workbook.close()
+
+
+def write_index_ratios_xlsx(index_ratios_df, output, week_header=INDEX_RATIO_WEEK_HEADER):
+    """Stream the segment/size index ratio matrix into the SegSizeIndexRatio workbook"""
+    workbook = _open_workbook(output)
+    worksheet = workbook.add_worksheet('SegSizeIndexRatio_NielsenxAOC')
+    n_cols = len(index_ratios_df.columns)
+
+    # Format index as dates
+    worksheet.set_column(0, 0, 18)  # Width for week column
+
+    # Narrow data columns
+    if n_cols:
+        worksheet.set_column(1, n_cols, 6)
+
+    # Add conditional formatting
+    for col_num in range(1, n_cols + 1):
+        worksheet.conditional_format(1, col_num, len(index_ratios_df) + 1, col_num, {
+            'type': '3_color_scale',
+            'min_color': '#FFB6C1',  # Light pink
+            'mid_color': '#FFFFFF',  # White
+            'max_color': '#90EE90',  # Light green
+            'min_type': 'num',
+            'min_value': 0.7,
+            'mid_type': 'num',
+            'mid_value': 1.0,
+            'max_type': 'num',
+            'max_value': 1.3
+        })
+
+    # Set header row format
+    header_format = workbook.add_format({
+        'bold': True,
+        'bg_color': '#C8C8C8',  # Light gray
+        'border': 1
+    })
+    worksheet.write(0, 0, week_header, header_format)
+    worksheet.write_row(0, 1, [str(col) for col in index_ratios_df.columns], header_format)
+
+    for row_num, (week_label, row) in enumerate(zip(index_ratios_df.index, index_ratios_df.itertuples(index=False, name=None)), start=1):
+        worksheet.write(row_num, 0, week_label)
+        worksheet.write_row(row_num, 1, row)
+
+    # Freeze panes
+    worksheet.freeze_panes(1, 1)
+
+    # Page setup
+    worksheet.set_landscape()         # Set landscape orientation
+    worksheet.fit_to_pages(1, 0)      # Fit to 1 page wide, as many pages tall as needed
+    worksheet.set_margins(left=0.33, right=0.33, top=0.33, bottom=0.33)  # Set margins
+
+    workbook.close()
+
+
+def write_promo_plan_xlsx(plan_df, output):
+    """Stream a promo-week plan into an Excel workbook"""
+    workbook = _open_workbook(output)
+    worksheet = workbook.add_worksheet('Promo Plan')
+
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#C8C8C8', 'border': 1})
+    format_percent = workbook.add_format({'num_format': '0%'})
+
+    for i, col in enumerate(plan_df.columns):
+        if col == "Weeks":
+            worksheet.set_column(i, i, 32)
+        elif col == "Avg Index Ratio":
+            worksheet.set_column(i, i, 15, format_percent)
+        else:
+            worksheet.set_column(i, i, 12)
+
+    worksheet.freeze_panes(1, 0)
+    worksheet.write_row(0, 0, [str(col) for col in plan_df.columns], header_format)
+
+    for row_num, row in enumerate(plan_df.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row_num, 0, row)
+
+    workbook.close()
+
+
+def export_to_tempfile(writer, *args, **kwargs):
+    """Run an xlsx or Parquet writer into an anonymous temp file and return it rewound
+
+    The file is deleted from disk once closed; use it as a context manager and
+    read the bytes inside it.
+    """
+    output = tempfile.TemporaryFile()
+    try:
+        writer(*args, output=output, **kwargs)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def to_excel(df):
+    """Convert dataframe to Excel file bytes"""
+    with export_to_tempfile(write_scenarios_xlsx, df) as output:
+        return output.read()
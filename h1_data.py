@@ -0,0 +1,365 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from app_files import APP_DIR, atomic_write
+from h1_index import BRAND_COLUMN, PERIOD_COLUMNS, WEEK_COLUMN_PATTERN
+from lists import segment_size_combinations
+
+# Source file for the H1 data (override with SCANCALC_H1_DATA)
+DEFAULT_H1_PATH = os.environ.get("SCANCALC_H1_DATA", os.path.join(APP_DIR, "anonymized_h1_data.csv"))
+
+# Parsed H1 tables are cached here as Parquet, keyed on the source fingerprint
+DEFAULT_CACHE_DIR = os.environ.get("SCANCALC_H1_CACHE_DIR", os.path.join(APP_DIR, ".h1_cache"))
+
+# Bump when validate_h1_data changes so old caches are not reused
+CACHE_VERSION = 3
+
+# Week number inside a week column name (also the digits of a year or half)
+WEEK_NUMBER_PATTERN = re.compile(r"\d+")
+
+# Accepted spellings of the optional period columns
+PERIOD_COLUMN_ALIASES = {
+    "year": "Year",
+    "fiscal year": "Year",
+    "fy": "Year",
+    "half": "Half",
+    "period": "Half"
+}
+
+# Require at least this many weeks of data
+MIN_WEEKS = 10
+
+
+def validate_h1_data(df):
+    """Check and normalize a raw H1 table
+
+    Segment and Size are taken by header name, or from the first two columns
+    when the file has no such headers. Week columns are renamed to
+    'Week N' and coerced to float, and any other columns are dropped except
+    the optional Brand column of brand-level rows and the Year and Half
+    columns of multi-period files. Periods are parsed to integers ("F'25",
+    "FY25" and 2025 are all 2025; "H2" and 2 are 2). Blank week cells stay
+    blank so a half in progress keeps its week count; they are summed as zero.
+
+    Raises:
+        ValueError: If the table has too few columns or week columns
+    """
+    return _normalize_h1_table(df, MIN_WEEKS)
+
+
+def validate_week_data(df):
+    """Check and normalize one new week of H1 data, laid out like an H1 table with a single week column
+
+    Returns:
+        tuple: (DataFrame, week column name such as "Week 14", (year, half) or None
+        when the rows have no period columns)
+
+    Raises:
+        ValueError: If there is not exactly one week column or the rows span several periods
+    """
+    df = _normalize_h1_table(df, 1)
+    week_cols = [col for col in df.columns if WEEK_COLUMN_PATTERN.match(col)]
+    if len(week_cols) != 1:
+        raise ValueError(f"Expected one week column, found {len(week_cols)}")
+    # A row without a value sold nothing that week
+    df[week_cols[0]] = df[week_cols[0]].fillna(0.0)
+
+    period = None
+    if all(col in df.columns for col in PERIOD_COLUMNS):
+        periods = df[PERIOD_COLUMNS].drop_duplicates()
+        if len(periods) != 1:
+            raise ValueError("A week of H1 data must belong to a single year and half")
+        period = tuple(int(value) for value in periods.iloc[0])
+
+    return df, week_cols[0], period
+
+
+def _normalize_h1_table(df, min_weeks):
+    # Clean up column names (strip whitespace)
+    df.columns = [str(col).strip() for col in df.columns]
+
+    if len(df.columns) < 2:
+        raise ValueError("Not enough columns in the data")
+
+    # Segment and Size are found by name; files without those headers keep the
+    # legacy layout where the first two columns hold them, whatever they are called
+    named = {col.lower(): col for col in reversed(df.columns)}
+    if "segment" in named and "size" in named:
+        key_cols = [named["segment"], named["size"]]
+    else:
+        key_cols = list(df.columns[:2])
+    df = df.rename(columns=dict(zip(key_cols, ["Segment", "Size"])))
+    other_cols = [col for col in df.columns if col not in key_cols and col not in ("Segment", "Size")]
+
+    # Week columns may be written "Week 1" or "Week1"
+    week_cols = [col for col in other_cols if WEEK_COLUMN_PATTERN.match(col)]
+    if len(week_cols) < min_weeks:
+        raise ValueError(f"Not enough week columns identified. Need at least {min_weeks}, found {len(week_cols)}.")
+
+    # Optional fiscal period columns
+    period_cols = {col: PERIOD_COLUMN_ALIASES[col.lower()] for col in other_cols
+                   if col.lower() in PERIOD_COLUMN_ALIASES and col not in week_cols}
+    df = df.rename(columns=period_cols)
+    other_cols = [period_cols.get(col, col) for col in other_cols]
+    period_cols = [col for col in PERIOD_COLUMNS if col in df.columns]
+
+    # Optional brand column; rows without a brand still count toward their segment
+    brand_cols = [col for col in other_cols if col.lower() == BRAND_COLUMN.lower() and col not in week_cols][:1]
+    df = df.rename(columns={col: BRAND_COLUMN for col in brand_cols})
+    brand_cols = [BRAND_COLUMN] if brand_cols else []
+
+    df = df[["Segment", "Size"] + brand_cols + period_cols + week_cols]
+    df = df.rename(columns={col: f"Week {int(WEEK_NUMBER_PATTERN.search(col).group())}" for col in week_cols})
+    df = df.dropna(subset=["Segment", "Size"])
+
+    df["Segment"] = df["Segment"].astype(str).str.strip()
+    df["Size"] = df["Size"].astype(str).str.strip()
+    if brand_cols:
+        df[BRAND_COLUMN] = df[BRAND_COLUMN].where(df[BRAND_COLUMN].isna(), df[BRAND_COLUMN].astype(str).str.strip())
+
+    for col in period_cols:
+        df[col] = _parse_period_values(df[col], col)
+
+    # Ensure all week columns are float type
+    week_cols = list(df.columns[2 + len(brand_cols) + len(period_cols):])
+    df[week_cols] = df[week_cols].apply(pd.to_numeric, errors="coerce").astype(float)
+
+    return df.reset_index(drop=True)
+
+
+def _parse_period_values(values, column):
+    # Digits of each value: "F'25" -> 25, "H2" -> 2; two-digit years are 20xx
+    numbers = pd.to_numeric(values.astype(str).str.extract(r"(\d+)", expand=False), errors="coerce")
+    if numbers.isna().any():
+        raise ValueError(f"Could not read {column} values: {values[numbers.isna()].unique()[:5].tolist()}")
+    if column == "Year":
+        numbers = numbers.where(numbers >= 100, numbers + 2000)
+    elif not numbers.isin([1, 2]).all():
+        raise ValueError(f"Half must be 1 or 2, found {sorted(numbers.unique().tolist())}")
+    return numbers.astype(int)
+
+
+def source_fingerprint(file_path):
+    """Cheap fingerprint of a source file: path, size and modification time"""
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{CACHE_VERSION}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _read_source(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return pd.read_parquet(file_path)
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(file_path)
+    return pd.read_csv(file_path)
+
+
+def _cache_path(file_path, fingerprint, cache_dir):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{fingerprint}.parquet")
+
+
+def load_h1_data(file_path=DEFAULT_H1_PATH, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Load H1 data from a CSV, Excel or Parquet file through a Parquet cache
+
+    The validated table is written to cache_dir under the source file's
+    fingerprint, so later loads of an unchanged file skip parsing entirely.
+    Pass cache_dir=None to disable caching.
+
+    Args:
+        file_path (str): Path to the H1 source file
+        cache_dir (str): Directory for cached Parquet files
+
+    Returns:
+        pd.DataFrame: Segment, Size and 'Week N' float columns
+
+    Raises:
+        OSError: If the source file cannot be read
+        ValueError: If the data does not look like an H1 table
+    """
+    fingerprint = source_fingerprint(file_path)
+    cache_file = _cache_path(file_path, fingerprint, cache_dir) if cache_dir else None
+
+    if cache_file and os.path.exists(cache_file):
+        try:
+            return pd.read_parquet(cache_file)
+        except (OSError, ValueError, ImportError):
+            # Unreadable cache: fall through and rebuild it
+            pass
+
+    df = validate_h1_data(_read_source(file_path))
+
+    if cache_file:
+        try:
+            _write_cache(df, cache_file)
+        except (OSError, ImportError):
+            # Caching is an optimization; a read-only disk or missing pyarrow is not fatal
+            pass
+
+    return df
+
+
+def _write_cache(df, cache_file):
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Written atomically, so a concurrent reader never sees a partial file
+    atomic_write(cache_file, lambda f: df.to_parquet(f, index=False), mode="wb")
+
+    # Drop caches of older versions of the same source file
+    prefix = os.path.basename(cache_file).rsplit("-", 1)[0] + "-"
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and name.endswith(".parquet") and path != cache_file:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _generated_names(value, prefix):
+    # An int asks for that many generated names, anything else is used as given
+    if isinstance(value, int):
+        width = len(str(value))
+        return [f"{prefix} {i:0{width}d}" for i in range(1, value + 1)]
+    return list(value)
+
+
+def generate_h1_data(seed=0, segments=None, sizes=None, n_brands=1, n_stores=1, n_weeks=27, id_columns=False,
+                     years=None):
+    """
+    Generate a synthetic H1 table in the wide Segment/Size/'Week N' layout
+
+    Each segment/size gets a random base RSV, split across brands and stores by
+    random shares, with a seasonal wave and +/-20% weekly noise on top. With no
+    segments or sizes given the rows follow segment_size_combinations, which is
+    the demo table the app shows without an H1 file. The same seed and sizes
+    always give the same table.
+
+    Rows repeat each segment/size once per brand and store; H1RatioIndex sums
+    duplicate rows, so brand/store detail adds up to the segment/size totals.
+    With years, every row is repeated per fiscal year (first half) with Year
+    and Half columns and a random year-over-year trend per segment/size.
+
+    Args:
+        seed (int): Seed for the random generator
+        segments (int or list): Segment names, or how many to generate; requires sizes
+            to be given the same way (a full segment x size grid is produced)
+        sizes (int or list): Size names, or how many to generate
+        n_brands (int): Rows per segment/size for brands
+        n_stores (int): Rows per segment/size/brand for stores
+        n_weeks (int): Number of week columns
+        id_columns (bool): Add Brand and Store columns before the week columns
+        years (list): Fiscal years to generate, oldest first; None for a single period without period columns
+
+    Returns:
+        pd.DataFrame: n_segment_sizes * n_years * n_brands * n_stores rows of float week columns
+    """
+    rng = np.random.default_rng(seed)
+
+    if segments is None and sizes is None:
+        pairs = [(segment, size) for segment, seg_sizes in segment_size_combinations.items() for size in seg_sizes]
+        pair_segments = np.array([segment for segment, _ in pairs], dtype=object)
+        pair_sizes = np.array([size for _, size in pairs], dtype=object)
+    else:
+        segment_names = _generated_names(segments if segments is not None else 1, "Segment")
+        size_names = _generated_names(sizes if sizes is not None else 1, "Size")
+        pair_segments = np.repeat(np.array(segment_names, dtype=object), len(size_names))
+        pair_sizes = np.tile(np.array(size_names, dtype=object), len(segment_names))
+
+    n_pairs = len(pair_segments)
+    n_years = len(years) if years else 1
+    n_detail = n_brands * n_stores
+    n_rows = n_pairs * n_years * n_detail
+
+    # Base value per segment/size, split by brand and store shares that sum to 1
+    base_value = rng.uniform(50000, 500000, n_pairs)
+    brand_share = rng.uniform(0.5, 1.5, (n_pairs, n_brands))
+    brand_share /= brand_share.sum(axis=1, keepdims=True)
+    store_share = rng.uniform(0.5, 1.5, (n_pairs, n_brands, n_stores))
+    store_share /= store_share.sum(axis=2, keepdims=True)
+
+    # Year-over-year trend per segment/size, compounding from the first year
+    trend = np.ones((n_pairs, n_years))
+    if years:
+        growth = rng.uniform(0.9, 1.15, (n_pairs, n_years))
+        growth[:, 0] = 1
+        trend = np.cumprod(growth, axis=1)
+
+    row_base = (base_value[:, None, None, None] * trend[:, :, None, None] *
+                brand_share[:, None, :, None] * store_share[:, None, :, :]).reshape(n_rows)
+
+    # Seasonality (a wave over the weeks) times random variation, filled in place
+    seasonal_factor = 1 + 0.2 * np.sin(np.arange(1, n_weeks + 1) / 4)
+    values = rng.uniform(0.8, 1.2, (n_rows, n_weeks))
+    values *= seasonal_factor
+    values *= row_base[:, None]
+
+    week_columns = [f"Week {i}" for i in range(1, n_weeks + 1)]
+    ids = {
+        "Segment": np.repeat(pair_segments, n_years * n_detail),
+        "Size": np.repeat(pair_sizes, n_years * n_detail)
+    }
+    if years:
+        ids["Year"] = np.tile(np.repeat(np.asarray(years, dtype=np.int64), n_detail), n_pairs)
+        ids["Half"] = np.ones(n_rows, dtype=np.int64)
+    if id_columns:
+        brand_names = np.array(_generated_names(n_brands, "Brand"), dtype=object)
+        store_names = np.array(_generated_names(n_stores, "Store"), dtype=object)
+        ids["Brand"] = np.tile(np.repeat(brand_names, n_stores), n_pairs * n_years)
+        ids["Store"] = np.tile(store_names, n_pairs * n_years * n_brands)
+
+    return pd.concat([pd.DataFrame(ids), pd.DataFrame(values, columns=week_columns)], axis=1)
+
+
+def generate_brand_h1_data(brands, seed=0, n_weeks=27, years=None, max_sizes=3):
+    """
+    Generate a synthetic brand-level H1 table: Segment, Size, Brand and week columns
+
+    Each brand is placed in one segment and carries 1 to max_sizes of that
+    segment's sizes, so the brand x size grid is sparse like a real catalog.
+    Every segment/size also gets a row without a brand for the rest of the
+    category. The segment/size totals are those of generate_h1_data with the
+    same seed, split across the brands with random shares and per-week noise.
+
+    Args:
+        brands (list): Brand names
+        seed (int): Seed for the random generator
+        n_weeks (int): Number of week columns
+        years (list): Fiscal years to generate, as in generate_h1_data
+        max_sizes (int): Most sizes a brand carries
+
+    Returns:
+        pd.DataFrame: One row per brand/size (and year)
+    """
+    totals = generate_h1_data(seed=seed, n_weeks=n_weeks, years=years)
+    rng = np.random.default_rng([seed, 1])
+
+    # Sparse brand -> (segment, sizes) assignment
+    segments = list(segment_size_combinations)
+    detail = []
+    for brand in brands:
+        segment = segments[rng.integers(len(segments))]
+        sizes = segment_size_combinations[segment]
+        n_sizes = rng.integers(1, min(max_sizes, len(sizes)) + 1)
+        detail.extend((segment, size, brand) for size in rng.choice(sizes, n_sizes, replace=False))
+    detail.extend((segment, size, None) for segment, sizes in segment_size_combinations.items() for size in sizes)
+    detail = pd.DataFrame(detail, columns=["Segment", "Size", BRAND_COLUMN])
+
+    # Random shares that sum to 1 within each segment/size (brandless rows included)
+    weight = pd.Series(rng.uniform(0.5, 1.5, len(detail)), index=detail.index)
+    detail["share"] = weight / weight.groupby([detail["Segment"], detail["Size"]]).transform("sum")
+
+    rows = detail.merge(totals, on=["Segment", "Size"], how="inner")
+    week_columns = [f"Week {i}" for i in range(1, n_weeks + 1)]
+    values = rows[week_columns].to_numpy() * rows["share"].to_numpy()[:, None]
+    values *= rng.uniform(0.9, 1.1, values.shape)
+    rows[week_columns] = values
+
+    return rows.drop(columns="share")
@@ -0,0 +1,479 @@
+import copy
+import datetime
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# H1 week columns look like "Week 1" or "Week1"
+WEEK_COLUMN_PATTERN = re.compile(r"week\s*\d+", re.IGNORECASE)
+
+# Optional columns placing each H1 row in a fiscal year and half (1 or 2)
+PERIOD_COLUMNS = ["Year", "Half"]
+
+# Optional brand column of brand-level H1 rows
+BRAND_COLUMN = "Brand"
+
+# Key columns of the segment-level and brand-level cubes
+SEGMENT_KEY_COLUMNS = ("Segment", "Size")
+BRAND_KEY_COLUMNS = (BRAND_COLUMN, "Size")
+
+# Weeks in the first half; the second half starts the week after it ends
+H1_WEEKS = 27
+
+
+def h1_week_columns(h1_data):
+    """Return the weekly RSV columns of an H1 table"""
+    week_cols = [col for col in h1_data.columns if WEEK_COLUMN_PATTERN.match(str(col))]
+    # Older extracts have unlabeled weeks after the Segment and Size columns
+    return week_cols if week_cols else [col for col in h1_data.columns[2:]
+                                        if str(col) not in PERIOD_COLUMNS and str(col) != BRAND_COLUMN]
+
+
+def h1_period_start(year=None):
+    """First day of the H1 window (Jun 30 of the given or current year)"""
+    if year is None:
+        year = datetime.datetime.now().year
+    return datetime.datetime(year, 6, 30)
+
+
+def period_start(year, half=1):
+    """First day of a fiscal half"""
+    return h1_period_start(year) + datetime.timedelta(weeks=H1_WEEKS * (half - 1))
+
+
+def default_period():
+    """(year, half) assumed for H1 data without period columns"""
+    return h1_period_start().year, 1
+
+
+def period_label(period):
+    """Short label of a (year, half) period, e.g. F'25 H1"""
+    year, half = period
+    return f"F'{year % 100:02d} H{half}"
+
+
+def h1_week_labels(n_weeks=27, week_start_date=None):
+    """Week labels like '2: Jul 07-Jul 13' for an H1 window, generated once per window"""
+    if week_start_date is None:
+        week_start_date = h1_period_start()
+    return _week_labels(n_weeks, week_start_date)
+
+
+@lru_cache(maxsize=32)
+def _week_labels(n_weeks, week_start_date):
+    week_labels = []
+    for i in range(1, n_weeks + 1):
+        week_end_date = week_start_date + datetime.timedelta(days=6)
+        if i == 1:
+            week_label = f"{i}: {week_start_date:%b} {week_start_date.day}-{week_end_date:%b} {week_end_date.day}"
+        else:
+            week_label = f"{i}: {week_start_date.strftime('%b %d')}-{week_end_date.strftime('%b %d')}"
+        week_labels.append(week_label)
+        week_start_date += datetime.timedelta(days=7)
+
+    return tuple(week_labels)
+
+
+def normalize_key(value):
+    """Case- and whitespace-insensitive lookup key for a segment or size"""
+    return str(value).strip().upper()
+
+
+def _factorize_keys(first, second):
+    # Codes and distinct "FIRST|SECOND" keys of rows, normalizing each distinct value only once
+    parts = []
+    for column in (first, second):
+        codes, uniques = pd.factorize(column)
+        key_codes, keys = pd.factorize(pd.Index(uniques, dtype=object).map(normalize_key))
+        parts.append((key_codes[codes], list(keys)))
+    (first_codes, first_keys), (second_codes, second_keys) = parts
+
+    n_second = max(len(second_keys), 1)
+    codes, pairs = pd.factorize(first_codes.astype(np.int64) * n_second + second_codes, sort=False)
+    return codes, [f"{first_keys[pair // n_second]}|{second_keys[pair % n_second]}" for pair in pairs]
+
+
+def _period_codes(h1_data):
+    # Year and half per row; rows without them belong to the default period
+    default_year, default_half = default_period()
+    columns = {col.lower(): col for col in map(str, h1_data.columns)}
+    values = []
+    for name, default in zip(PERIOD_COLUMNS, (default_year, default_half)):
+        col = columns.get(name.lower())
+        if col is None:
+            values.append(np.full(len(h1_data), default, dtype=np.int64))
+        else:
+            values.append(pd.to_numeric(h1_data[col], errors="coerce").fillna(default).to_numpy(dtype=np.int64))
+    return values
+
+
+class H1HistoryCube:
+    """H1 data for every fiscal period as a dense key x period x week array
+
+    Keys are (Segment, Size) by default, or (Brand, Size) for brand-level rows.
+    Only key pairs that occur in the data get a row, so a brand catalog where
+    most brands carry a few sizes stays small; rows missing a key are skipped.
+    Rows that share a key and period are summed. Averages, std/mean
+    thresholds and year-over-year RSV changes are computed for all
+    combinations and periods in one vectorized pass; a period that has fewer
+    weeks (e.g. a half still in progress) only uses its own weeks.
+
+    H1RatioIndex is the per-period view the app looks values up in; it works
+    out the period's index ratios when it is built.
+    """
+
+    def __init__(self, h1_data, key_columns=SEGMENT_KEY_COLUMNS):
+        # Keep a reference to the source frame so callers can detect replacement
+        self.source = h1_data
+        self.key_columns = tuple(key_columns)
+        self.week_columns = h1_week_columns(h1_data) if not h1_data.empty else []
+        n_weeks = len(self.week_columns)
+
+        if h1_data.empty or not n_weeks or not all(col in h1_data.columns for col in self.key_columns):
+            codes, uniques = np.zeros(0, dtype=np.int64), []
+            values = np.zeros((0, n_weeks))
+            years = halves = np.zeros(0, dtype=np.int64)
+        else:
+            first, second = (h1_data[col] for col in self.key_columns)
+            keep = (first.notna() & second.notna()).to_numpy()
+            codes, uniques = _factorize_keys(first[keep], second[keep])
+            values = h1_data[self.week_columns].to_numpy(dtype=float)[keep]
+            years, halves = (codes[keep] for codes in _period_codes(h1_data))
+
+        # Periods in chronological order; there is always at least one
+        period_values, period_codes = np.unique(years * 10 + halves, return_inverse=True)
+        self.periods = [(int(value // 10), int(value % 10)) for value in period_values] or [default_period()]
+        n_periods = len(self.periods)
+
+        # First and second key of every row (segment or brand, then size)
+        self.segments = []
+        self.sizes = []
+        self._rows = {}
+        for row, key in enumerate(uniques):
+            segment, size = key.split("|", 1)
+            self.segments.append(segment)
+            self.sizes.append(size)
+            self._rows[(segment, size)] = row
+
+        # Weekly RSV lives in a buffer with room for a full half, which append_week fills in place
+        self._buffer = np.zeros((len(uniques), n_periods, max(n_weeks, H1_WEEKS)))
+        self._tail = object()
+        self._buffer_tail = [self._tail]
+        self.values = self._buffer[:, :, :n_weeks]
+        # A blank cell in a row sold nothing that week, as when a week is appended
+        np.add.at(self.values, (codes, period_codes), np.nan_to_num(values))
+        self.present = np.zeros((len(uniques), n_periods), dtype=bool)
+        self.present[codes, period_codes] = True
+
+        # Weeks per period: up to the last week with data in any of its rows
+        has_week = np.zeros((n_periods, n_weeks), dtype=bool)
+        np.logical_or.at(has_week, period_codes, ~np.isnan(values))
+        self.week_counts = (has_week * np.arange(1, n_weeks + 1)).max(axis=1, initial=0)
+        in_period = (np.arange(n_weeks)[None, :] < self.week_counts[:, None])[None, :, :]
+        n = np.maximum(self.week_counts, 1)[None, :]
+
+        # Mean and sum of squared deviations per key and period; append_week advances them a week at a time
+        self.means = np.where(in_period, self.values, 0.0).sum(axis=2) / n
+        deviations = np.where(in_period, self.values - self.means[:, :, None], 0.0)
+        self.m2 = (deviations ** 2).sum(axis=2)
+
+        self.thresholds = np.zeros_like(self.means)
+        self._update_thresholds(np.arange(n_periods))
+
+        # Year-over-year against the same half of the previous year (NaN when there is none)
+        position = {period: p for p, period in enumerate(self.periods)}
+        self.previous_period = np.array([position.get((year - 1, half), -1) for year, half in self.periods])
+        self.yoy_rsv_change = np.full_like(self.means, np.nan)
+        self._update_yoy(np.arange(n_periods))
+
+        self._freeze()
+        self._views = {}
+
+    def _arrays(self):
+        return self.values, self.present, self.means, self.m2, self.thresholds, self.yoy_rsv_change
+
+    def _freeze(self):
+        for array in self._arrays():
+            array.setflags(write=False)
+
+    def _update_thresholds(self, periods):
+        # Std/mean threshold for highlighting (zero when the average is not positive)
+        means = self.means[:, periods]
+        std_devs = np.sqrt(self.m2[:, periods] / np.maximum(self.week_counts[periods], 1)[None, :])
+        self.thresholds[:, periods] = np.divide(std_devs, means, out=np.zeros_like(means), where=means > 0)
+
+    def _period_ratios(self, p, n_weeks):
+        # Index ratios of every key over the first n_weeks weeks of period position p;
+        # zero past the period's loaded weeks and where the average is not positive
+        means = self.means[:, p]
+        in_period = (np.arange(n_weeks) < self.week_counts[p])[None, :] & (means > 0)[:, None]
+        return np.divide(self.values[:, p, :n_weeks], means[:, None], out=np.zeros((len(self), n_weeks)),
+                         where=in_period)
+
+    def _update_yoy(self, periods):
+        previous_period = self.previous_period[periods]
+        previous = np.maximum(previous_period, 0)
+        comparable = (previous_period >= 0)[None, :] & self.present[:, periods] & self.present[:, previous] & \
+            (self.means[:, previous] > 0)
+        self.yoy_rsv_change[:, periods] = np.divide(self.means[:, periods], self.means[:, previous],
+                                                    out=np.full((len(self), len(periods)), np.nan),
+                                                    where=comparable) - 1
+
+    def append_week(self, week_data, week_column, period=None):
+        """
+        New cube with one more week of data for a period, without re-aggregating the history
+
+        The week's rows are summed per key, then each key's mean and sum of
+        squared deviations for the period take one Welford step, so the
+        arithmetic grows with the new week's rows and keys rather than with
+        the weeks and periods already loaded. Only the period's thresholds
+        and the year-over-year changes that compare against it are refreshed.
+
+        The week is written into the weekly RSV buffer this cube shares with
+        the cube it was appended from, past the weeks either of them reads,
+        so this cube is left as it is (sessions may still be reading it).
+        The buffer doubles in size when it runs out of room for a week, key
+        or period, and is copied when this cube already had a week appended,
+        so the arrays are only copied O(log n) times over n appends; the
+        per-key means, thresholds and presence flags are copied every time.
+        Appends to cubes that share a buffer must not run concurrently
+        (append_shared_week holds a lock).
+
+        Args:
+            week_data (pd.DataFrame): Rows with this cube's key columns and week_column
+            week_column (str): Column holding the week's RSV, e.g. "Week 14"
+            period (tuple): (year, half) the week belongs to; None means the latest period.
+                A period later than the latest starts a new period at week 1.
+
+        Returns:
+            H1HistoryCube: The updated cube
+
+        Raises:
+            ValueError: If the week is not the next week of the period, or the period is
+                older than the latest and not in the cube
+        """
+        period = self.periods[-1] if period is None else (int(period[0]), int(period[1]))
+        new_period = period not in self.periods
+        if new_period and period < self.periods[-1]:
+            raise ValueError(f"Cannot start {period_label(period)} before the latest period {period_label(self.periods[-1])}")
+
+        p = len(self.periods) if new_period else self.periods.index(period)
+        week = 0 if new_period else int(self.week_counts[p])
+        week_number = int(re.search(r"\d+", str(week_column)).group())
+        if week_number != week + 1:
+            raise ValueError(f"{period_label(period)} has {week} weeks loaded; the next week to append is Week {week + 1}, not Week {week_number}")
+
+        # Sum the week's rows per key
+        first, second = (week_data[col] for col in self.key_columns)
+        keep = (first.notna() & second.notna()).to_numpy()
+        codes, uniques = _factorize_keys(first[keep], second[keep])
+        week_sums = np.bincount(codes, weights=week_data[week_column].to_numpy(dtype=float)[keep], minlength=len(uniques))
+
+        cube = copy.copy(self)
+        cube.segments = list(self.segments)
+        cube.sizes = list(self.sizes)
+        cube._rows = dict(self._rows)
+        for key in uniques:
+            segment, size = key.split("|", 1)
+            if (segment, size) not in cube._rows:
+                cube._rows[(segment, size)] = len(cube.segments)
+                cube.segments.append(segment)
+                cube.sizes.append(size)
+        rows = np.array([cube._rows[tuple(key.split("|", 1))] for key in uniques], dtype=np.int64)
+
+        if new_period:
+            cube.periods = self.periods + [period]
+            position = {known: q for q, known in enumerate(cube.periods)}
+            cube.previous_period = np.append(self.previous_period, position.get((period[0] - 1, period[1]), -1))
+        cube.week_counts = np.append(self.week_counts, 0) if new_period else self.week_counts.copy()
+        cube.week_columns = list(self.week_columns)
+        if week >= len(cube.week_columns):
+            cube.week_columns.append(f"Week {week + 1}")
+
+        n_keys, n_periods, n_weeks = len(cube.segments), len(cube.periods), max(self.values.shape[2], week + 1)
+        shape = (n_keys, n_periods, n_weeks)
+
+        # Keep filling the shared buffer while it has room and nothing was appended to this cube yet;
+        # otherwise move to a new one, doubling each dimension that ran out
+        capacity = self._buffer.shape
+        if self._buffer_tail[0] is not self._tail or any(size > room for size, room in zip(shape, capacity)):
+            cube._buffer = np.zeros(tuple(room if size <= room else max(size, 2 * room)
+                                          for size, room in zip(shape, capacity)))
+            cube._buffer[tuple(slice(0, size) for size in self.values.shape)] = self.values
+            cube._buffer_tail = [None]
+        cube._tail = object()
+        cube._buffer_tail[0] = cube._tail
+        cube.values = cube._buffer[:n_keys, :n_periods, :n_weeks]
+
+        # Copy the per-key arrays, growing them for new keys or the new period
+        def grown(array, fill):
+            result = np.full((n_keys, n_periods), fill, dtype=array.dtype)
+            result[:array.shape[0], :array.shape[1]] = array
+            return result
+
+        cube.means, cube.m2, cube.thresholds = grown(self.means, 0.0), grown(self.m2, 0.0), grown(self.thresholds, 0.0)
+        cube.present = grown(self.present, False)
+        cube.yoy_rsv_change = grown(self.yoy_rsv_change, np.nan)
+
+        # Welford step: every key of the period gains one week, zero where it had no rows
+        x = np.zeros(n_keys)
+        x[rows] = week_sums
+        count = week + 1
+        delta = x - cube.means[:, p]
+        cube.means[:, p] += delta / count
+        cube.m2[:, p] += delta * (x - cube.means[:, p])
+        cube._buffer[:n_keys, p, week] = x
+        cube.present[rows, p] = True
+        cube.week_counts[p] = count
+
+        # Refresh the period's thresholds, then the year-over-year changes of it and of the period a year later
+        cube._update_thresholds(np.array([p]))
+        cube._update_yoy(np.flatnonzero((np.arange(n_periods) == p) | (cube.previous_period == p)))
+
+        cube._freeze()
+        cube._views = {}
+        return cube
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def nbytes(self):
+        """Memory held by the cube arrays (with the whole weekly RSV buffer) and its views' ratios and cached frames"""
+        return self._buffer.nbytes + sum(array.nbytes for array in self._arrays()[1:]) + \
+            sum(view.ratios.nbytes + view.yoy_ratio_delta.nbytes + view.frames_nbytes for view in self._views.values())
+
+    def period_position(self, period=None):
+        """Position of a (year, half) period in self.periods; None means the latest
+
+        Raises:
+            KeyError: If the cube has no data for the period
+        """
+        if period is None:
+            return len(self.periods) - 1
+        period = (int(period[0]), int(period[1]))
+        if period not in self.periods:
+            raise KeyError(f"No H1 data for {period_label(period)}")
+        return self.periods.index(period)
+
+    def period_index(self, period=None):
+        """H1RatioIndex view of one period (the latest by default), built once"""
+        p = self.period_position(period)
+        if p not in self._views:
+            self._views[p] = H1RatioIndex(self, self.periods[p])
+        return self._views[p]
+
+
+class H1RatioIndex:
+    """Index ratio vectors per (segment, size) for one H1 period
+
+    A view into an H1HistoryCube, so lookups are a dict hit into arrays that
+    were computed up front: the cube's means and thresholds, and the period's
+    index ratios and year-over-year ratio deltas, worked out once here. Built
+    from a DataFrame it covers the latest period in the data.
+    """
+
+    def __init__(self, h1_data, period=None):
+        cube = h1_data if isinstance(h1_data, H1HistoryCube) else H1HistoryCube(h1_data)
+        p = cube.period_position(period)
+        n_weeks = int(cube.week_counts[p])
+
+        self.cube = cube
+        self.source = cube.source
+        self.period = cube.periods[p]
+        self.start_date = period_start(*self.period)
+        self.week_columns = cube.week_columns[:n_weeks]
+        self.segments = cube.segments
+        self.sizes = cube.sizes
+        self._rows = {key: row for key, row in cube._rows.items() if cube.present[row, p]}
+
+        self.values = cube.values[:, p, :n_weeks]
+        self.means = cube.means[:, p]
+        self.thresholds = cube.thresholds[:, p]
+        self.ratios = cube._period_ratios(p, n_weeks)
+        self.yoy_rsv_change = cube.yoy_rsv_change[:, p]
+
+        # Ratio deltas against the same half of the previous year, where the RSV change is comparable
+        previous = cube.previous_period[p]
+        self.previous_period = cube.periods[previous] if previous >= 0 else None
+        if previous >= 0:
+            comparable = ~np.isnan(self.yoy_rsv_change)[:, None]
+            self.yoy_ratio_delta = np.where(comparable, self.ratios - cube._period_ratios(previous, n_weeks), np.nan)
+        else:
+            self.yoy_ratio_delta = np.full_like(self.ratios, np.nan)
+        self.ratios.setflags(write=False)
+        self.yoy_ratio_delta.setflags(write=False)
+
+        self._ratio_frames = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        segment, size = key
+        return (normalize_key(segment), normalize_key(size)) in self._rows
+
+    @property
+    def frames_nbytes(self):
+        """Memory held by cached ratio frames"""
+        return sum(int(frame.memory_usage(deep=True).sum()) for frame in self._ratio_frames.values())
+
+    @property
+    def nbytes(self):
+        """Memory held by this period's slices of the cube and the cached ratio frames"""
+        return self.values.nbytes + self.means.nbytes + self.thresholds.nbytes + self.ratios.nbytes + self.frames_nbytes
+
+    @property
+    def week_labels(self):
+        """Week labels of this period"""
+        return h1_week_labels(len(self.week_columns), self.start_date)
+
+    def row(self, segment, size):
+        """Row number of a segment/size combination, or None if it has no data"""
+        return self._rows.get((normalize_key(segment), normalize_key(size)))
+
+    def lookup(self, segment, size):
+        """Return (index_ratios, avg_weekly_rsv, threshold) or (None, None, None)"""
+        row = self.row(segment, size)
+        if row is None:
+            return None, None, None
+        return self.ratios[row].tolist(), self.means[row], self.thresholds[row]
+
+    def yoy(self, segment, size):
+        """Return (avg weekly RSV change, per-week index ratio deltas) vs the previous year
+
+        Both are None when there is no comparable previous-year data.
+        """
+        row = self.row(segment, size)
+        if row is None or np.isnan(self.yoy_rsv_change[row]):
+            return None, None
+        return float(self.yoy_rsv_change[row]), self.yoy_ratio_delta[row].tolist()
+
+    def ratio_frame(self, columns, week_labels=None):
+        """Week x combination index ratio matrix in one gather over the ratio array
+
+        Args:
+            columns (list): (column_name, segment, size) tuples; combinations
+                without data are left out
+            week_labels (tuple): Row labels, defaults to this period's week labels
+
+        Returns:
+            pd.DataFrame: Shared, cached result; callers must not modify it
+        """
+        columns = tuple(columns)
+        if week_labels is None:
+            week_labels = self.week_labels
+        cache_key = (columns, tuple(week_labels))
+
+        if cache_key not in self._ratio_frames:
+            rows = [self.row(segment, size) for _, segment, size in columns]
+            present = [i for i, row in enumerate(rows) if row is not None]
+            self._ratio_frames[cache_key] = pd.DataFrame(
+                self.ratios[[rows[i] for i in present]].T,
+                index=list(week_labels),
+                columns=[columns[i][0] for i in present]
+            )
+
+        return self._ratio_frames[cache_key]
@@ -0,0 +1,222 @@
+import threading
+
+import metrics
+from h1_data import DEFAULT_H1_PATH, load_h1_data, source_fingerprint, validate_week_data
+from h1_index import BRAND_COLUMN, BRAND_KEY_COLUMNS, H1HistoryCube, normalize_key
+
+# Fingerprint of the generated sample data used when there is no H1 file
+SAMPLE_FINGERPRINT = "sample"
+
+
+class H1Snapshot:
+    """One version of the H1 data and its history cubes, shared by every session
+
+    Snapshots are never modified after they are built: the cube arrays are
+    read-only and the frame must be treated as such (pandas copy-on-write keeps
+    a session's own edits from reaching it). A refresh or an appended week
+    builds a new snapshot and swaps the reference, so sessions holding the old one are not disturbed.
+    The cubes are built on first use, once per snapshot.
+    """
+
+    # Tells session_state size reports that sessions only hold a reference
+    shared = True
+
+    def __init__(self, h1_data, fingerprint=None, error=None, sample=False):
+        self.h1_data = h1_data
+        self.fingerprint = fingerprint
+        self.error = error
+        self.sample = sample
+        # Weeks appended with with_week since the source was loaded
+        self.appended_weeks = 0
+        self._cubes = {}
+        self._brand_segments = None
+        self._lock = threading.Lock()
+
+    def _get_cube(self, key_columns=None):
+        cube = self._cubes.get(key_columns)
+        if cube is not None:
+            return cube
+
+        # Concurrent first calls wait for a single build
+        with self._lock:
+            if key_columns not in self._cubes:
+                kwargs = {"key_columns": key_columns} if key_columns else {}
+                self._cubes[key_columns] = H1HistoryCube(self.h1_data, **kwargs)
+                metrics.increment("h1_index_builds_total")
+            return self._cubes[key_columns]
+
+    @property
+    def cube(self):
+        """Segment x size history cube"""
+        return self._get_cube()
+
+    @property
+    def brand_cube(self):
+        """Brand x size history cube, or None when the data has no brand rows"""
+        if BRAND_COLUMN not in self.h1_data.columns:
+            return None
+        return self._get_cube(BRAND_KEY_COLUMNS)
+
+    def _get_brand_segments(self):
+        # Normalized brand -> normalized segments it has rows in, built on first use
+        if self._brand_segments is None:
+            self._brand_segments = _add_brand_segments({}, self.h1_data)
+        return self._brand_segments
+
+    def brand_in_segment(self, brand, segment):
+        """Whether the H1 data (or an appended week) has rows for the brand in a (data) segment"""
+        return normalize_key(segment) in self._get_brand_segments().get(normalize_key(brand), ())
+
+    @property
+    def nbytes(self):
+        """Memory held by the frame and the cubes built so far"""
+        return int(self.h1_data.memory_usage(deep=True).sum()) + sum(cube.nbytes for cube in self._cubes.values())
+
+    def with_week(self, week_data):
+        """
+        New snapshot with one more week of data, appended to the cubes incrementally
+
+        The frame stays as it was loaded; the appended weeks live in the cubes
+        until the source file itself changes and is reloaded. When the data has
+        brand rows the week must have a Brand column too, so the segment and
+        brand cubes always advance together.
+
+        Args:
+            week_data (pd.DataFrame): One week of H1 data, as accepted by validate_week_data
+
+        Returns:
+            H1Snapshot: The updated snapshot
+
+        Raises:
+            ValueError: If the week data is invalid, has no Brand column while the
+                data has brand rows, or is not the next week of its period
+        """
+        week_data, week_column, period = validate_week_data(week_data)
+        if BRAND_COLUMN in self.h1_data.columns and BRAND_COLUMN not in week_data.columns:
+            raise ValueError(f"The H1 data has brand rows, so the week needs a {BRAND_COLUMN} column")
+
+        # Build the cubes first, so none is later built from the frame without the new week
+        cubes = {None: self.cube}
+        if self.brand_cube is not None:
+            cubes[BRAND_KEY_COLUMNS] = self.brand_cube
+
+        snapshot = H1Snapshot(self.h1_data, self.fingerprint, self.error, self.sample)
+        for key_columns, cube in cubes.items():
+            snapshot._cubes[key_columns] = cube.append_week(week_data, week_column, period)
+        snapshot.appended_weeks = self.appended_weeks + 1
+        # A brand can show up in a segment for the first time in the new week
+        brand_segments = {brand: set(segments) for brand, segments in self._get_brand_segments().items()}
+        snapshot._brand_segments = _add_brand_segments(brand_segments, week_data)
+        metrics.increment("h1_week_appends_total")
+        return snapshot
+
+    def with_error(self, fingerprint, error):
+        """Same data and cubes under a new fingerprint, reporting why the source was not loaded"""
+        snapshot = H1Snapshot(self.h1_data, fingerprint, error, self.sample)
+        snapshot._cubes = self._cubes
+        snapshot._brand_segments = self._brand_segments
+        snapshot.appended_weeks = self.appended_weeks
+        return snapshot
+
+
+def _add_brand_segments(brand_segments, h1_data):
+    # Add the (brand, segment) pairs of the brand rows in a frame to a brand -> segments dict
+    if BRAND_COLUMN in h1_data.columns:
+        pairs = h1_data[[BRAND_COLUMN, "Segment"]].dropna().drop_duplicates()
+        for brand, segment in pairs.itertuples(index=False, name=None):
+            brand_segments.setdefault(normalize_key(brand), set()).add(normalize_key(segment))
+    return brand_segments
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def _current_fingerprint(file_path):
+    try:
+        return source_fingerprint(file_path)
+    except OSError:
+        return SAMPLE_FINGERPRINT
+
+
+def shared_snapshot(sample_data, file_path=DEFAULT_H1_PATH):
+    """
+    The process-wide H1 snapshot, reloaded when the source file changes
+
+    Each call compares the file's fingerprint (path, size, mtime) with the
+    current snapshot's. On a change one caller loads the file and swaps in
+    the new snapshot while the others keep getting the previous one, so no
+    session ever waits on or sees a half-built snapshot. A file that fails to
+    load keeps the last data that did load (or the sample data) with the error set.
+
+    Args:
+        sample_data (callable): Returns the demo H1 frame used without a usable file
+        file_path (str): H1 source file
+
+    Returns:
+        H1Snapshot: Shared, read-only snapshot
+    """
+    global _snapshot
+
+    fingerprint = _current_fingerprint(file_path)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.fingerprint == fingerprint:
+        return snapshot
+
+    # Serve the previous snapshot while another session refreshes it
+    if not _lock.acquire(blocking=snapshot is None):
+        return snapshot
+
+    try:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.fingerprint != fingerprint:
+            snapshot = _load_snapshot(sample_data, file_path, fingerprint, snapshot)
+            _snapshot = snapshot
+        return snapshot
+    finally:
+        _lock.release()
+
+
+def _load_snapshot(sample_data, file_path, fingerprint, previous):
+    if fingerprint == SAMPLE_FINGERPRINT:
+        return H1Snapshot(sample_data(), fingerprint, sample=True)
+
+    try:
+        return H1Snapshot(load_h1_data(file_path), fingerprint)
+    except Exception as e:
+        error = str(e)
+
+    # Keep serving the last version of the file that loaded
+    if previous is not None and not previous.sample:
+        return previous.with_error(fingerprint, error)
+    return H1Snapshot(sample_data(), fingerprint, error, sample=True)
+
+
+def append_shared_week(week_data):
+    """
+    Append one week of H1 data to the shared snapshot without reloading the source
+
+    The new snapshot replaces the shared one for every session's next run.
+
+    Args:
+        week_data (pd.DataFrame): One week of H1 data, as accepted by validate_week_data
+
+    Returns:
+        H1Snapshot: The new shared snapshot
+
+    Raises:
+        ValueError: If no H1 data is loaded yet, or the week data is rejected
+    """
+    global _snapshot
+    with _lock:
+        if _snapshot is None:
+            raise ValueError("No H1 data is loaded yet")
+        _snapshot = _snapshot.with_week(week_data)
+        return _snapshot
+
+
+def clear_shared_snapshot():
+    """Drop the shared snapshot so the next call reloads the source"""
+    global _snapshot
+    with _lock:
+        _snapshot = None
@@ -0,0 +1,248 @@
+import numpy as np
+
+# Order of the five pricing scenarios evaluated by the calculator
+SCENARIO_KEYS = ["edlp", "tpr_base", "tpr_deep", "ad_base", "ad_deep"]
+
+MARGIN_FIELDS = ["gm_percent", "gm_dollars", "gm_coupon_percent", "gm_coupon_dollars"]
+
+
+def calculate_margins_batch(price, cost, scan, coupon):
+    """Vectorized margin math over arrays of prices, bottle costs, scans and coupons
+
+    Inputs are broadcast against each other, so any of them may be a scalar.
+    Rows with a non-positive price or cost get zero for every field, the same
+    rule the calculator has always used.
+
+    Returns:
+        dict: gm_percent, gm_dollars, gm_coupon_percent and gm_coupon_dollars arrays
+    """
+    price, cost, scan, coupon = np.broadcast_arrays(
+        np.asarray(price, dtype=float),
+        np.asarray(cost, dtype=float),
+        np.asarray(scan, dtype=float),
+        np.asarray(coupon, dtype=float),
+    )
+    valid = (price > 0) & (cost > 0)
+
+    gm = np.where(valid, price - (cost - scan), 0.0)
+    gm_coupon = np.where(valid, price - (cost - scan - coupon), 0.0)
+
+    gm_per = np.divide(gm, price, out=np.zeros_like(gm), where=valid)
+    gm_coupon_per = np.divide(gm_coupon, price, out=np.zeros_like(gm_coupon), where=valid)
+
+    return {
+        "gm_percent": gm_per * 100,
+        "gm_dollars": gm,
+        "gm_coupon_percent": gm_coupon_per * 100,
+        "gm_coupon_dollars": gm_coupon
+    }
+
+
+def calculate_weighted_average_batch(tpr_price, ad_price, bottle_cost, scan, coupon, ad_percentage):
+    """Vectorized weighted TPR/Ad margins; a NaN ad percentage yields NaN"""
+    tpr_margins = calculate_margins_batch(tpr_price, bottle_cost, scan, coupon)
+    ad_margins = calculate_margins_batch(ad_price, bottle_cost, scan, coupon)
+    return _weighted_margins(tpr_margins, ad_margins, np.asarray(ad_percentage, dtype=float))
+
+
+def _weighted_margins(tpr_margins, ad_margins, ad_percentage):
+    """Blend TPR and Ad gm_percent/gm_dollars by the share of bottles sold on Ad"""
+    ad_percentage_decimal = ad_percentage / 100
+    tpr_percentage = 1 - ad_percentage_decimal
+
+    weighted_gm_percent = (tpr_margins["gm_percent"] * tpr_percentage) + (ad_margins["gm_percent"] * ad_percentage_decimal)
+    weighted_gm_dollars = (tpr_margins["gm_dollars"] * tpr_percentage) + (ad_margins["gm_dollars"] * ad_percentage_decimal)
+
+    return weighted_gm_percent, weighted_gm_dollars
+
+
+def calculate_scenario_margins(edlp_price, tpr_base_price, tpr_deep_price, ad_base_price, ad_deep_price,
+                               bottle_cost, base_scan, deep_scan, coupon,
+                               ad_percentage_base, ad_percentage_deep):
+    """Price all five calculator scenarios for many rows in one vectorized pass
+
+    Every argument may be a scalar, a NumPy array or a DataFrame column. The
+    Everyday price is evaluated without scan funding, TPR/Ad prices with the
+    base or deep scan, exactly as the calculator UI does.
+
+    Returns:
+        dict: "<scenario>_<field>" arrays for every scenario in SCENARIO_KEYS and
+        field in MARGIN_FIELDS, plus weighted_base/deep_percent/dollars
+    """
+    (edlp_price, tpr_base_price, tpr_deep_price, ad_base_price, ad_deep_price,
+     bottle_cost, base_scan, deep_scan, coupon) = np.broadcast_arrays(
+        *[np.asarray(value, dtype=float) for value in
+          (edlp_price, tpr_base_price, tpr_deep_price, ad_base_price, ad_deep_price,
+           bottle_cost, base_scan, deep_scan, coupon)])
+
+    # Stack the five scenarios so the margin math runs once over a (5, n) block
+    prices = np.stack([edlp_price, tpr_base_price, tpr_deep_price, ad_base_price, ad_deep_price])
+    scans = np.stack([np.zeros_like(base_scan), base_scan, deep_scan, base_scan, deep_scan])
+    margins = calculate_margins_batch(prices, bottle_cost, scans, coupon)
+
+    result = {}
+    for i, key in enumerate(SCENARIO_KEYS):
+        for field in MARGIN_FIELDS:
+            result[f"{key}_{field}"] = margins[field][i]
+
+    # Weighted averages reuse the TPR/Ad rows computed above
+    for depth, ad_percentage in (("base", ad_percentage_base), ("deep", ad_percentage_deep)):
+        tpr_margins = {field: result[f"tpr_{depth}_{field}"] for field in ("gm_percent", "gm_dollars")}
+        ad_margins = {field: result[f"ad_{depth}_{field}"] for field in ("gm_percent", "gm_dollars")}
+        result[f"weighted_{depth}_percent"], result[f"weighted_{depth}_dollars"] = _weighted_margins(
+            tpr_margins, ad_margins, np.asarray(ad_percentage, dtype=float))
+
+    return result
+
+
+# Helper function to calculate margins (similar to BuildMarginString in VBA)
+def calculate_margin(price, cost, scan, coupon):
+    """Margins of one price point; same rules as calculate_margins_batch"""
+    # Plain floats skip NumPy: per-call array overhead dwarfs four subtractions
+    if not all(isinstance(value, (int, float)) for value in (price, cost, scan, coupon)):
+        margins = calculate_margins_batch(price, cost, scan, coupon)
+        return {field: float(value) for field, value in margins.items()}
+
+    if price > 0 and cost > 0:
+        gm = price - (cost - scan)
+        gm_coupon = price - (cost - scan - coupon)
+        return {
+            "gm_percent": float(gm / price * 100),
+            "gm_dollars": float(gm),
+            "gm_coupon_percent": float(gm_coupon / price * 100),
+            "gm_coupon_dollars": float(gm_coupon)
+        }
+    return {field: 0.0 for field in MARGIN_FIELDS}
+
+
+# Weighted averages (similar to CalculateWeightedAverage in VBA)
+def calculate_weighted_average(tpr_price, ad_price, bottle_cost, scan, coupon, ad_percentage):
+    """Calculate weighted average margins based on ad percentage"""
+    if ad_percentage is None or ad_percentage == "":
+        return None, None
+
+    tpr_margins = calculate_margin(tpr_price, bottle_cost, scan, coupon)
+    ad_margins = calculate_margin(ad_price, bottle_cost, scan, coupon)
+    weighted_gm_percent, weighted_gm_dollars = _weighted_margins(tpr_margins, ad_margins, float(ad_percentage))
+
+    return float(weighted_gm_percent), float(weighted_gm_dollars)
+
+
+def value_range(start, stop, step, include_stop=False):
+    """Inclusive range of price/scan/percent steps without float drift
+
+    With include_stop, stop is appended when the steps do not land on it
+    (0 to 100 by 30 gives 0, 30, 60, 90, 100).
+    """
+    if step <= 0 or stop < start:
+        return np.array([float(start)])
+    n_steps = int(np.floor((stop - start) / step + 1e-9)) + 1
+    values = np.round(start + step * np.arange(n_steps), 6)
+    if include_stop and not np.isclose(values[-1], stop):
+        values = np.append(values, float(stop))
+    return values
+
+
+def margin_grid(tpr_prices, scans, ad_percentages, ad_price, bottle_cost, coupon):
+    """What-if surface over TPR price x scan x % on Ad
+
+    TPR margins are evaluated on the (price, scan) grid and Ad margins per
+    scan, both through calculate_margins_batch; the weighted averages then
+    broadcast across the ad percentages.
+
+    Returns:
+        dict: "tpr_gm_percent" and "tpr_gm_dollars" arrays of shape (prices, scans),
+        "weighted_gm_percent" and "weighted_gm_dollars" of shape (prices, scans, ad_percentages)
+    """
+    tpr_prices = np.asarray(tpr_prices, dtype=float)
+    scans = np.asarray(scans, dtype=float)
+    ad_percentage_decimal = np.asarray(ad_percentages, dtype=float) / 100
+
+    tpr_margins = calculate_margins_batch(tpr_prices[:, None], bottle_cost, scans[None, :], coupon)
+    ad_margins = calculate_margins_batch(ad_price, bottle_cost, scans, coupon)
+
+    weights = ad_percentage_decimal[None, None, :]
+    weighted_gm_percent = tpr_margins["gm_percent"][:, :, None] * (1 - weights) + \
+        ad_margins["gm_percent"][None, :, None] * weights
+    weighted_gm_dollars = tpr_margins["gm_dollars"][:, :, None] * (1 - weights) + \
+        ad_margins["gm_dollars"][None, :, None] * weights
+
+    return {
+        "tpr_gm_percent": tpr_margins["gm_percent"],
+        "tpr_gm_dollars": tpr_margins["gm_dollars"],
+        "weighted_gm_percent": weighted_gm_percent,
+        "weighted_gm_dollars": weighted_gm_dollars
+    }
+
+
+def margin_floor_contour(tpr_prices, surface, floor):
+    """Lowest price meeting the floor for each column of a (prices, scans) surface
+
+    Returns NaN for scans where no price in the grid reaches the floor.
+    """
+    meets = surface >= floor
+    first = meets.argmax(axis=0)
+    return np.where(meets.any(axis=0), np.asarray(tpr_prices, dtype=float)[first], np.nan)
+
+
+# Target-margin solver: calculate_margin solved for price, scan or cost.
+# With t = target GM % / 100 and k = coupon (only when solving "with coupon"):
+#   GM % = (price - (cost - scan - k)) / price  =>  price = (cost - scan - k) / (1 - t)
+
+def _target_terms(target_percent, coupon, with_coupon):
+    target = np.asarray(target_percent, dtype=float) / 100
+    coupon = np.asarray(coupon, dtype=float) if with_coupon else np.zeros_like(target)
+    return target, coupon
+
+
+def solve_price_for_margin(target_percent, cost, scan, coupon=0.0, with_coupon=False):
+    """Lowest shelf price that reaches the target GM %; NaN when unreachable
+
+    When the scan (and coupon) cover the whole cost, any positive price meets
+    the target and 0 is returned.
+    """
+    target, coupon = _target_terms(target_percent, coupon, with_coupon)
+    cost = np.asarray(cost, dtype=float)
+    net_cost = cost - np.asarray(scan, dtype=float) - coupon
+
+    # A NaN cost, scan, coupon or target fails every comparison and stays NaN
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price = np.where(net_cost <= 0, 0.0, net_cost / (1 - target))
+    return np.where((cost > 0) & ((target < 1) | ((target >= 1) & (net_cost <= 0))), price, np.nan)
+
+
+def solve_scan_for_margin(target_percent, price, cost, coupon=0.0, with_coupon=False):
+    """Smallest scan that reaches the target GM % at a price; 0 if none is needed"""
+    target, coupon = _target_terms(target_percent, coupon, with_coupon)
+    price = np.asarray(price, dtype=float)
+    cost = np.asarray(cost, dtype=float)
+
+    scan = cost - coupon - price * (1 - target)
+    return np.where((price > 0) & (cost > 0), np.maximum(scan, 0.0), np.nan)
+
+
+def solve_cost_for_margin(target_percent, price, scan, coupon=0.0, with_coupon=False):
+    """Highest bottle cost that still reaches the target GM % at a price and scan"""
+    target, coupon = _target_terms(target_percent, coupon, with_coupon)
+    price = np.asarray(price, dtype=float)
+
+    cost = price * (1 - target) + np.asarray(scan, dtype=float) + coupon
+    return np.where((price > 0) & (cost > 0), cost, np.nan)
+
+
+def snap_to_price_endings(prices, endings=(0.99, 0.49)):
+    """Round prices up to the nearest retail ending (e.g. $23.12 -> $23.49)
+
+    Rounding up keeps a solved price at or above the target margin. NaN stays NaN.
+    """
+    prices = np.asarray(prices, dtype=float)
+    endings = np.sort(np.asarray(endings, dtype=float) % 1)
+    if endings.size == 0:
+        return prices
+
+    dollars = np.floor(prices)[..., None]
+    # Candidates in this dollar and the next; pick the first at or above the price
+    candidates = np.concatenate([dollars + endings, dollars + 1 + endings], axis=-1)
+    candidates = np.where(candidates >= prices[..., None] - 1e-9, candidates, np.inf)
+    snapped = np.round(candidates.min(axis=-1), 2)
+    return np.where(np.isfinite(prices), snapped, np.nan)
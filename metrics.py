@@ -0,0 +1,212 @@
+import functools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app_files import APP_DIR, atomic_write
+
+# Instrumentation is off unless SCANCALC_METRICS is set to 1/true/yes
+ENABLED = os.environ.get("SCANCALC_METRICS", "").strip().lower() in ("1", "true", "yes")
+
+# Prometheus textfile written for the node_exporter textfile collector (or any scraper)
+METRICS_FILE = os.environ.get("SCANCALC_METRICS_FILE", os.path.join(APP_DIR, "scancalc_metrics.prom"))
+
+METRIC_PREFIX = "scancalc_"
+
+# Short descriptions written as # HELP lines
+METRIC_HELP = {
+    "section_seconds": "Wall time spent rendering an app section",
+    "h1_lookups_total": "Index ratio lookups for a segment/size",
+    "h1_index_builds_total": "H1 ratio index (re)builds",
+    "h1_week_appends_total": "Weeks of H1 data appended without a reload",
+    "export_bytes_total": "Bytes of Excel exports served",
+    "cache_hits": "Hits of a memoized render function",
+    "cache_misses": "Misses of a memoized render function",
+    "cache_entries": "Entries held by a memoized render function",
+    "session_state_keys": "Keys in the session_state of the last instrumented rerun",
+    "session_state_bytes": "Approximate size of the session_state of the last instrumented rerun",
+    "h1_snapshot_bytes": "Memory held by the H1 data and cubes shared by all sessions",
+    "session_start_ms": "Import time and first full run time of the latest new session",
+    "commentary_requests_total": "Scenario commentary requests answered by the model endpoint",
+    "commentary_cache_hits": "Scenario commentary served from the disk cache"
+}
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_sections = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """Add value to a counter"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to its current value"""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def record_section(section, seconds):
+    """Add one timed run of a section to the process totals and the session's last rerun"""
+    if not ENABLED:
+        return
+    with _lock:
+        count, total = _sections.get(section, (0, 0.0))
+        _sections[section] = (count + 1, total + seconds)
+
+    try:
+        st.session_state.setdefault("metrics_last_run", {})[section] = seconds
+    except Exception:
+        # Outside a script run there is no session to report to
+        pass
+
+
+@contextmanager
+def timed(section):
+    """Time a block as one run of section; a no-op when instrumentation is off"""
+    if not ENABLED:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_section(section, time.perf_counter() - start)
+
+
+def timed_section(section):
+    """Decorator form of timed() that also flushes the metrics file afterwards
+
+    Place it below @st.fragment so fragment reruns are timed as well.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                with timed(section):
+                    return func(*args, **kwargs)
+            finally:
+                flush()
+        return wrapper
+    return decorator
+
+
+def record_cache_info(name, func):
+    """Copy hits, misses and size of an lru_cache-wrapped function into gauges"""
+    if not ENABLED:
+        return
+    info = func.cache_info()
+    set_gauge("cache_hits", info.hits, cache=name)
+    set_gauge("cache_misses", info.misses, cache=name)
+    set_gauge("cache_entries", info.currsize, cache=name)
+
+
+def object_size(value):
+    """Approximate memory size of a session_state value in bytes"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    # Process-wide objects such as the H1 snapshot are only referenced by the session
+    if getattr(value, "shared", False):
+        return sys.getsizeof(value)
+    # Objects such as H1RatioIndex report their own array memory
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+
+def session_state_sizes():
+    """Approximate size in bytes of each session_state value, largest first"""
+    sizes = {str(key): object_size(value) for key, value in st.session_state.items()}
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def record_session_state():
+    """Record the current session's key count and size"""
+    if not ENABLED:
+        return
+    sizes = session_state_sizes()
+    set_gauge("session_state_keys", len(sizes))
+    set_gauge("session_state_bytes", sum(sizes.values()))
+
+
+def snapshot():
+    """Copy of all counters, gauges and section totals"""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "sections": dict(_sections)
+        }
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def prometheus_text(data=None):
+    """Render a snapshot in the Prometheus text exposition format"""
+    data = data or snapshot()
+    lines = []
+
+    def add_family(name, kind, samples):
+        full_name = METRIC_PREFIX + name
+        lines.append(f"# HELP {full_name} {METRIC_HELP.get(name, name)}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+    for kind, metrics in (("counter", data["counters"]), ("gauge", data["gauges"])):
+        families = {}
+        for (name, labels), value in sorted(metrics.items()):
+            families.setdefault(name, []).append((labels, value))
+        for name, samples in families.items():
+            add_family(name, kind, samples)
+
+    if data["sections"]:
+        name = METRIC_PREFIX + "section_seconds"
+        lines.append(f"# HELP {name} {METRIC_HELP['section_seconds']}")
+        lines.append(f"# TYPE {name} summary")
+        for section, (count, total) in sorted(data["sections"].items()):
+            lines.append(f'{name}_sum{{section="{section}"}} {total:.6f}')
+            lines.append(f'{name}_count{{section="{section}"}} {count}')
+
+    return "\n".join(lines) + "\n"
+
+
+def flush():
+    """Write the metrics file (a few hundred bytes, so cheap enough to do every run)"""
+    if not ENABLED or not METRICS_FILE:
+        return
+
+    # Written atomically, so the scraper never reads a partial file
+    try:
+        atomic_write(METRICS_FILE, lambda f: f.write(prometheus_text()))
+    except OSError:
+        # Metrics are best effort; never break the app over them
+        pass
@@ -0,0 +1,82 @@
+import os
+
+from scenarios import DIMENSION_COLUMNS, INPUT_ALIASES, INPUT_DEFAULTS, build_scenario_frame, compact_scenarios
+
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+# Row label column of an index ratio matrix written to Parquet
+WEEK_INDEX_NAME = "Week"
+
+
+def _parquet_file(source):
+    # Imported here so loading the app does not pay for pyarrow until the first Parquet file
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Paths are memory-mapped and in-memory uploads are wrapped without a copy, so
+    # column buffers are read straight from the file's pages
+    if isinstance(source, (str, os.PathLike)):
+        return pq.ParquetFile(source, memory_map=True)
+    if hasattr(source, "getbuffer"):
+        return pq.ParquetFile(pa.BufferReader(source.getbuffer()))
+    return pq.ParquetFile(source)
+
+
+def write_scenarios_parquet(df, output):
+    """Write a scan-scenario frame to Parquet, keeping its compact column types
+
+    Args:
+        df (pd.DataFrame): Saved scan scenarios
+        output (str or file): Path or binary file object to write the .parquet to
+    """
+    compact_scenarios(df).to_parquet(output, engine="pyarrow", index=False)
+
+
+def read_scenarios_parquet(source):
+    """
+    Read a scenario book from Parquet and re-price it
+
+    Only the dimension and input columns are read (calculator labels are
+    accepted too); GM columns are recomputed with build_scenario_frame, so
+    books written by older versions come back with every current column.
+
+    Args:
+        source (str or file): Path, or file object such as a Streamlit upload
+
+    Returns:
+        pd.DataFrame: Compact scenario rows, ready for ScenarioStore.append
+
+    Raises:
+        ValueError: If the file has none of the scenario input columns
+    """
+    parquet_file = _parquet_file(source)
+
+    # Read just the dimension and input columns the file has
+    known = set(DIMENSION_COLUMNS) | set(INPUT_DEFAULTS) | set(INPUT_ALIASES)
+    columns = [name for name in parquet_file.schema_arrow.names if name.strip() in known]
+    if not columns:
+        raise ValueError("The file has no scan-scenario columns")
+
+    inputs = parquet_file.read(columns=columns).to_pandas(split_blocks=True)
+    return compact_scenarios(build_scenario_frame(inputs))
+
+
+def write_index_ratios_parquet(index_ratios_df, output):
+    """Write the week x segment/size index ratio matrix to Parquet, week labels included"""
+    df = index_ratios_df.rename_axis(WEEK_INDEX_NAME).reset_index()
+    df.to_parquet(output, engine="pyarrow", index=False)
+
+
+def read_index_ratios_parquet(source):
+    """Read an index ratio matrix written by write_index_ratios_parquet
+
+    Returns:
+        pd.DataFrame: Week labels as the index, one float column per segment/size
+
+    Raises:
+        ValueError: If the file has no Week column
+    """
+    df = _parquet_file(source).read().to_pandas(split_blocks=True)
+    if WEEK_INDEX_NAME not in df.columns:
+        raise ValueError(f"The file has no {WEEK_INDEX_NAME} column")
+    return df.set_index(WEEK_INDEX_NAME).rename_axis(None).astype(float)
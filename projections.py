@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# Pricing scenarios that can be projected, as label -> (GM $ per bottle column, scan per bottle column)
+PROJECTION_SCENARIOS = {
+    "Everyday": ("Everyday GM $", None),
+    "TPR (Base Scan)": ("TPR GM $ (Base Scan)", "Base Scan"),
+    "TPR (Deep Scan)": ("TPR GM $ (Deep Scan)", "Deep Scan"),
+    "Ad/Feature (Base Scan)": ("Ad GM $ (Base Scan)", "Base Scan"),
+    "Ad/Feature (Deep Scan)": ("Ad GM $ (Deep Scan)", "Deep Scan")
+}
+
+# Dimensions the projected totals can be grouped by
+TOTAL_DIMENSIONS = ["Brand", "Customer/State"]
+
+
+def scenario_index_ratios(scenarios, h1_index, segment_mapping=None):
+    """Weekly index ratios of each scenario's segment/size in one gather
+
+    Args:
+        scenarios (pd.DataFrame): Saved scenarios with Segment and Size columns
+        h1_index (H1RatioIndex): Ratio index of the H1 period to project over
+        segment_mapping (dict): Display segment name -> H1 data segment name
+
+    Returns:
+        tuple: (scenarios x weeks ratio array, boolean array marking scenarios
+        with H1 data); scenarios without H1 data get a flat ratio of 1
+    """
+    segment_mapping = segment_mapping or {}
+    n_weeks = len(h1_index.week_columns)
+
+    # Look each distinct segment/size up once, then broadcast the rows to the scenarios
+    pairs = pd.MultiIndex.from_arrays([scenarios["Segment"].astype(object).fillna("").astype(str),
+                                       scenarios["Size"].astype(object).fillna("").astype(str)])
+    codes, uniques = pd.factorize(pairs)
+    rows = np.array([h1_index.row(segment_mapping.get(segment, segment), size)
+                     for segment, size in uniques], dtype=object)
+    has_data = np.array([row is not None for row in rows], dtype=bool)
+
+    unique_ratios = np.ones((len(uniques), n_weeks))
+    if has_data.any():
+        unique_ratios[has_data] = h1_index.ratios[rows[has_data].astype(int)]
+
+    return unique_ratios[codes], has_data[codes]
+
+
+def project_scenarios(scenarios, h1_index, pricing="TPR (Base Scan)", baseline_volume=100.0, segment_mapping=None):
+    """
+    Project weekly GM $ and scan spend of saved scenarios over an H1 period
+
+    Each scenario sells baseline_volume bottles in an average week, scaled by
+    its segment/size index ratio for every week of the period. Projected GM $
+    is volume times the scenario's GM $ per bottle and scan spend is volume
+    times its scan per bottle, for the chosen pricing scenario. All scenarios
+    and weeks are computed as one scenarios x weeks array operation.
+
+    Args:
+        scenarios (pd.DataFrame): Saved scenarios (SCENARIO_COLUMNS)
+        h1_index (H1RatioIndex): Ratio index of the H1 period to project over
+        pricing (str): Key of PROJECTION_SCENARIOS
+        baseline_volume (float or array): Average weekly bottles, for all or for each scenario
+        segment_mapping (dict): Display segment name -> H1 data segment name
+
+    Returns:
+        dict: "gm_dollars" and "scan_spend" scenarios x weeks DataFrames (indexed
+        like scenarios, one column per week label) and "indexed", a boolean
+        Series marking the scenarios that had H1 data
+    """
+    gm_col, scan_col = PROJECTION_SCENARIOS[pricing]
+    ratios, indexed = scenario_index_ratios(scenarios, h1_index, segment_mapping)
+
+    baseline_volume = np.broadcast_to(np.asarray(baseline_volume, dtype=float), len(scenarios))
+    volume = baseline_volume[:, None] * ratios
+
+    gm_per_bottle = pd.to_numeric(scenarios[gm_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+    scan_per_bottle = (pd.to_numeric(scenarios[scan_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+                       if scan_col else np.zeros(len(scenarios)))
+
+    week_labels = list(h1_index.week_labels)
+    return {
+        "gm_dollars": pd.DataFrame(gm_per_bottle[:, None] * volume, index=scenarios.index, columns=week_labels),
+        "scan_spend": pd.DataFrame(scan_per_bottle[:, None] * volume, index=scenarios.index, columns=week_labels),
+        "indexed": pd.Series(indexed, index=scenarios.index)
+    }
+
+
+def projection_totals(projection, scenarios, by):
+    """Sum a scenarios x weeks projection by a dimension column, with a Total column
+
+    Args:
+        projection (pd.DataFrame): One of the frames returned by project_scenarios
+        scenarios (pd.DataFrame): The scenarios it was projected from
+        by (str): Dimension column, e.g. Brand or Customer/State
+
+    Returns:
+        pd.DataFrame: One row per dimension value, one column per week plus Total
+    """
+    keys = scenarios[by].astype(object).fillna("").astype(str).replace("", "(none)")
+    totals = projection.groupby(keys.to_numpy(), sort=True).sum()
+    totals.index.name = by
+    totals["Total"] = totals.sum(axis=1)
+    return totals
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+# Columns of a promo plan, one row per recommended promo
+PROMO_PLAN_COLUMNS = ["Segment", "Size", "Promo", "Start Week", "End Week", "Weeks", "Avg Index Ratio"]
+
+
+def window_scores(ratios, promo_length=1, blackout_weeks=()):
+    """Average index ratio of every promo window, for all combinations at once
+
+    Args:
+        ratios (np.ndarray): combinations x weeks index ratios
+        promo_length (int): Weeks per promo
+        blackout_weeks (iterable): 1-based weeks no promo may touch
+
+    Returns:
+        np.ndarray: combinations x windows scores, where window w covers weeks
+        w+1 .. w+promo_length; -inf marks windows that touch a blackout week
+    """
+    n_weeks = ratios.shape[1]
+    n_windows = max(n_weeks - promo_length + 1, 0)
+
+    # Window sums from a running total along the weeks
+    totals = np.zeros((ratios.shape[0], n_weeks + 1))
+    np.cumsum(ratios, axis=1, out=totals[:, 1:])
+    scores = (totals[:, promo_length:] - totals[:, :n_windows]) / promo_length
+
+    blocked = np.zeros(n_weeks + 1, dtype=np.int64)
+    blackout = [week - 1 for week in blackout_weeks if 1 <= week <= n_weeks]
+    blocked[1:][blackout] = 1
+    blocked = np.cumsum(blocked)
+    scores[:, (blocked[promo_length:] - blocked[:n_windows]) > 0] = -np.inf
+    return scores
+
+
+def recommend_promo_windows(ratios, k=3, promo_length=1, min_gap=0, max_promo_weeks=None, blackout_weeks=()):
+    """
+    Best k non-overlapping promo windows per combination by index ratio
+
+    Windows are picked highest average ratio first, skipping any that overlap
+    or come within min_gap weeks of an earlier pick. Picking one window rules
+    out at most 2 * (promo_length + min_gap) - 1 others, so the picks always
+    come from each row's top (k - 1) * that + 1 windows. Those candidates are
+    found with one np.argpartition over the full score matrix, and the picks
+    are made for every combination together, one candidate rank at a time.
+
+    Args:
+        ratios (np.ndarray): combinations x weeks index ratios
+        k (int): Promos per combination
+        promo_length (int): Weeks per promo
+        min_gap (int): Weeks required between promos
+        max_promo_weeks (int): Cap on promo weeks per combination; lowers k when reached
+        blackout_weeks (iterable): 1-based weeks no promo may touch
+
+    Returns:
+        tuple: (start, score) arrays of shape combinations x k, best first;
+        start is the 0-based first week of each promo and -1 where fewer than
+        k windows fit
+    """
+    ratios = np.asarray(ratios, dtype=float)
+    n_rows, n_weeks = ratios.shape
+    if max_promo_weeks is not None:
+        k = min(k, max_promo_weeks // promo_length)
+
+    starts = np.full((n_rows, max(k, 0)), -1, dtype=np.int64)
+    picked_scores = np.full((n_rows, max(k, 0)), np.nan)
+    scores = window_scores(ratios, promo_length, blackout_weeks)
+    n_windows = scores.shape[1]
+    if k <= 0 or n_rows == 0 or n_windows == 0:
+        return starts, picked_scores
+
+    # Each pick rules out windows starting within span - 1 weeks of it
+    span = promo_length + min_gap
+    n_candidates = min((k - 1) * (2 * span - 1) + 1, n_windows)
+
+    if n_candidates < n_windows:
+        candidates = np.argpartition(-scores, n_candidates - 1, axis=1)[:, :n_candidates]
+    else:
+        candidates = np.broadcast_to(np.arange(n_windows), (n_rows, n_windows))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    candidates = np.take_along_axis(candidates, order, axis=1)
+    candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+    rows = np.arange(n_rows)
+    n_picked = np.zeros(n_rows, dtype=np.int64)
+    # Windows already ruled out, per combination
+    taken = np.zeros((n_rows, n_windows + 2 * span), dtype=np.int64)
+    for rank in range(n_candidates):
+        window = candidates[:, rank]
+        score = candidate_scores[:, rank]
+        accept = (n_picked < k) & np.isfinite(score) & (taken[rows, window + span] == 0)
+        if not accept.any():
+            continue
+
+        accepted = rows[accept]
+        starts[accepted, n_picked[accept]] = window[accept]
+        picked_scores[accepted, n_picked[accept]] = score[accept]
+        n_picked[accept] += 1
+
+        # Rule out windows that would overlap or crowd the new promo
+        offsets = window[accept, None] + np.arange(1, 2 * span)
+        taken[accepted[:, None], offsets] = 1
+
+    return starts, picked_scores
+
+
+def promo_plan(index_ratios_df, k=3, promo_length=1, min_gap=0, max_promo_weeks=None, blackout_weeks=()):
+    """
+    Promo plan for every combination of an index ratio matrix, as one table
+
+    Args:
+        index_ratios_df (pd.DataFrame): Weeks x combinations index ratios with
+            week labels as the index and "Segment | Size" columns, as exported
+        k, promo_length, min_gap, max_promo_weeks, blackout_weeks: See recommend_promo_windows
+
+    Returns:
+        pd.DataFrame: PROMO_PLAN_COLUMNS, one row per promo in column then rank
+        order; Start and End Week are 1-based
+    """
+    ratios = index_ratios_df.to_numpy(dtype=float).T
+    starts, scores = recommend_promo_windows(ratios, k, promo_length, min_gap, max_promo_weeks, blackout_weeks)
+
+    combo, rank = np.nonzero(starts >= 0)
+    start = starts[combo, rank]
+    end = start + promo_length - 1
+    week_labels = np.asarray(index_ratios_df.index, dtype=object)
+    names = pd.Series(np.asarray(index_ratios_df.columns, dtype=object)[combo]).astype(str).str.split(" | ", n=1, regex=False)
+
+    return pd.DataFrame({
+        "Segment": names.str[0].to_numpy(),
+        "Size": names.str[1].to_numpy(),
+        "Promo": rank + 1,
+        "Start Week": start + 1,
+        "End Week": end + 1,
+        "Weeks": [str(week_labels[s]) if s == e else f"{week_labels[s]} to {week_labels[e]}"
+                  for s, e in zip(start, end)],
+        "Avg Index Ratio": scores[combo, rank]
+    }, columns=PROMO_PLAN_COLUMNS)
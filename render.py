@@ -0,0 +1,115 @@
+from functools import lru_cache
+
+from margins import calculate_margin, calculate_weighted_average
+
+# Number of finished HTML fragments kept per render function
+RENDER_CACHE_SIZE = 256
+
+
+def render_cache(func):
+    """Memoize an HTML render function on its (hashable) arguments with LRU eviction
+
+    The wrapped function exposes cache_info()/cache_clear() from functools.
+    """
+    return lru_cache(maxsize=RENDER_CACHE_SIZE)(func)
+
+
+def html_table(columns, rows, table_class="pricing-table", first_row_class=None):
+    """Build an HTML table in a single join"""
+    parts = [f"<table class='{table_class}'><thead><tr>"]
+    parts.extend(f"<th>{col}</th>" for col in columns)
+    parts.append("</tr></thead><tbody>")
+
+    for i, row in enumerate(rows):
+        parts.append(f"<tr class='{first_row_class}'>" if i == 0 and first_row_class else "<tr>")
+        parts.extend(f"<td>{cell}</td>" for cell in row)
+        parts.append("</tr>")
+
+    parts.append("</tbody></table>")
+    return "".join(parts)
+
+
+@render_cache
+def week_list_html(week_labels, index_ratios, avg_weekly_rsv, threshold):
+    """Colored weekly index ratio list for the H1 panel
+
+    Args:
+        week_labels (tuple): Label per week
+        index_ratios (tuple): Index ratio per week
+        avg_weekly_rsv (float): Average weekly RSV of the selection
+        threshold (float): std/mean threshold used for highlighting
+    """
+    parts = ["<div style='max-height:400px; overflow-y:auto; background-color:#f8f9fa; padding:8px; border-radius:5px; font-size:0.9rem;'>"]
+
+    for week_label, ratio in zip(week_labels, index_ratios):
+        # Determine color based on ratio value compared to threshold
+        color = "#333333"  # Default dark gray
+        bg_color = ""
+        if avg_weekly_rsv > 0:
+            if ratio > 1 + threshold:
+                color = "#228B22"  # Forest green
+                bg_color = "background-color:#e6f4ea;"
+            elif ratio < 1 - (0.5 * threshold):
+                color = "#8B0000"  # Deep red
+                bg_color = "background-color:#fae9e8;"
+
+        parts.append(f"<div style='padding:3px 6px; margin-bottom:2px; {bg_color} border-radius:3px;'><span style='display:inline-block; width:110px; font-size:0.8rem;'>{week_label}</span> <span style='font-weight:bold; color:{color};'>{ratio:.0%}</span></div>")
+
+    parts.append("</div>")
+    return "".join(parts)
+
+
+@render_cache
+def pricing_table_html(edlp_price, tpr_base_price, tpr_deep_price, ad_base_price, ad_deep_price,
+                       bottle_cost, base_scan, deep_scan, coupon, ad_percentage_base, ad_percentage_deep):
+    """Pricing comparison table HTML for one set of calculator inputs"""
+    # Calculate margins for Everyday Price
+    edlp_margins = calculate_margin(edlp_price, bottle_cost, 0, coupon)
+
+    # Calculate margins for other pricing scenarios
+    tpr_base_margins = calculate_margin(tpr_base_price, bottle_cost, base_scan, coupon)
+    tpr_deep_margins = calculate_margin(tpr_deep_price, bottle_cost, deep_scan, coupon)
+    ad_base_margins = calculate_margin(ad_base_price, bottle_cost, base_scan, coupon)
+    ad_deep_margins = calculate_margin(ad_deep_price, bottle_cost, deep_scan, coupon)
+    
+    # Calculate weighted averages
+    weighted_base_percent, weighted_base_dollars = calculate_weighted_average(
+        tpr_base_price, ad_base_price, bottle_cost, base_scan, coupon, ad_percentage_base)
+    
+    weighted_deep_percent, weighted_deep_dollars = calculate_weighted_average(
+        tpr_deep_price, ad_deep_price, bottle_cost, deep_scan, coupon, ad_percentage_deep)
+
+    # Create data for the pricing comparison table (including Everyday Price)
+    pricing_data = {
+        "Pricing Scenario": ["Everyday Price", "TPR (Base Scan)", "TPR (Deep Scan)", "Ad/Feature (Base Scan)", "Ad/Feature (Deep Scan)"],
+        "Price": [f"${edlp_price:.2f}", f"${tpr_base_price:.2f}", f"${tpr_deep_price:.2f}", f"${ad_base_price:.2f}", f"${ad_deep_price:.2f}"],
+        "Gross Margin %": [f"{edlp_margins['gm_percent']:.1f}%", f"{tpr_base_margins['gm_percent']:.1f}%", 
+                          f"{tpr_deep_margins['gm_percent']:.1f}%", f"{ad_base_margins['gm_percent']:.1f}%", 
+                          f"{ad_deep_margins['gm_percent']:.1f}%"],
+        "Gross Margin $": [f"${edlp_margins['gm_dollars']:.2f}", f"${tpr_base_margins['gm_dollars']:.2f}", 
+                          f"${tpr_deep_margins['gm_dollars']:.2f}", f"${ad_base_margins['gm_dollars']:.2f}", 
+                          f"${ad_deep_margins['gm_dollars']:.2f}"],
+        "With Coupon %": [f"{edlp_margins['gm_coupon_percent']:.1f}%", f"{tpr_base_margins['gm_coupon_percent']:.1f}%", 
+                         f"{tpr_deep_margins['gm_coupon_percent']:.1f}%", f"{ad_base_margins['gm_coupon_percent']:.1f}%", 
+                         f"{ad_deep_margins['gm_coupon_percent']:.1f}%"],
+        "With Coupon $": [f"${edlp_margins['gm_coupon_dollars']:.2f}", f"${tpr_base_margins['gm_coupon_dollars']:.2f}", 
+                         f"${tpr_deep_margins['gm_coupon_dollars']:.2f}", f"${ad_base_margins['gm_coupon_dollars']:.2f}", 
+                         f"${ad_deep_margins['gm_coupon_dollars']:.2f}"]
+    }
+    
+    # Add weighted average information if ad percentages are provided
+    if ad_percentage_base > 0 or ad_percentage_deep > 0:
+        pricing_data["% on Ad"] = ["N/A", f"{ad_percentage_base:.0f}%", f"{ad_percentage_deep:.0f}%", "N/A", "N/A"]
+        
+        if weighted_base_percent is not None:
+            pricing_data["Weighted Avg GM %"] = ["N/A", f"{weighted_base_percent:.1f}%", 
+                                               f"{weighted_deep_percent:.1f}%" if weighted_deep_percent is not None else "N/A", 
+                                               "N/A", "N/A"]
+            
+        if weighted_base_dollars is not None:
+            pricing_data["Weighted Avg GM $"] = ["N/A", f"${weighted_base_dollars:.2f}", 
+                                               f"${weighted_deep_dollars:.2f}" if weighted_deep_dollars is not None else "N/A",
+                                               "N/A", "N/A"]
+
+    # Build the HTML table in one pass
+    return html_table(pricing_data.keys(), zip(*pricing_data.values()), first_row_class="everyday-row")
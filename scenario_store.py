@@ -0,0 +1,178 @@
+import datetime
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from app_files import APP_DIR
+from scenarios import (DIMENSION_COLUMNS, INPUT_DEFAULTS, LEGACY_COLUMN_NAMES, SCENARIO_COLUMNS, build_scenario_frame,
+                       compact_scenarios)
+
+# Location of the shared scenario database (override with SCANCALC_SCENARIO_DB)
+DEFAULT_SCENARIO_DB = os.environ.get("SCANCALC_SCENARIO_DB", os.path.join(APP_DIR, "scan_scenarios.db"))
+
+TABLE_NAME = "scan_scenarios"
+
+# Integer-valued scenario columns; every other non-dimension column is REAL
+INTEGER_COLUMNS = {"# Bottles/Cs", "% on Ad (Base)", "% on Ad (Deep)"}
+
+
+def _quote(name):
+    """Quote a column name for SQL (scenario columns contain spaces, % and $)"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(column):
+    if column in DIMENSION_COLUMNS:
+        return "TEXT"
+    if column in INTEGER_COLUMNS:
+        return "INTEGER"
+    return "REAL"
+
+
+def _sql_values(column):
+    """Python values of a column that sqlite3 can bind"""
+    # float32 GM columns are widened and rounded, so 24.99 is not stored as 24.989999771118164
+    if column.dtype == np.float32:
+        return column.astype(np.float64).round(6).tolist()
+    # tolist() turns NumPy scalars (and categories) into Python values
+    return column.tolist()
+
+
+class ScenarioStore:
+    """Durable scan-scenario table in SQLite, shared by every app session
+
+    Appends are single INSERT transactions, reads can filter on the indexed
+    dimension columns, and WAL journaling lets several sessions write at once.
+    """
+
+    def __init__(self, path=DEFAULT_SCENARIO_DB, columns=SCENARIO_COLUMNS):
+        self.path = path
+        self.columns = list(columns)
+        self._ensure_schema()
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the store thread-safe
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def _ensure_schema(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            column_defs = ", ".join(f"{_quote(col)} {_sql_type(col)}" for col in self.columns)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ("
+                f"id INTEGER PRIMARY KEY AUTOINCREMENT, saved_at TEXT NOT NULL, {column_defs})"
+            )
+
+            # Rename columns whose meaning was made explicit
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+            for old, new in LEGACY_COLUMN_NAMES.items():
+                if old in existing and new not in existing and new in self.columns:
+                    conn.execute(f"ALTER TABLE {TABLE_NAME} RENAME COLUMN {_quote(old)} TO {_quote(new)}")
+                    existing = (existing - {old}) | {new}
+
+            # Add columns introduced after the database was created
+            added = [col for col in self.columns if col not in existing]
+            for col in added:
+                conn.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {_quote(col)} {_sql_type(col)}")
+            self._backfill(conn, added)
+
+            for col in DIMENSION_COLUMNS:
+                index_name = "idx_" + "".join(ch if ch.isalnum() else "_" for ch in col.lower())
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {TABLE_NAME} ({_quote(col)})")
+
+    def _backfill(self, conn, added):
+        # Fill newly added columns of existing rows by re-pricing their stored inputs
+        inputs = [col for col in DIMENSION_COLUMNS + list(INPUT_DEFAULTS) if col in self.columns]
+        derived = [col for col in added if col not in inputs]
+        if not derived:
+            return
+
+        sql = f"SELECT id, {', '.join(_quote(col) for col in inputs)} FROM {TABLE_NAME}"
+        stored = pd.read_sql_query(sql, conn)
+        if stored.empty:
+            return
+
+        priced = build_scenario_frame(stored[inputs])
+        assignments = ", ".join(f"{_quote(col)} = ?" for col in derived)
+        rows = zip(*(_sql_values(priced[col]) for col in derived), stored["id"].tolist())
+        conn.executemany(f"UPDATE {TABLE_NAME} SET {assignments} WHERE id = ?", rows)
+
+    def append(self, scenarios):
+        """Insert the rows of a scenario DataFrame; returns the number of rows written"""
+        if scenarios.empty:
+            return 0
+
+        columns = [col for col in self.columns if col in scenarios.columns]
+        saved_at = datetime.datetime.now().isoformat(timespec="seconds")
+        rows = zip([saved_at] * len(scenarios), *(_sql_values(scenarios[col]) for col in columns))
+
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        sql = (f"INSERT INTO {TABLE_NAME} (saved_at, {', '.join(_quote(col) for col in columns)}) "
+               f"VALUES ({placeholders})")
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(sql, rows)
+        return len(scenarios)
+
+    def _where(self, filters):
+        clauses = []
+        params = []
+        for col, value in filters.items():
+            if value is None or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{_quote(col)} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def load(self, **filters):
+        """Read saved scenarios, optionally filtered on dimension columns
+
+        Filters are keyed by column name, e.g. load(**{"Brand": ["Ciroc VS"]});
+        a list value matches any of its entries. The frame uses the compact
+        SCENARIO_DTYPES types.
+        """
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(_quote(col) for col in self.columns)} FROM {TABLE_NAME}{where} ORDER BY id"
+        with closing(self._connect()) as conn:
+            return compact_scenarios(pd.read_sql_query(sql, conn, params=params))
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        with closing(self._connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}{where}", params).fetchone()[0]
+
+    def distinct(self, column):
+        """Sorted distinct values of a dimension column (served from its index)"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT DISTINCT {_quote(column)} FROM {TABLE_NAME} ORDER BY 1").fetchall()
+        return [row[0] for row in rows if row[0] is not None]
+
+    def version(self):
+        """Token that changes whenever rows are added or deleted, for caching reads
+
+        It is (last id handed out, row count): ids are never reused, so every
+        insert raises the first part, and a delete alone lowers the second.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT (SELECT seq FROM sqlite_sequence WHERE name = ?), COUNT(*) FROM {TABLE_NAME}",
+                (TABLE_NAME,)).fetchone()
+        return row[0] or 0, row[1]
+
+    def delete(self, **filters):
+        """Delete the saved scenarios matching the filters (all of them without filters); returns the count"""
+        where, params = self._where(filters)
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(f"DELETE FROM {TABLE_NAME}{where}", params).rowcount
+
+    def clear(self):
+        self.delete()
@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+
+from margins import (calculate_scenario_margins, snap_to_price_endings, solve_cost_for_margin,
+                     solve_price_for_margin, solve_scan_for_margin)
+
+# Dimension columns of a saved scan scenario
+DIMENSION_COLUMNS = ["Brand", "Segment", "Size", "Customer/State"]
+
+# Inputs needed to price a scenario, with the default used when a column is missing
+INPUT_DEFAULTS = {
+    "Case Cost": 0.0,
+    "# Bottles/Cs": 12,
+    "Base Scan": 0.0,
+    "Deep Scan": 0.0,
+    "Coupon": 0.0,
+    "Everyday Shelf Price": 0.0,
+    "TPR Price (Base Scan)": 0.0,
+    "TPR Price (Deep Scan)": 0.0,
+    "Ad/Feature Price (Base Scan)": 0.0,
+    "Ad/Feature Price (Deep Scan)": 0.0,
+    "% on Ad (Base)": 0,
+    "% on Ad (Deep)": 0
+}
+
+# Calculator labels accepted as alternative input column names
+INPUT_ALIASES = {
+    "Customer": "Customer/State",
+    "Case Cost ($)": "Case Cost",
+    "Bottles/Case": "# Bottles/Cs",
+    "Bottles/Cs": "# Bottles/Cs",
+    "Base Scan ($)": "Base Scan",
+    "Deep Scan ($)": "Deep Scan",
+    "Coupon ($)": "Coupon",
+    "EDLP": "Everyday Shelf Price",
+    "EDLP ($)": "Everyday Shelf Price",
+    "TPR Base": "TPR Price (Base Scan)",
+    "TPR Base ($)": "TPR Price (Base Scan)",
+    "TPR Deep": "TPR Price (Deep Scan)",
+    "TPR Deep ($)": "TPR Price (Deep Scan)",
+    "Ad Base": "Ad/Feature Price (Base Scan)",
+    "Ad Base ($)": "Ad/Feature Price (Base Scan)",
+    "Ad Deep": "Ad/Feature Price (Deep Scan)",
+    "Ad Deep ($)": "Ad/Feature Price (Deep Scan)"
+}
+
+# Columns of a saved scan scenario, in the order the Save Scan Scenario button writes them
+SCENARIO_COLUMNS = [
+    "Brand",
+    "Segment",
+    "Size",
+    "Case Cost",
+    "# Bottles/Cs",
+    "Bottle Cost",
+    "Base Scan",
+    "Deep Scan",
+    "Coupon",
+    "Customer/State",
+    "Everyday Shelf Price",
+    "Everyday GM %",
+    "Everyday GM $",
+    "Everyday GM % (With Coupon)",
+    "TPR Price (Base Scan)",
+    "TPR GM % (Base Scan)",
+    "TPR GM $ (Base Scan)",
+    "TPR GM % (Base Scan, With Coupon)",
+    "TPR Price (Deep Scan)",
+    "TPR GM % (Deep Scan)",
+    "TPR GM $ (Deep Scan)",
+    "TPR GM % (Deep Scan, With Coupon)",
+    "Ad/Feature Price (Base Scan)",
+    "Ad GM % (Base Scan)",
+    "Ad GM $ (Base Scan)",
+    "Ad GM % (Base Scan, With Coupon)",
+    "Ad/Feature Price (Deep Scan)",
+    "Ad GM % (Deep Scan)",
+    "Ad GM $ (Deep Scan)",
+    "Ad GM % (Deep Scan, With Coupon)",
+    "% on Ad (Base)",
+    "Weighted Avg GM % (Base)",
+    "Weighted Avg GM $ (Base)",
+    "% on Ad (Deep)",
+    "Weighted Avg GM % (Deep)",
+    "Weighted Avg GM $ (Deep)"
+]
+
+# Older stores had one "(With Coupon)" column each for TPR and Ad, holding the Deep Scan values
+LEGACY_COLUMN_NAMES = {
+    "TPR GM % (With Coupon)": "TPR GM % (Deep Scan, With Coupon)",
+    "Ad GM % (With Coupon)": "Ad GM % (Deep Scan, With Coupon)"
+}
+
+# Input columns kept as float64 so prices and costs round-trip to the cent
+MONEY_COLUMNS = [
+    "Case Cost", "Bottle Cost", "Base Scan", "Deep Scan", "Coupon", "Everyday Shelf Price",
+    "TPR Price (Base Scan)", "TPR Price (Deep Scan)", "Ad/Feature Price (Base Scan)", "Ad/Feature Price (Deep Scan)"
+]
+
+# In-memory types of saved scenarios: categorical dimensions, small integers, and
+# float32 for the derived GM columns (per-bottle dollars and percentages)
+SCENARIO_DTYPES = {
+    col: ("category" if col in DIMENSION_COLUMNS else
+          "int16" if col == "# Bottles/Cs" else
+          "int8" if col.startswith("% on Ad") else
+          "float64" if col in MONEY_COLUMNS else
+          "float32")
+    for col in SCENARIO_COLUMNS
+}
+
+
+def normalize_scenario_inputs(df):
+    """Rename calculator labels to scenario column names and fill missing inputs"""
+    df = df.rename(columns=lambda col: INPUT_ALIASES.get(str(col).strip(), str(col).strip()))
+
+    for col in DIMENSION_COLUMNS:
+        if col in df.columns:
+            # Through object first, so categorical columns with gaps can take ""
+            df[col] = df[col].astype(object).fillna("").astype(str)
+        else:
+            df[col] = ""
+
+    for col, default in INPUT_DEFAULTS.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(default)
+        else:
+            df[col] = default
+
+    return df
+
+
+def build_scenario_frame(inputs):
+    """Price a frame of scenario inputs into saved-scenario rows
+
+    Rounding and the bottle cost rule mirror the calculator sidebar, so a row
+    built here matches what Save Scan Scenario stores for the same inputs.
+
+    Args:
+        inputs (pd.DataFrame): One row per scenario with the INPUT_DEFAULTS columns
+            (or their calculator aliases) plus the dimension columns
+
+    Returns:
+        pd.DataFrame: One row per input with the SCENARIO_COLUMNS columns
+    """
+    df = normalize_scenario_inputs(inputs)
+
+    case_cost = df["Case Cost"].to_numpy(dtype=float).round(2)
+    bottles_per_case = df["# Bottles/Cs"].to_numpy(dtype=float).round(0).astype(int)
+    bottle_cost = np.divide(case_cost, bottles_per_case, out=np.zeros_like(case_cost), where=bottles_per_case > 0)
+
+    prices = {col: df[col].to_numpy(dtype=float).round(2) for col in
+              ("Base Scan", "Deep Scan", "Coupon", "Everyday Shelf Price",
+               "TPR Price (Base Scan)", "TPR Price (Deep Scan)",
+               "Ad/Feature Price (Base Scan)", "Ad/Feature Price (Deep Scan)")}
+    ad_percentage_base = df["% on Ad (Base)"].to_numpy(dtype=float).round(0)
+    ad_percentage_deep = df["% on Ad (Deep)"].to_numpy(dtype=float).round(0)
+
+    m = calculate_scenario_margins(
+        prices["Everyday Shelf Price"], prices["TPR Price (Base Scan)"], prices["TPR Price (Deep Scan)"],
+        prices["Ad/Feature Price (Base Scan)"], prices["Ad/Feature Price (Deep Scan)"],
+        bottle_cost, prices["Base Scan"], prices["Deep Scan"], prices["Coupon"],
+        ad_percentage_base, ad_percentage_deep)
+
+    scenario_data = {
+        "Brand": df["Brand"].to_numpy(),
+        "Segment": df["Segment"].to_numpy(),
+        "Size": df["Size"].to_numpy(),
+        "Case Cost": case_cost,
+        "# Bottles/Cs": bottles_per_case,
+        "Bottle Cost": bottle_cost,
+        "Base Scan": prices["Base Scan"],
+        "Deep Scan": prices["Deep Scan"],
+        "Coupon": prices["Coupon"],
+        "Customer/State": df["Customer/State"].to_numpy(),
+        "Everyday Shelf Price": prices["Everyday Shelf Price"],
+        "Everyday GM %": m["edlp_gm_percent"],
+        "Everyday GM $": m["edlp_gm_dollars"],
+        "Everyday GM % (With Coupon)": m["edlp_gm_coupon_percent"],
+        "TPR Price (Base Scan)": prices["TPR Price (Base Scan)"],
+        "TPR GM % (Base Scan)": m["tpr_base_gm_percent"],
+        "TPR GM $ (Base Scan)": m["tpr_base_gm_dollars"],
+        "TPR GM % (Base Scan, With Coupon)": m["tpr_base_gm_coupon_percent"],
+        "TPR Price (Deep Scan)": prices["TPR Price (Deep Scan)"],
+        "TPR GM % (Deep Scan)": m["tpr_deep_gm_percent"],
+        "TPR GM $ (Deep Scan)": m["tpr_deep_gm_dollars"],
+        "TPR GM % (Deep Scan, With Coupon)": m["tpr_deep_gm_coupon_percent"],
+        "Ad/Feature Price (Base Scan)": prices["Ad/Feature Price (Base Scan)"],
+        "Ad GM % (Base Scan)": m["ad_base_gm_percent"],
+        "Ad GM $ (Base Scan)": m["ad_base_gm_dollars"],
+        "Ad GM % (Base Scan, With Coupon)": m["ad_base_gm_coupon_percent"],
+        "Ad/Feature Price (Deep Scan)": prices["Ad/Feature Price (Deep Scan)"],
+        "Ad GM % (Deep Scan)": m["ad_deep_gm_percent"],
+        "Ad GM $ (Deep Scan)": m["ad_deep_gm_dollars"],
+        "Ad GM % (Deep Scan, With Coupon)": m["ad_deep_gm_coupon_percent"],
+        "% on Ad (Base)": ad_percentage_base,
+        "Weighted Avg GM % (Base)": m["weighted_base_percent"],
+        "Weighted Avg GM $ (Base)": m["weighted_base_dollars"],
+        "% on Ad (Deep)": ad_percentage_deep,
+        "Weighted Avg GM % (Deep)": m["weighted_deep_percent"],
+        "Weighted Avg GM $ (Deep)": m["weighted_deep_dollars"]
+    }
+
+    return pd.DataFrame(scenario_data, columns=SCENARIO_COLUMNS, index=df.index)
+
+
+def compact_scenarios(df):
+    """Saved scenarios with the SCENARIO_DTYPES types, for holding many rows in memory
+
+    Missing dimensions become empty strings, integer columns are rounded and
+    percentages on ad are clipped to 0-100 before the cast; missing numbers in
+    the integer columns become 0.
+    """
+    df = df.copy()
+    for col, dtype in SCENARIO_DTYPES.items():
+        if col not in df.columns:
+            continue
+        if dtype == "category":
+            df[col] = df[col].fillna("").astype(str).astype("category")
+        elif dtype.startswith("int"):
+            values = pd.to_numeric(df[col], errors="coerce").fillna(0).round(0)
+            if dtype == "int8":
+                values = values.clip(0, 100)
+            df[col] = values.astype(dtype)
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    return df
+
+
+# Pricing scenarios as (label, price column, scan column); Everyday has no scan funding
+PRICING_SCENARIOS = [
+    ("Everyday", "Everyday Shelf Price", None),
+    ("TPR (Base Scan)", "TPR Price (Base Scan)", "Base Scan"),
+    ("TPR (Deep Scan)", "TPR Price (Deep Scan)", "Deep Scan"),
+    ("Ad/Feature (Base Scan)", "Ad/Feature Price (Base Scan)", "Base Scan"),
+    ("Ad/Feature (Deep Scan)", "Ad/Feature Price (Deep Scan)", "Deep Scan")
+]
+
+
+def solve_scenario_targets(inputs, target_percent, with_coupon=False, price_endings=None):
+    """Required price, required scan and maximum case cost for a target GM %, per row
+
+    Args:
+        inputs (pd.DataFrame): Scenario inputs, as accepted by build_scenario_frame
+        target_percent (float or array): Target GM % (e.g. 25 for 25%)
+        with_coupon (bool): Solve against GM % with the coupon applied
+        price_endings (tuple): If given, round required prices up to these endings (e.g. (0.99, 0.49))
+
+    Returns:
+        pd.DataFrame: Dimension columns plus three solved columns per pricing scenario;
+        NaN marks a target that cannot be reached
+    """
+    df = normalize_scenario_inputs(inputs)
+
+    case_cost = df["Case Cost"].to_numpy(dtype=float).round(2)
+    bottles_per_case = df["# Bottles/Cs"].to_numpy(dtype=float).round(0)
+    bottle_cost = np.divide(case_cost, bottles_per_case, out=np.zeros_like(case_cost), where=bottles_per_case > 0)
+    coupon = df["Coupon"].to_numpy(dtype=float).round(2)
+
+    result = {col: df[col].to_numpy() for col in DIMENSION_COLUMNS}
+    for label, price_col, scan_col in PRICING_SCENARIOS:
+        price = df[price_col].to_numpy(dtype=float).round(2)
+        scan = df[scan_col].to_numpy(dtype=float).round(2) if scan_col else np.zeros_like(price)
+
+        required_price = solve_price_for_margin(target_percent, bottle_cost, scan, coupon, with_coupon)
+        if price_endings:
+            required_price = snap_to_price_endings(required_price, price_endings)
+        result[f"{label} Required Price"] = required_price
+
+        if scan_col:
+            result[f"{label} Required Scan"] = solve_scan_for_margin(target_percent, price, bottle_cost, coupon, with_coupon)
+
+        max_bottle_cost = solve_cost_for_margin(target_percent, price, scan, coupon, with_coupon)
+        result[f"{label} Max Case Cost"] = max_bottle_cost * bottles_per_case
+
+    return pd.DataFrame(result, index=df.index)
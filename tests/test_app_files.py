@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from app_files import atomic_write
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = str(tmp_path / "out.txt")
+    atomic_write(path, lambda f: f.write("first"))
+    atomic_write(path, lambda f: f.write(b"second"), mode="wb")
+
+    with open(path) as f:
+        assert f.read() == "second"
+    assert os.listdir(tmp_path) == ["out.txt"]
+
+
+def test_failed_write_keeps_the_old_file_and_no_temp_file(tmp_path):
+    path = str(tmp_path / "out.txt")
+    atomic_write(path, lambda f: f.write("kept"))
+
+    def fail(f):
+        f.write("partial")
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        atomic_write(path, fail)
+    with open(path) as f:
+        assert f.read() == "kept"
+    assert os.listdir(tmp_path) == ["out.txt"]
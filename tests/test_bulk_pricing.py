@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+import bulk_pricing
+from scenarios import SCENARIO_COLUMNS, build_scenario_frame
+
+
+@pytest.fixture
+def inputs():
+    return pd.DataFrame({
+        "Brand": ["Ciroc VS", "Ketel One", "Tanqueray"],
+        "Segment": ["Vodka", "Vodka", "Gin"],
+        "Size": ["750mL", "1.75L", "750mL"],
+        "Customer": ["007", "TX", "FL"],
+        "Case Cost ($)": [150.0, 180.0, 140.0],
+        "Bottles/Case": [12, 6, 12],
+        "Base Scan ($)": [2.0, 3.0, 1.5],
+        "TPR Base ($)": [24.99, 39.99, 21.99],
+        "% on Ad (Base)": [30, 0, 50]
+    })
+
+
+@pytest.mark.parametrize("input_ext,output_ext", [(".csv", ".csv"), (".parquet", ".parquet"), (".csv", ".parquet")])
+def test_cli_prices_every_row(inputs, tmp_path, capsys, input_ext, output_ext):
+    input_path = tmp_path / f"inputs{input_ext}"
+    output_path = tmp_path / f"priced{output_ext}"
+    if input_ext == ".csv":
+        inputs.to_csv(input_path, index=False)
+    else:
+        inputs.to_parquet(input_path, index=False)
+
+    assert bulk_pricing.main([str(input_path), str(output_path), "--chunksize", "2", "--quiet"]) == 0
+    assert "Wrote 3 priced scenarios" in capsys.readouterr().out
+
+    if output_ext == ".csv":
+        priced = pd.read_csv(output_path, dtype={"Customer/State": str})
+    else:
+        priced = pd.read_parquet(output_path)
+    assert list(priced.columns) == SCENARIO_COLUMNS
+    # Chunked output is the same as pricing the whole frame at once
+    expected = build_scenario_frame(inputs)
+    assert list(priced["Customer/State"]) == ["007", "TX", "FL"]
+    pd.testing.assert_series_equal(priced["TPR GM % (Base Scan)"], expected["TPR GM % (Base Scan)"],
+                                   check_names=False, check_index=False)
+
+
+def test_cli_rejects_unknown_extension(inputs, tmp_path, capsys):
+    input_path = tmp_path / "inputs.csv"
+    inputs.to_csv(input_path, index=False)
+    assert bulk_pricing.main([str(input_path), str(tmp_path / "priced.xlsx"), "--quiet"]) == 1
+    assert "Unsupported file type" in capsys.readouterr().err
@@ -0,0 +1,51 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from catalog import ProductCatalog, load_catalog
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = tmp_path / "catalog.csv"
+    pd.DataFrame([
+        ["Ketel One", "Vodka", "750mL", 12, 150.00, ""],
+        ["Ketel One", "Vodka", "750mL", 12, 156.00, "2025-01-01"],
+        ["Ketel One", "Vodka", "750mL", 12, 162.00, "2025-07-01"],
+        ["Ketel One", "Vodka", "1.75L", 6, 180.00, "2025-07-01"],
+        ["Ciroc VS", "Cognac", "750mL", 12, 300.00, "2024-06-01"],
+    ], columns=["Brand", "Segment", "Size", "Bottles/Case", "Case Cost", "Effective Date"]).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("as_of, case_cost", [
+    ("2024-12-31", 150.00),
+    ("2025-01-01", 156.00),
+    ("2025-06-30", 156.00),
+    ("2025-07-01", 162.00),
+])
+def test_latest_line_on_or_before_the_as_of_date(catalog_file, as_of, case_cost):
+    catalog = load_catalog(catalog_file, as_of=as_of)
+    assert catalog.item("ketel one", "750ML")["case_cost"] == case_cost
+
+
+def test_lines_not_yet_in_effect_are_hidden(catalog_file):
+    catalog = load_catalog(catalog_file, as_of="2025-06-30")
+    assert catalog.sizes_for("Ketel One") == ["750mL"]
+    assert catalog.item("Ketel One", "1.75L") is None
+    assert "Ciroc VS" in catalog and catalog.segment_for("Ciroc VS") == "Cognac"
+
+    catalog = load_catalog(catalog_file, as_of="2024-01-01")
+    assert "Ciroc VS" not in catalog
+    assert catalog.item("Ketel One", "750mL")["effective_date"] is None
+
+
+def test_defaults_to_today():
+    lines = pd.DataFrame({
+        "Brand": ["Ketel One", "Ketel One"], "Segment": "Vodka", "Size": "750mL", "Bottles/Case": 12,
+        "Case Cost": [150.0, 999.0],
+        "Effective Date": pd.to_datetime([datetime.date.today(), datetime.date.today() + datetime.timedelta(days=1)])
+    })
+    item = ProductCatalog(lines).item("Ketel One", "750mL")
+    assert item["case_cost"] == 150.0 and item["effective_date"] == datetime.date.today()
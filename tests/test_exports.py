@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from JZcalc import export_file
+from exports import write_index_ratios_xlsx, write_promo_plan_xlsx, write_scenarios_xlsx
+from parquet_io import (read_index_ratios_parquet, read_scenarios_parquet, write_index_ratios_parquet,
+                        write_scenarios_parquet)
+from promo import promo_plan
+from scenarios import build_scenario_frame
+
+
+@pytest.fixture
+def scenarios():
+    return build_scenario_frame(pd.DataFrame({
+        "Brand": ["Ciroc VS", "Ketel One"], "Segment": ["Vodka", "Vodka"], "Size": ["750mL", "1.75L"],
+        "Customer/State": ["TX", "FL"], "Case Cost": [150.0, 180.0], "# Bottles/Cs": [12, 6],
+        "Base Scan": [2.0, 3.0], "TPR Price (Base Scan)": [24.99, 39.99]
+    }))
+
+
+@pytest.fixture
+def index_ratios():
+    return pd.DataFrame({"Vodka | 750mL": [0.9, 1.1, 1.3], "Gin | 750mL": [1.2, 0.8, 1.0]},
+                        index=["Week 1", "Week 2", "Week 3"])
+
+
+def deferred_download(export_name, writer, df):
+    """Run a download button's deferred data callable the way Streamlit does"""
+    data = (lambda: export_file(export_name, writer, df))()
+    data_as_bytes, _ = convert_data_to_bytes_and_infer_mime(data, ValueError("Callable returned unsupported type"))
+    return data_as_bytes
+
+
+@pytest.mark.parametrize("writer", [write_scenarios_xlsx, write_scenarios_parquet])
+def test_scenario_downloads(scenarios, writer):
+    data = deferred_download("scenarios", writer, scenarios)
+    assert data[:4] in (b"PK\x03\x04", b"PAR1")
+
+
+def test_scenario_parquet_download_round_trips(scenarios, tmp_path):
+    path = tmp_path / "scenarios.parquet"
+    path.write_bytes(deferred_download("scenarios_parquet", write_scenarios_parquet, scenarios))
+    back = read_scenarios_parquet(str(path))
+    assert list(back["Brand"].astype(str)) == ["Ciroc VS", "Ketel One"]
+
+
+@pytest.mark.parametrize("writer", [write_index_ratios_xlsx, write_index_ratios_parquet])
+def test_index_ratio_downloads(index_ratios, writer, tmp_path):
+    data = deferred_download("index_ratios", writer, index_ratios)
+    if writer is write_index_ratios_parquet:
+        path = tmp_path / "ratios.parquet"
+        path.write_bytes(data)
+        pd.testing.assert_frame_equal(read_index_ratios_parquet(str(path)), index_ratios)
+    else:
+        assert data[:4] == b"PK\x03\x04"
+
+
+def test_promo_plan_download(index_ratios):
+    data = deferred_download("promo_plan", write_promo_plan_xlsx, promo_plan(index_ratios, k=1))
+    assert data[:4] == b"PK\x03\x04"
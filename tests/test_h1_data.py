@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from h1_data import validate_h1_data
+from h1_index import BRAND_KEY_COLUMNS, H1HistoryCube
+
+WEEKS = [f"Week {week}" for week in range(1, 11)]
+
+
+def h1_table(columns, rows):
+    return pd.DataFrame([list(row) for row in rows], columns=columns)
+
+
+def test_segment_size_and_brand_are_mapped_by_name():
+    raw = h1_table(["Brand", "Segment", "Size"] + WEEKS,
+                   [["Tito's", "Vodka", "750ml"] + [10.0] * 10,
+                    [None, "Gin", "1.75L"] + [5.0] * 10])
+    df = validate_h1_data(raw)
+
+    assert list(df.columns[:3]) == ["Segment", "Size", "Brand"]
+    assert df["Segment"].tolist() == ["Vodka", "Gin"]
+    assert df["Size"].tolist() == ["750ml", "1.75L"]
+    assert df["Brand"].iloc[0] == "Tito's" and pd.isna(df["Brand"].iloc[1])
+
+
+def test_legacy_layout_takes_segment_and_size_by_position():
+    raw = h1_table(["Category", "Bottle"] + WEEKS, [["Vodka", "750ml"] + [10.0] * 10])
+    df = validate_h1_data(raw)
+
+    assert list(df.columns) == ["Segment", "Size"] + WEEKS
+
+
+def test_blank_week_cells_count_as_zero():
+    # Two brands in one segment/size, one of them missing weeks 3 and 4
+    gappy = [10.0, 10.0, None, None] + [10.0] * 6
+    raw = h1_table(["Segment", "Size", "Brand"] + WEEKS,
+                   [["Vodka", "750ml", "Tito's"] + gappy,
+                    ["Vodka", "750ml", "Smirnoff"] + [20.0] * 10])
+    df = validate_h1_data(raw)
+
+    index = H1HistoryCube(df).period_index()
+    ratios, avg_rsv, _ = index.lookup("Vodka", "750ml")
+    assert avg_rsv == pytest.approx(28.0)
+    assert np.isfinite(ratios).all() and min(ratios) == pytest.approx(20.0 / 28.0)
+
+    brand_index = H1HistoryCube(df, BRAND_KEY_COLUMNS).period_index()
+    ratios, avg_rsv, _ = brand_index.lookup("Tito's", "750ml")
+    assert avg_rsv == pytest.approx(8.0)
+    assert ratios[2] == 0.0 and ratios[0] == pytest.approx(10.0 / 8.0)
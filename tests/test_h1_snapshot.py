@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import lists
+from h1_data import generate_brand_h1_data
+from h1_index import H1HistoryCube
+from h1_snapshot import H1Snapshot
+
+
+@pytest.fixture
+def brand_data():
+    full = generate_brand_h1_data(lists.brand_list[1:20], years=[2024, 2025])
+    week = full[full["Year"] == 2025][["Segment", "Size", "Brand", "Year", "Half", "Week 27"]]
+    return full, full.drop(columns=["Week 27"]), week
+
+
+def test_append_week_with_brand_advances_both_cubes(brand_data):
+    full, loaded, week = brand_data
+    snapshot = H1Snapshot(loaded).with_week(week.copy())
+
+    assert list(snapshot.cube.week_counts) == list(snapshot.brand_cube.week_counts)
+    assert snapshot.cube.period_index().week_labels[-1] == snapshot.brand_cube.period_index().week_labels[-1]
+
+    # Same ratios as rebuilding from a frame that had the week all along
+    reference = H1HistoryCube(full.assign(**{"Week 27": np.where(full["Year"] == 2025, full["Week 27"], np.nan)}))
+    assert np.allclose(reference.period_index().ratios, snapshot.cube.period_index().ratios)
+
+
+def test_append_week_without_brand_is_rejected_when_data_has_brands(brand_data):
+    _, loaded, week = brand_data
+    snapshot = H1Snapshot(loaded)
+    before = (list(snapshot.cube.week_counts), list(snapshot.brand_cube.week_counts))
+
+    with pytest.raises(ValueError, match="Brand"):
+        snapshot.with_week(week.drop(columns=["Brand"]))
+
+    # Neither cube moved, so a later week with brands still appends
+    assert (list(snapshot.cube.week_counts), list(snapshot.brand_cube.week_counts)) == before
+    snapshot = snapshot.with_week(week.copy())
+    assert list(snapshot.cube.week_counts) == list(snapshot.brand_cube.week_counts)
+
+
+def test_append_week_without_brand_when_data_has_none(brand_data):
+    _, loaded, week = brand_data
+    segment_data = loaded[loaded["Brand"].isna()].drop(columns=["Brand"])
+    segment_week = week[week["Brand"].isna()].drop(columns=["Brand"])
+
+    snapshot = H1Snapshot(segment_data).with_week(segment_week)
+    assert snapshot.brand_cube is None
+    assert snapshot.appended_weeks == 1
+
+
+def test_append_week_adds_new_brand_segments(brand_data):
+    _, loaded, week = brand_data
+    week = week[week["Brand"].notna()].head(1).assign(Brand="New Brand")
+    snapshot = H1Snapshot(loaded)
+    segment = week["Segment"].iloc[0]
+    assert not snapshot.brand_in_segment("New Brand", segment)
+
+    snapshot = snapshot.with_week(week.copy())
+    assert snapshot.brand_in_segment("New Brand", segment)
+    assert not snapshot.brand_in_segment("New Brand", "Not A Segment")
+
+
+def test_append_week_fills_the_buffer_in_place_and_branches_safely(brand_data):
+    full, _, _ = brand_data
+    weeks = [f"Week {week}" for week in range(24, 28)]
+    latest = full[full["Year"] == 2025]
+    partial = full.assign(**{week: np.where(full["Year"] == 2025, np.nan, full[week]) for week in weeks})
+
+    base = H1HistoryCube(partial)
+    cube = base
+    for week in weeks:
+        cube = cube.append_week(latest[["Segment", "Size", week]], week)
+    assert cube._buffer is base._buffer
+    assert np.allclose(H1HistoryCube(full).period_index().ratios, cube.period_index().ratios)
+
+    # A second line of appends from the original cube gets its own buffer and leaves both lines intact
+    doubled = latest.assign(**{weeks[0]: latest[weeks[0]] * 2})
+    branch = base.append_week(doubled[["Segment", "Size", weeks[0]]], weeks[0])
+    assert branch._buffer is not base._buffer
+    reference = H1HistoryCube(partial.assign(**{weeks[0]: np.where(full["Year"] == 2025, full[weeks[0]] * 2, np.nan)}))
+    assert np.allclose(reference.period_index().ratios, branch.period_index().ratios)
+    assert np.allclose(H1HistoryCube(full).period_index().ratios, cube.period_index().ratios)
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from margins import (MARGIN_FIELDS, calculate_margin, calculate_margins_batch, calculate_scenario_margins,
+                     calculate_weighted_average, calculate_weighted_average_batch, solve_cost_for_margin,
+                     solve_price_for_margin, solve_scan_for_margin, value_range)
+
+
+@pytest.fixture
+def price_points():
+    rng = np.random.default_rng(7)
+    n = 500
+    return {
+        "price": np.round(rng.uniform(-2, 40, n), 2),
+        "cost": np.round(rng.uniform(-2, 30, n), 2),
+        "scan": np.round(rng.uniform(0, 6, n), 2),
+        "coupon": np.round(rng.uniform(0, 3, n), 2)
+    }
+
+
+def test_scalar_matches_batch(price_points):
+    batch = calculate_margins_batch(**price_points)
+    for i in range(len(price_points["price"])):
+        scalar = calculate_margin(*(float(values[i]) for values in price_points.values()))
+        for field in MARGIN_FIELDS:
+            assert scalar[field] == pytest.approx(batch[field][i], abs=1e-9)
+
+
+def test_scalar_zeroes_invalid_price_or_cost():
+    assert calculate_margin(0.0, 8.0, 1.0, 0.5) == {field: 0.0 for field in MARGIN_FIELDS}
+    assert calculate_margin(10.0, -1.0, 1.0, 0.5) == {field: 0.0 for field in MARGIN_FIELDS}
+
+
+def test_scalar_accepts_numpy_scalars():
+    assert calculate_margin(np.float32(10), 8, 1, 0.5) == calculate_margin(10.0, 8.0, 1.0, 0.5)
+
+
+def test_weighted_average_matches_batch(price_points):
+    ad_percentage = np.arange(len(price_points["price"])) % 101
+    tpr_price, ad_price = price_points["price"], price_points["price"] * 0.9
+    batch_percent, batch_dollars = calculate_weighted_average_batch(
+        tpr_price, ad_price, price_points["cost"], price_points["scan"], price_points["coupon"], ad_percentage)
+    for i in range(0, len(tpr_price), 25):
+        percent, dollars = calculate_weighted_average(float(tpr_price[i]), float(ad_price[i]),
+                                                      float(price_points["cost"][i]), float(price_points["scan"][i]),
+                                                      float(price_points["coupon"][i]), int(ad_percentage[i]))
+        assert percent == pytest.approx(batch_percent[i])
+        assert dollars == pytest.approx(batch_dollars[i])
+
+
+def test_weighted_average_without_ad_percentage():
+    assert calculate_weighted_average(9.0, 8.0, 7.0, 1.0, 0.5, None) == (None, None)
+
+
+def test_scenario_margins_match_scalar_calls():
+    result = calculate_scenario_margins(12.0, 10.0, 9.0, 9.5, 8.5, 7.0, 1.0, 2.0, 0.5, 30, 50)
+    assert float(result["edlp_gm_percent"]) == pytest.approx(calculate_margin(12.0, 7.0, 0.0, 0.5)["gm_percent"])
+    assert float(result["tpr_deep_gm_dollars"]) == pytest.approx(calculate_margin(9.0, 7.0, 2.0, 0.5)["gm_dollars"])
+    percent, dollars = calculate_weighted_average(10.0, 9.5, 7.0, 1.0, 0.5, 30)
+    assert float(result["weighted_base_percent"]) == pytest.approx(percent)
+    assert float(result["weighted_base_dollars"]) == pytest.approx(dollars)
+
+
+def test_value_range_include_stop_appends_the_endpoint():
+    assert value_range(0, 100, 30).tolist() == [0, 30, 60, 90]
+    assert value_range(0, 100, 30, include_stop=True).tolist() == [0, 30, 60, 90, 100]
+    assert value_range(0, 100, 25, include_stop=True).tolist() == [0, 25, 50, 75, 100]
+
+
+@pytest.mark.parametrize("with_coupon", [False, True])
+def test_solvers_round_trip_through_calculate_margin(with_coupon):
+    field = "gm_coupon_percent" if with_coupon else "gm_percent"
+    rng = np.random.default_rng(3)
+    for target, cost, scan, coupon, price in zip(rng.uniform(5, 60, 50), rng.uniform(5, 30, 50),
+                                                 rng.uniform(0, 3, 50), rng.uniform(0, 1, 50), rng.uniform(20, 50, 50)):
+        solved_price = float(solve_price_for_margin(target, cost, scan, coupon, with_coupon))
+        assert calculate_margin(solved_price, cost, scan, coupon)[field] == pytest.approx(target)
+
+        solved_scan = float(solve_scan_for_margin(target, price, cost, coupon, with_coupon))
+        if solved_scan > 0:
+            assert calculate_margin(price, cost, solved_scan, coupon)[field] == pytest.approx(target)
+        else:
+            assert calculate_margin(price, cost, 0.0, coupon)[field] >= target
+
+        solved_cost = float(solve_cost_for_margin(target, price, scan, coupon, with_coupon))
+        assert calculate_margin(price, solved_cost, scan, coupon)[field] == pytest.approx(target)
+
+
+def test_price_solver_is_zero_when_the_scan_covers_the_cost():
+    assert float(solve_price_for_margin(30, 5.0, 5.0)) == 0.0
+    assert float(solve_price_for_margin(100, 5.0, 4.0, 1.5, with_coupon=True)) == 0.0
+    assert float(solve_scan_for_margin(30, 20.0, 5.0)) == 0.0
+
+
+def test_solvers_return_nan_when_unreachable():
+    # A 100% margin needs a free bottle; no price or scan fixes a missing cost or price
+    assert np.isnan(solve_price_for_margin(100, 8.0, 1.0))
+    assert np.isnan(solve_price_for_margin(120, 8.0, 1.0))
+    assert np.isnan(solve_price_for_margin(25, 0.0, 1.0))
+    assert np.isnan(solve_scan_for_margin(25, 0.0, 8.0))
+    assert np.isnan(solve_cost_for_margin(25, 0.0, 1.0))
+    # Above 100% the highest cost the target allows is not positive
+    assert np.isnan(solve_cost_for_margin(150, 10.0, 1.0))
+
+
+def test_solvers_propagate_nan_inputs():
+    assert np.isnan(solve_price_for_margin(25, np.nan, 1.0))
+    assert np.isnan(solve_price_for_margin(25, 8.0, np.nan))
+    assert np.isnan(solve_price_for_margin(np.nan, 8.0, 8.0))
+    assert np.isnan(solve_scan_for_margin(25, np.nan, 8.0))
+    assert np.isnan(solve_scan_for_margin(np.nan, 20.0, 8.0))
+    assert np.isnan(solve_cost_for_margin(25, 20.0, np.nan))
+    assert np.isnan(solve_price_for_margin(25, 8.0, 1.0, np.nan, with_coupon=True))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from h1_index import H1RatioIndex
+from projections import project_scenarios, projection_totals
+from scenarios import build_scenario_frame
+
+WEEKS = [f"Week {week}" for week in range(1, 5)]
+
+
+@pytest.fixture
+def h1_index():
+    return H1RatioIndex(pd.DataFrame([["Vodka", "750mL", 10.0, 20.0, 30.0, 20.0],
+                                      ["Gin", "750mL", 5.0, 5.0, 5.0, 5.0]], columns=["Segment", "Size"] + WEEKS))
+
+
+@pytest.fixture
+def scenarios():
+    return build_scenario_frame(pd.DataFrame({
+        "Brand": ["Ketel One", "Ketel One", "Tanqueray", "Ciroc VS"],
+        "Segment": ["Vodka", "Vodka", "Gin", "Cognac"],
+        "Size": "750mL",
+        "Customer/State": ["TX", "FL", "TX", ""],
+        "Case Cost": 120.0, "# Bottles/Cs": 12, "Base Scan": [1.0, 2.0, 1.5, 0.5],
+        "TPR Price (Base Scan)": 20.0
+    }))
+
+
+def test_weekly_projection_follows_the_index_ratios(h1_index, scenarios):
+    projection = project_scenarios(scenarios, h1_index, "TPR (Base Scan)", baseline_volume=10.0)
+
+    # Vodka averages 20 a week, so its ratios are 0.5, 1, 1.5, 1; Cognac has no H1 data and stays flat
+    volume = np.array([[5, 10, 15, 10], [5, 10, 15, 10], [10, 10, 10, 10], [10, 10, 10, 10]], dtype=float)
+    gm = scenarios["TPR GM $ (Base Scan)"].to_numpy(dtype=float)
+    assert np.allclose(projection["gm_dollars"].to_numpy(), gm[:, None] * volume)
+    assert np.allclose(projection["scan_spend"].to_numpy(), scenarios["Base Scan"].to_numpy()[:, None] * volume)
+    assert projection["indexed"].tolist() == [True, True, True, False]
+    assert list(projection["gm_dollars"].columns) == list(h1_index.week_labels)
+
+
+def test_totals_by_dimension(h1_index, scenarios):
+    projection = project_scenarios(scenarios, h1_index, "TPR (Base Scan)", baseline_volume=[10.0, 20.0, 10.0, 0.0])
+    gm_dollars = projection["gm_dollars"]
+
+    by_brand = projection_totals(gm_dollars, scenarios, "Brand")
+    assert by_brand.index.tolist() == ["Ciroc VS", "Ketel One", "Tanqueray"]
+    assert by_brand.loc["Ketel One", "Total"] == pytest.approx(gm_dollars.iloc[:2].to_numpy().sum())
+    assert by_brand["Total"].sum() == pytest.approx(gm_dollars.to_numpy().sum())
+
+    by_customer = projection_totals(gm_dollars, scenarios, "Customer/State")
+    assert by_customer.index.name == "Customer/State"
+    assert by_customer.index.tolist() == ["(none)", "FL", "TX"]
+    assert by_customer.loc["TX"].iloc[0] == pytest.approx(gm_dollars.iloc[[0, 2], 0].sum())
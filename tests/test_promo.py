@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from promo import PROMO_PLAN_COLUMNS, promo_plan, recommend_promo_windows
+
+
+def greedy_windows(ratios, k, promo_length, min_gap, blackout_weeks):
+    # One combination at a time: best window first, skipping overlaps and windows within the gap
+    span = promo_length + min_gap
+    picks = []
+    windows = [(ratios[w:w + promo_length].mean(), w) for w in range(len(ratios) - promo_length + 1)
+               if not any(w < week <= w + promo_length for week in blackout_weeks)]
+    for score, window in sorted(windows, key=lambda item: -item[0]):
+        if len(picks) < k and all(abs(window - picked) >= span for picked, _ in picks):
+            picks.append((window, score))
+    return picks
+
+
+@pytest.mark.parametrize("k, promo_length, min_gap, blackout_weeks", [
+    (3, 1, 0, ()),
+    (4, 2, 1, ()),
+    (3, 3, 2, (5, 6, 20)),
+    (10, 2, 3, (1,)),
+])
+def test_matches_greedy_reference(k, promo_length, min_gap, blackout_weeks):
+    ratios = np.random.default_rng(11).uniform(0.5, 1.5, (40, 27))
+    starts, scores = recommend_promo_windows(ratios, k, promo_length, min_gap, blackout_weeks=blackout_weeks)
+
+    for row in range(len(ratios)):
+        expected = greedy_windows(ratios[row], k, promo_length, min_gap, blackout_weeks)
+        picked = [(int(start), score) for start, score in zip(starts[row], scores[row]) if start >= 0]
+        assert [start for start, _ in picked] == [start for start, _ in expected]
+        assert [score for _, score in picked] == pytest.approx([score for _, score in expected])
+
+
+def test_gap_blackout_and_promo_week_cap():
+    ratios = np.ones((1, 12))
+    ratios[0, [2, 3, 4, 9]] = [3.0, 2.9, 2.8, 2.0]
+
+    starts, _ = recommend_promo_windows(ratios, k=3, min_gap=2)
+    assert starts[0].tolist() == [2, 9, 5]
+
+    starts, _ = recommend_promo_windows(ratios, k=3, min_gap=2, blackout_weeks=(3,))
+    assert 2 not in starts[0]
+
+    starts, _ = recommend_promo_windows(ratios, k=5, promo_length=2, max_promo_weeks=5)
+    assert starts.shape == (1, 2)
+
+
+def test_fewer_windows_than_promos_are_left_unfilled():
+    starts, scores = recommend_promo_windows(np.ones((2, 4)), k=3, promo_length=2)
+    assert (starts[:, 2] == -1).all() and np.isnan(scores[:, 2]).all()
+
+
+def test_promo_plan_table():
+    ratios = pd.DataFrame({"Vodka | 750mL": [1.0, 1.4, 0.9, 1.2], "Gin | 1.75L": [1.3, 0.8, 0.7, 1.1]},
+                          index=["Jan 1", "Jan 8", "Jan 15", "Jan 22"])
+    plan = promo_plan(ratios, k=2, promo_length=1, min_gap=1)
+
+    assert list(plan.columns) == PROMO_PLAN_COLUMNS
+    vodka = plan[plan["Segment"] == "Vodka"]
+    assert vodka["Start Week"].tolist() == [2, 4]
+    assert vodka["Weeks"].tolist() == ["Jan 8", "Jan 22"]
+    assert plan[plan["Segment"] == "Gin"]["Size"].unique().tolist() == ["1.75L"]
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from scenario_store import TABLE_NAME, ScenarioStore
+from scenarios import LEGACY_COLUMN_NAMES, SCENARIO_COLUMNS, build_scenario_frame
+
+
+def priced(brands, customer="TX"):
+    return build_scenario_frame(pd.DataFrame({
+        "Brand": brands, "Segment": "Vodka", "Size": "750mL", "Customer/State": customer,
+        "Case Cost": 150.0, "# Bottles/Cs": 12, "Base Scan": 2.0, "TPR Price (Base Scan)": 24.99
+    }))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScenarioStore(str(tmp_path / "scenarios.db"))
+
+
+def test_delete_only_touches_filtered_rows(store):
+    store.append(priced(["Ciroc VS", "Ketel One", "Ketel One"]))
+    store.append(priced(["Ketel One"], customer="FL"))
+
+    assert store.delete(**{"Brand": ["Ketel One"], "Customer/State": ["TX"]}) == 2
+    assert sorted(store.load()["Brand"].astype(str)) == ["Ciroc VS", "Ketel One"]
+    assert store.delete() == 2
+    assert store.count() == 0
+
+
+def test_version_changes_on_every_write(store):
+    seen = {store.version()}
+    store.append(priced(["Ciroc VS", "Ketel One"]))
+    seen.add(store.version())
+    store.delete(Brand="Ketel One")
+    seen.add(store.version())
+    # Same row count as after the first append, but a new id was handed out
+    store.append(priced(["Ketel One"]))
+    seen.add(store.version())
+    assert len(seen) == 4
+    assert store.version() == store.version()
+
+
+def test_legacy_database_is_migrated_and_backfilled(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    scenarios = priced(["Ciroc VS", "Ketel One"])
+    scenarios.loc[1, "Coupon"] = 0.5
+    scenarios = build_scenario_frame(scenarios)
+
+    # An old database: the deep-scan coupon margins under their old names, and no base-scan coupon margins
+    renamed = {new: old for old, new in LEGACY_COLUMN_NAMES.items()}
+    missing = ["TPR GM % (Base Scan, With Coupon)", "Ad GM % (Base Scan, With Coupon)"]
+    old_columns = [renamed.get(col, col) for col in SCENARIO_COLUMNS if col not in missing]
+    old_rows = scenarios.rename(columns=renamed)[old_columns].astype(object)
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"CREATE TABLE {TABLE_NAME} (id INTEGER PRIMARY KEY AUTOINCREMENT, saved_at TEXT NOT NULL, "
+                     + ", ".join(f'"{col}"' for col in old_columns) + ")")
+        conn.executemany(f"INSERT INTO {TABLE_NAME} VALUES (NULL, '2024-01-01T00:00:00', "
+                         + ", ".join("?" * len(old_columns)) + ")", old_rows.itertuples(index=False, name=None))
+
+    loaded = ScenarioStore(path).load()
+
+    assert list(loaded.columns) == SCENARIO_COLUMNS
+    for col in list(LEGACY_COLUMN_NAMES.values()) + missing:
+        assert loaded[col].astype(float).tolist() == pytest.approx(scenarios[col].astype(float).tolist(), abs=1e-4)
+    # Opening it again changes nothing
+    assert ScenarioStore(path).load().equals(loaded)